@@ -7,10 +7,14 @@ import os
 import json
 import re
 import uuid
+import bisect
 import datetime
 from abc import ABC, abstractmethod
 from typing import List, Optional, Dict, Any
 
+from keyword_automaton import KeywordAutomaton
+from taxonomy import CategoryTaxonomy, get_category_taxonomy, get_pii_taxonomy
+
 # Optional imports for providers
 try:
     import google.generativeai as genai
@@ -39,59 +43,86 @@ CONFIG_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'system_conf
 # --- Utilities ---
 
 def load_categories():
-    try:
-        if os.path.exists(DATA_FILE):
-            with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)['categories']
-    except Exception as e:
-        print(f"Error loading categories: {e}")
-    return []
+    """Plain list copy of the categories; prefer get_category_taxonomy() in hot paths."""
+    return get_category_taxonomy().as_list()
 
 def get_macro_category(detected_pii):
     """Maps detected PII to macro categories for better visualization"""
-    personal_data = ["CPF", "RG", "Email", "Telefone", "Endereço", "CEP", "CNH", 
-                     "Passaporte", "Título de Eleitor", "Certidão de Nascimento"]
-    banking_data = ["Conta Bancária", "PIX (UUID)", "Cartão de Crédito"]
-    health_data = ["Prontuário Médico", "Dados de Paciente"]
-    vehicle_data = ["Placa de Veículo (antiga)", "Placa de Veículo (Mercosul)"]
-    
-    for pii in detected_pii:
-        if pii == "Prontuário Médico":
-            return "Prontuário Médico"
-    
-    for pii in detected_pii:
-        if pii == "Conflitos Familiares":
-            return "Dados Sensíveis (Violência Doméstica)"
-
-    for pii in detected_pii:
-        if pii in health_data:
-            return "Dados de Saúde"
-    
-    for pii in detected_pii:
-        if pii in banking_data:
-            return "Dados Bancários"
-    
-    for pii in detected_pii:
-        if pii in personal_data:
-            return "Dados Pessoais"
-    
-    for pii in detected_pii:
-        if pii in vehicle_data:
-            return "Dados Veiculares"
-    
-    return "Público"
+    return get_pii_taxonomy().macro_for(detected_pii)
+
+PRIVACY_CRITERIA = """Criteria for 'Sensitive' (Sigiloso):
+        - Identity Documents: CPF, RG, CNH, Passaporte, Título Eleitor, Certidões.
+        - Contact Info: Email, Telefone, Endereço, CEP.
+        - Financial Data: Conta Bancária, Cartão de Crédito, Chave PIX.
+        - Vehicles: Placas.
+        - Health & Specifics: Prontuário Médico, Dados de Paciente, Violência Doméstica."""
 
 # --- Provider Base Class ---
 
 class LLMProvider(ABC):
     @abstractmethod
-    def classify_text(self, text: str, categories: List[Dict]) -> Optional[Dict]:
+    def classify_text(self, text: str, taxonomy: CategoryTaxonomy) -> Optional[Dict]:
         pass
 
     @abstractmethod
     def analyze_privacy(self, text: str, enabled_list: str) -> Dict[str, Any]:
         pass
 
+    @abstractmethod
+    def _complete(self, prompt: str) -> str:
+        """Raw model answer for a prompt (used by the batched privacy analysis)."""
+        pass
+
+    def analyze_privacy_batch(self, texts: List[str], enabled_lists: List[str]) -> List[Dict[str, Any]]:
+        """
+        Privacy analysis of several texts in one model call. Texts the answer
+        does not cover (or every text, if the call fails) fall back to one
+        analyze_privacy call each.
+        """
+        answers = {}
+        if len(texts) > 1:
+            try:
+                answers = self._parse_batch(self._complete(self._get_privacy_batch_prompt(texts, enabled_lists)), len(texts))
+            except Exception as e:
+                print(f"{type(self).__name__} batch error: {e}")
+        return [answers[i] if i in answers else self.analyze_privacy(text, enabled_lists[i])
+                for i, text in enumerate(texts)]
+
+    def _get_privacy_batch_prompt(self, texts, enabled_lists):
+        items = "\n".join(f"{i}. [Tipos: {enabled}] {json.dumps(text, ensure_ascii=False)}"
+                          for i, (text, enabled) in enumerate(zip(texts, enabled_lists)))
+        return f"""
+        Analyze each of the following numbered texts for Personal Identifiable Information (PII) or sensitive personal contexts.
+        Strictly follow the Brazilian LGPD and Access to Information Law standards.
+
+        **IMPORTANT**: For each text, only detect and report the PII types listed in its [Tipos: ...] tag
+        ("todos" means any type). Ignore any other types of PII.
+
+        {PRIVACY_CRITERIA}
+
+        Return JSON with one entry per text:
+        {{"results": [{{
+            "index": number,
+            "is_sensitive": boolean,
+            "privacy_status": "Sigiloso" | "Público",
+            "reason": "Short explanation (PT-BR)",
+            "detected_pii": ["List ONLY the enabled types detected"]
+        }}]}}
+        Texts:
+        {items}
+        """
+
+    @staticmethod
+    def _parse_batch(content: str, count: int) -> Dict[int, Dict[str, Any]]:
+        """index -> answer for the well-formed entries of a batched answer."""
+        data = json.loads(content[content.find('{'):content.rfind('}')+1])
+        answers = {}
+        for entry in data.get('results', []):
+            if isinstance(entry, dict) and isinstance(entry.get('index'), int) and 0 <= entry['index'] < count \
+                    and 'privacy_status' in entry:
+                answers[entry.pop('index')] = entry
+        return answers
+
 # --- Gemini Provider (Current) ---
 
 class GeminiProvider(LLMProvider):
@@ -101,18 +132,17 @@ class GeminiProvider(LLMProvider):
         if genai:
             genai.configure(api_key=api_key)
 
-    def classify_text(self, text: str, categories: List[Dict]) -> Optional[Dict]:
+    def classify_text(self, text: str, taxonomy: CategoryTaxonomy) -> Optional[Dict]:
         if not genai: return None
         try:
             model = genai.GenerativeModel(self.model_name)
-            cat_list = ", ".join([f"{c['id']} ({', '.join(c['subcategories'])})" for c in categories])
             prompt = f"""
-            Classify the following text into one of these categories: {cat_list}.
+            Classify the following text into one of these categories: {taxonomy.prompt_fragment}.
             Return JSON format: {{"id": "Category", "subcategory": "Subcategory"}}.
             Text: "{text}"
             """
             response = model.generate_content(prompt)
-            return self._parse_classification(response.text, categories)
+            return self._parse_classification(response.text, taxonomy)
         except Exception as e:
             print(f"Gemini Error: {e}")
             return None
@@ -128,16 +158,14 @@ class GeminiProvider(LLMProvider):
             print(f"Gemini Privacy Error: {e}")
             return {"error": str(e)}
 
-    def _parse_classification(self, content: str, categories: List[Dict]) -> Optional[Dict]:
+    def _complete(self, prompt: str) -> str:
+        if not genai: raise RuntimeError("Library not installed")
+        return genai.GenerativeModel(self.model_name).generate_content(prompt).text
+
+    def _parse_classification(self, content: str, taxonomy: CategoryTaxonomy) -> Optional[Dict]:
         data = self._parse_json(content)
         if not data: return None
-        for cat in categories:
-            if cat['id'] == data.get('id'):
-                result = cat.copy()
-                sub = data.get('subcategory')
-                result['selected_subcategory'] = sub if sub in cat['subcategories'] else cat['subcategories'][0]
-                return result
-        return None
+        return taxonomy.resolve(data.get('id'), data.get('subcategory'))
 
     def _parse_json(self, content: str) -> Dict:
         content = content.strip()
@@ -156,12 +184,7 @@ class GeminiProvider(LLMProvider):
         **IMPORTANT**: Only detect and report the following PII types: {enabled_list}
         Ignore any other types of PII that are not in this list.
 
-        Criteria for 'Sensitive' (Sigiloso):
-        - Identity Documents: CPF, RG, CNH, Passaporte, Título Eleitor, Certidões.
-        - Contact Info: Email, Telefone, Endereço, CEP.
-        - Financial Data: Conta Bancária, Cartão de Crédito, Chave PIX.
-        - Vehicles: Placas.
-        - Health & Specifics: Prontuário Médico, Dados de Paciente, Violência Doméstica.
+        {PRIVACY_CRITERIA}
 
         Return JSON:
         {{
@@ -180,22 +203,16 @@ class OpenAIProvider(LLMProvider):
         self.client = OpenAI(api_key=api_key, base_url=base_url) if OpenAI else None
         self.model_name = model_name
 
-    def classify_text(self, text: str, categories: List[Dict]) -> Optional[Dict]:
+    def classify_text(self, text: str, taxonomy: CategoryTaxonomy) -> Optional[Dict]:
         if not self.client: return None
         try:
-            cat_list = ", ".join([f"{c['id']} ({', '.join(c['subcategories'])})" for c in categories])
             response = self.client.chat.completions.create(
                 model=self.model_name,
-                messages=[{"role": "user", "content": f"Classify into JSON {{\"id\": \"Cat\", \"subcategory\": \"Sub\"}} using categories: {cat_list}\nText: {text}"}],
+                messages=[{"role": "user", "content": f"Classify into JSON {{\"id\": \"Cat\", \"subcategory\": \"Sub\"}} using categories: {taxonomy.prompt_fragment}\nText: {text}"}],
                 response_format={"type": "json_object"}
             )
             data = json.loads(response.choices[0].message.content)
-            for cat in categories:
-                if cat['id'] == data.get('id'):
-                    res = cat.copy()
-                    sub = data.get('subcategory')
-                    res['selected_subcategory'] = sub if sub in cat['subcategories'] else cat['subcategories'][0]
-                    return res
+            return taxonomy.resolve(data.get('id'), data.get('subcategory'))
         except Exception as e:
             print(f"OpenAI Error: {e}")
         return None
@@ -213,6 +230,15 @@ class OpenAIProvider(LLMProvider):
         except Exception as e:
             return {"error": str(e)}
 
+    def _complete(self, prompt: str) -> str:
+        if not self.client: raise RuntimeError("Library not installed")
+        response = self.client.chat.completions.create(
+            model=self.model_name,
+            messages=[{"role": "user", "content": prompt}],
+            response_format={"type": "json_object"}
+        )
+        return response.choices[0].message.content
+
 # --- Anthropic Provider ---
 
 class AnthropicProvider(LLMProvider):
@@ -220,25 +246,18 @@ class AnthropicProvider(LLMProvider):
         self.client = anthropic.Anthropic(api_key=api_key) if anthropic else None
         self.model_name = model_name
 
-    def classify_text(self, text: str, categories: List[Dict]) -> Optional[Dict]:
+    def classify_text(self, text: str, taxonomy: CategoryTaxonomy) -> Optional[Dict]:
         if not self.client: return None
         try:
-            cat_list = ", ".join([f"{c['id']} ({', '.join(c['subcategories'])})" for c in categories])
-            prompt = f"Classify this text into one of these categories: {cat_list}. Return ONLY JSON: {{\"id\": \"Category\", \"subcategory\": \"Subcategory\"}}.\nText: {text}"
+            prompt = f"Classify this text into one of these categories: {taxonomy.prompt_fragment}. Return ONLY JSON: {{\"id\": \"Category\", \"subcategory\": \"Subcategory\"}}.\nText: {text}"
             message = self.client.messages.create(
                 model=self.model_name, max_tokens=1000,
                 messages=[{"role": "user", "content": prompt}]
             )
             content = message.content[0].text
             data = json.loads(content[content.find('{'):content.rfind('}')+1])
-            for cat in categories:
-                if cat['id'] == data.get('id'):
-                    res = cat.copy()
-                    sub = data.get('subcategory')
-                    res['selected_subcategory'] = sub if sub in cat['subcategories'] else cat['subcategories'][0]
-                    return res
+            return taxonomy.resolve(data.get('id'), data.get('subcategory'))
         except: return None
-        return None
 
     def analyze_privacy(self, text: str, enabled_list: str) -> Dict[str, Any]:
         if not self.client: return {"error": "Library not installed"}
@@ -253,6 +272,14 @@ class AnthropicProvider(LLMProvider):
         except Exception as e:
             return {"error": str(e)}
 
+    def _complete(self, prompt: str) -> str:
+        if not self.client: raise RuntimeError("Library not installed")
+        message = self.client.messages.create(
+            model=self.model_name, max_tokens=4000,
+            messages=[{"role": "user", "content": prompt + "\nReturn ONLY JSON."}]
+        )
+        return message.content[0].text
+
 # --- Ollama Provider ---
 
 class OllamaProvider(LLMProvider):
@@ -260,21 +287,14 @@ class OllamaProvider(LLMProvider):
         self.model_name = model_name
         self.base_url = f"{base_url}/api/generate"
 
-    def classify_text(self, text: str, categories: List[Dict]) -> Optional[Dict]:
+    def classify_text(self, text: str, taxonomy: CategoryTaxonomy) -> Optional[Dict]:
         try:
-            cat_list = ", ".join([f"{c['id']} ({', '.join(c['subcategories'])})" for c in categories])
-            prompt = f"Classify into JSON {{\"id\": \"Cat\", \"subcategory\": \"Sub\"}} using: {cat_list}\nText: {text}"
+            prompt = f"Classify into JSON {{\"id\": \"Cat\", \"subcategory\": \"Sub\"}} using: {taxonomy.prompt_fragment}\nText: {text}"
             response = httpx.post(self.base_url, json={"model": self.model_name, "prompt": prompt, "stream": False, "format": "json"})
             data = response.json()
             result_json = json.loads(data['response'])
-            for cat in categories:
-                if cat['id'] == result_json.get('id'):
-                    res = cat.copy()
-                    sub = result_json.get('subcategory')
-                    res['selected_subcategory'] = sub if sub in cat['subcategories'] else cat['subcategories'][0]
-                    return res
+            return taxonomy.resolve(result_json.get('id'), result_json.get('subcategory'))
         except: return None
-        return None
 
     def analyze_privacy(self, text: str, enabled_list: str) -> Dict[str, Any]:
         try:
@@ -284,8 +304,18 @@ class OllamaProvider(LLMProvider):
         except Exception as e:
             return {"error": str(e)}
 
+    def _complete(self, prompt: str) -> str:
+        response = httpx.post(self.base_url, json={"model": self.model_name, "prompt": prompt, "stream": False, "format": "json"})
+        return response.json()['response']
+
 # --- Factory & Fallbacks ---
 
+def provider_label(provider: LLMProvider) -> str:
+    """Stored provider name, e.g. "gemini:gemini-2.0-flash"."""
+    name = type(provider).__name__.replace("Provider", "").lower()
+    model = getattr(provider, "model_name", None)
+    return f"{name}:{model}" if model else name
+
 class ProviderFactory:
     @staticmethod
     def get_provider() -> Optional[LLMProvider]:
@@ -322,84 +352,225 @@ class ProviderFactory:
 
 # --- Main Functions (Preserving Interface) ---
 
-def classify_text(text):
-    categories = load_categories()
-    provider = ProviderFactory.get_provider()
-    
-    if provider:
-        result = provider.classify_text(text, categories)
-        if result: return result
-        
-    # Fallback: Keyword Matching
-    text_lower = text.lower()
-    keywords = {
-        "denuncia": ["roubo", "corrupção", "ilegal", "desvio", "assédio", "propina", "abuso"],
-        "reclamacao": ["demora", "fila", "ruim", "quebrado", "falta", "mal atendido", "grosseiro"],
-        "sugestao": ["poderia", "sugiro", "ideia", "melhorar", "proposta", "nova"],
-        "elogio": ["ótimo", "parabéns", "excelente", "bom", "rápido", "agradecer", "eficiente"],
-        "solicitacao": ["conserto", "luz", "buraco", "poda", "lixo", "asfalto", "sinalização"],
-        "informacao": ["telefone", "onde", "quando", "horário", "documento", "como", "endereço"]
-    }
+# Keyword rules used when neither the local model nor an LLM can answer.
+# Also used by scripts/train_classifier.py as weak labels for unlabeled texts.
+KEYWORD_RULES = {
+    "denuncia": ["roubo", "corrupção", "ilegal", "desvio", "assédio", "propina", "abuso"],
+    "reclamacao": ["demora", "fila", "ruim", "quebrado", "falta", "mal atendido", "grosseiro"],
+    "sugestao": ["poderia", "sugiro", "ideia", "melhorar", "proposta", "nova"],
+    "elogio": ["ótimo", "parabéns", "excelente", "bom", "rápido", "agradecer", "eficiente"],
+    "solicitacao": ["conserto", "luz", "buraco", "poda", "lixo", "asfalto", "sinalização"],
+    "informacao": ["telefone", "onde", "quando", "horário", "documento", "como", "endereço"]
+}
+
+DEFAULT_CLASSIFIER_THRESHOLD = 0.7
+
+_keyword_automaton = KeywordAutomaton(
+    (word, (cat_id, word)) for cat_id, words in KEYWORD_RULES.items() for word in words
+)
+
+def keyword_match(text):
+    """Returns the category id with most distinct keyword hits, or None."""
+    hits = {}
+    for cat_id, word in _keyword_automaton.matched(text):
+        hits[cat_id] = hits.get(cat_id, 0) + 1
     best_match = None
     max_score = 0
-    for cat_id, words in keywords.items():
-        score = sum(1 for w in words if w in text_lower)
+    for cat_id in KEYWORD_RULES:
+        score = hits.get(cat_id, 0)
         if score > max_score:
             max_score = score
             best_match = cat_id
+    return best_match
+
+def _local_prediction(text):
+    try:
+        from local_classifier import get_local_classifier
+        model = get_local_classifier()
+        return model.predict(text) if model else None
+    except Exception as e:
+        print(f"Local classifier error: {e}")
+        return None
+
+def _category_result(taxonomy, cat_id, subcategory=None, confidence=None, source=None):
+    res = taxonomy.resolve(cat_id, subcategory)
+    if res is None:
+        return None
+    if confidence is not None:
+        res['confidence'] = confidence
+    if source:
+        res['source'] = source
+    return res
+
+def classify_text(text):
+    taxonomy = get_category_taxonomy()
+    config = {}
+    try:
+        if os.path.exists(CONFIG_FILE):
+            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+    except: pass
+    threshold = config.get('classifier_confidence_threshold', DEFAULT_CLASSIFIER_THRESHOLD)
+
+    # 1. Near-duplicate of an already classified text: reuse its category
+    duplicates = None
+    try:
+        from near_duplicate import get_near_duplicate_index, DEFAULT_THRESHOLD
+        duplicates = get_near_duplicate_index(taxonomy, config.get('near_duplicate_threshold', DEFAULT_THRESHOLD))
+        match = duplicates.lookup(text)
+        if match:
+            res = _category_result(taxonomy, match['id'], match['subcategory'], match['similarity'], "near_duplicate")
+            if res: return res
+    except Exception as e:
+        print(f"Near-duplicate index error: {e}")
+
+    # 2. Local model: only consult the LLM when it is not confident enough
+    local = _local_prediction(text)
+    if local and local['probability'] >= threshold:
+        res = _category_result(taxonomy, local['id'], local['subcategory'], local['probability'], "local")
+        if res: return res
+
+    provider = ProviderFactory.get_provider()
+    if provider:
+        result = provider.classify_text(text, taxonomy)
+        if result:
+            if duplicates is not None:
+                duplicates.add(text, result['id'], result.get('selected_subcategory', ''))
+            return result
+
+    # Fallback: low-confidence local prediction, then keyword matching
+    if local:
+        res = _category_result(taxonomy, local['id'], local['subcategory'], local['probability'], "local")
+        if res: return res
+
+    best_match = keyword_match(text)
     if best_match:
-        for cat in categories:
-            if cat['id'] == best_match:
-                res = cat.copy()
-                res['selected_subcategory'] = cat['subcategories'][0]
-                return res
+        return _category_result(taxonomy, best_match, source="keywords")
     return None
 
-def analyze_privacy(text, enabled_pii_types=None):
-    pii_pattern_map = {
-        "cpf": (r'\b\d{3}\.?\d{3}\.?\d{3}-?\d{2}\b', "CPF"),
-        "rg": (r'\b\d{1,2}\.?\d{3}\.?\d{3}-?[0-9X]\b', "RG"),
-        "email": (r'[\w.-]+@[\w.-]+\.\w+', "Email"),
-        "phone": (r'\(?0?\d{2}\)?[\s-]?9?\d{4}[\s-]\d{4}\b', "Telefone"),
-        "address": (r'(?i)(Rua|Av|Avenida|Alameda|Travessa)\s+[A-Z][a-z]+', "Endereço"), # Simplified for file size
-        "bank_account": (r'\b\d{4,5}[-\s]\d{1}\b', "Conta Bancária"),
-        "pix": (r'\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b', "PIX")
-    }
-    
-    # Load config if needed
+PII_PATTERNS = {
+    "cpf": r'\b\d{3}\.?\d{3}\.?\d{3}-?\d{2}\b',
+    "rg": r'\b\d{1,2}\.?\d{3}\.?\d{3}-?[0-9X]\b',
+    "email": r'[\w.-]+@[\w.-]+\.\w+',
+    "phone": r'\(?0?\d{2}\)?[\s-]?9?\d{4}[\s-]\d{4}\b',
+    "address": r'(?i)(Rua|Av|Avenida|Alameda|Travessa)\s+[A-Z][a-z]+', # Simplified for file size
+    "bank_account": r'\b\d{4,5}[-\s]\d{1}\b',
+    "pix": r'\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b'
+}
+_PII_REGEXES = {pii_id: re.compile(pat, re.IGNORECASE if pii_id != "address" else 0)
+                for pii_id, pat in PII_PATTERNS.items()}
+
+# Joins a batch for scanning; no pattern can match across it (not a word, space or '-' character)
+BATCH_SEPARATOR = '\x00'
+LLM_BATCH_SIZE = 16
+
+def configured_pii_types(enabled_pii_types=None):
+    """The given PII type ids, else the ones enabled in system_config.json, else every regex type."""
     if enabled_pii_types is None:
         try:
             if os.path.exists(CONFIG_FILE):
                 with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
                     enabled_pii_types = json.load(f).get('enabled_pii_types')
         except: pass
-    if enabled_pii_types is None: enabled_pii_types = list(pii_pattern_map.keys())
-
-    # Offline Check
+    if enabled_pii_types is None: enabled_pii_types = list(PII_PATTERNS.keys())
+    return enabled_pii_types
+
+def scan_pii_batch(texts, enabled_pii_types):
+    """
+    Regex PII types found in each text. Each enabled pattern runs once over
+    the whole batch (texts joined by BATCH_SEPARATOR) and its matches are
+    mapped back to their text, instead of one search per text and type.
+    """
+    joined = BATCH_SEPARATOR.join(text.replace(BATCH_SEPARATOR, ' ') for text in texts)
+    starts, offset = [], 0
+    for text in texts:
+        starts.append(offset)
+        offset += len(text) + 1
+    found = [set() for _ in texts]
+    for pii_id in enabled_pii_types:
+        regex = _PII_REGEXES.get(pii_id)
+        if regex is None:
+            continue
+        for match in regex.finditer(joined):
+            found[bisect.bisect_right(starts, match.start()) - 1].add(pii_id)
+    return found
+
+def _detected_pii(text, regex_ids, enabled_pii_types, pii_index):
+    """(display names detected offline, number of them found by regex)"""
     detected = []
     for pii_id in enabled_pii_types:
-        if pii_id in pii_pattern_map:
-            pat, name = pii_pattern_map[pii_id]
-            if re.search(pat, text, re.IGNORECASE if pii_id != "address" else 0):
-                if name not in detected: detected.append(name)
+        if pii_id in regex_ids:
+            name = pii_index.name(pii_id)
+            if name not in detected: detected.append(name)
+    regex_hits = len(detected)
+
+    # Sensitive context terms (prontuário, medida protetiva, ...): one automaton pass
+    for pii_id in pii_index.detect_context(text, enabled_pii_types):
+        name = pii_index.name(pii_id)
+        if name not in detected: detected.append(name)
+    return detected, regex_hits
+
+def _llm_result(result, provider):
+    result['category'] = get_macro_category(result.get('detected_pii', []))
+    result['tier'] = "llm"
+    result['provider'] = provider_label(provider)
+    return result
+
+def _offline_result(detected, regex_hits):
+    # Offline Result (tier: what decided the verdict)
+    if detected:
+        return {
+            "is_sensitive": True, "privacy_status": "Sigiloso",
+            "category": get_macro_category(detected),
+            "reason": f"Dados detectados via {'regex' if regex_hits else 'contexto'}: {', '.join(detected)}",
+            "detected_pii": detected,
+            "tier": "regex" if regex_hits else "context", "provider": "local"
+        }
+    return {"is_sensitive": False, "privacy_status": "Público", "category": "Público", "reason": "Nenhum dado detectado", "detected_pii": [],
+            "tier": "regex", "provider": "local"}
+
+def analyze_privacy(text, enabled_pii_types=None):
+    pii_index = get_pii_taxonomy()
+    enabled_pii_types = configured_pii_types(enabled_pii_types)
+
+    # Offline Check
+    regex_ids = {pii_id for pii_id in enabled_pii_types
+                 if pii_id in _PII_REGEXES and _PII_REGEXES[pii_id].search(text)}
+    detected, regex_hits = _detected_pii(text, regex_ids, enabled_pii_types, pii_index)
 
     provider = ProviderFactory.get_provider()
     if provider:
         enabled_list = ", ".join(detected) if detected else "todos"
         result = provider.analyze_privacy(text, enabled_list)
         if "error" not in result:
-            result['category'] = get_macro_category(result.get('detected_pii', []))
-            return result
-
-    # Offline Result
-    if detected:
-        return {
-            "is_sensitive": True, "privacy_status": "Sigiloso",
-            "category": get_macro_category(detected),
-            "reason": f"Dados detectados via regex: {', '.join(detected)}",
-            "detected_pii": detected
-        }
-    return {"is_sensitive": False, "privacy_status": "Público", "category": "Público", "reason": "Nenhum dado detectado", "detected_pii": []}
+            return _llm_result(result, provider)
+
+    return _offline_result(detected, regex_hits)
+
+def analyze_privacy_batch(texts, enabled_pii_types=None):
+    """
+    analyze_privacy for many texts: config, taxonomy and provider are loaded
+    once, the regex scan runs once per PII type over the batch, and the LLM
+    (when configured) sees LLM_BATCH_SIZE texts per call.
+    """
+    pii_index = get_pii_taxonomy()
+    enabled_pii_types = configured_pii_types(enabled_pii_types)
+    detections = [_detected_pii(text, regex_ids, enabled_pii_types, pii_index)
+                  for text, regex_ids in zip(texts, scan_pii_batch(texts, enabled_pii_types))]
+
+    results = [None] * len(texts)
+    provider = ProviderFactory.get_provider()
+    if provider:
+        for start in range(0, len(texts), LLM_BATCH_SIZE):
+            chunk = range(start, min(len(texts), start + LLM_BATCH_SIZE))
+            enabled_lists = [", ".join(detections[i][0]) if detections[i][0] else "todos" for i in chunk]
+            answers = provider.analyze_privacy_batch([texts[i] for i in chunk], enabled_lists)
+            for i, result in zip(chunk, answers):
+                if "error" not in result:
+                    results[i] = _llm_result(result, provider)
+
+    return [result if result is not None else _offline_result(*detection)
+            for result, detection in zip(results, detections)]
 
 def classify_and_filter(text, enabled_pii_types=None):
     return analyze_privacy(text, enabled_pii_types=enabled_pii_types)
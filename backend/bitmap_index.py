@@ -0,0 +1,423 @@
+"""
+Bitmap Indexes for Dashboard Slices
+-----------------------------------
+In-memory compressed bitmaps (roaring-style) of row sequence numbers, one per
+privacy status, macro category, PII type and day, so that filter combinations
+such as "Sigiloso AND Dados Bancários AND last 7 days" are evaluated with
+bitmap AND/OR/NOT and counted without reading any row. A time window is the
+OR of its days' bitmaps; only a first or last day cut by a bound finer than a
+date (e.g. `days`, which starts at the current time) is read from the store's
+timestamp index.
+
+RoaringBitmap splits the 32-bit seq space into 2^16 chunks; each chunk is a
+sorted array('H') while sparse (<= 4096 values) and an int bitset once dense.
+
+The index lives per process and catches up from the classification store
+(rows with seq > last seen) before every query, so every uvicorn worker sees
+the rows written by the others.
+"""
+import json
+import threading
+import datetime
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+from taxonomy import get_pii_taxonomy
+
+ARRAY_MAX = 4096
+CHUNK_BITS = 16
+CHUNK_SIZE = 1 << CHUNK_BITS
+CHUNK_MASK = CHUNK_SIZE - 1
+
+MAX_DAYS = 36500
+
+Container = Union[array, int]
+
+
+def _bits_from_array(values: Iterable[int]) -> int:
+    buf = bytearray(CHUNK_SIZE // 8)
+    for lo in values:
+        buf[lo >> 3] |= 1 << (lo & 7)
+    return int.from_bytes(buf, 'little')
+
+
+def _array_from_bits(bits: int) -> array:
+    out = array('H')
+    buf = bits.to_bytes(CHUNK_SIZE // 8, 'little')
+    for i, byte in enumerate(buf):
+        while byte:
+            low = byte & -byte
+            out.append((i << 3) + low.bit_length() - 1)
+            byte ^= low
+    return out
+
+
+def _normalize(container: Container) -> Optional[Container]:
+    """Array while sparse, bitset while dense; None when empty."""
+    if isinstance(container, int):
+        n = container.bit_count()
+        if n == 0:
+            return None
+        return _array_from_bits(container) if n <= ARRAY_MAX else container
+    if not container:
+        return None
+    return _bits_from_array(container) if len(container) > ARRAY_MAX else container
+
+
+def _copy(container: Container) -> Container:
+    # ints are immutable; arrays are appended to in place by add()
+    return array('H', container) if isinstance(container, array) else container
+
+
+def _cardinality(container: Container) -> int:
+    return container.bit_count() if isinstance(container, int) else len(container)
+
+
+def _and(a: Container, b: Container) -> Optional[Container]:
+    if isinstance(a, int) and isinstance(b, int):
+        return _normalize(a & b)
+    if isinstance(a, int):
+        a, b = b, a
+    if isinstance(b, int):
+        buf = b.to_bytes(CHUNK_SIZE // 8, 'little')
+        return _normalize(array('H', (lo for lo in a if buf[lo >> 3] >> (lo & 7) & 1)))
+    return _normalize(array('H', sorted(set(a).intersection(b))))
+
+
+def _or(a: Container, b: Container) -> Container:
+    if isinstance(a, int) or isinstance(b, int) or len(a) + len(b) > ARRAY_MAX:
+        a_bits = a if isinstance(a, int) else _bits_from_array(a)
+        b_bits = b if isinstance(b, int) else _bits_from_array(b)
+        return _normalize(a_bits | b_bits)
+    return _normalize(array('H', sorted(set(a).union(b))))
+
+
+def _andnot(a: Container, b: Container) -> Optional[Container]:
+    if isinstance(a, int):
+        b_bits = b if isinstance(b, int) else _bits_from_array(b)
+        return _normalize(a & ~b_bits)
+    if isinstance(b, int):
+        buf = b.to_bytes(CHUNK_SIZE // 8, 'little')
+        return _normalize(array('H', (lo for lo in a if not buf[lo >> 3] >> (lo & 7) & 1)))
+    return _normalize(array('H', sorted(set(a).difference(b))))
+
+
+class RoaringBitmap:
+    """Set of non-negative ints stored as per-chunk arrays or bitsets."""
+
+    __slots__ = ('_chunks',)
+
+    def __init__(self, values: Iterable[int] = ()):
+        self._chunks: Dict[int, Container] = {}
+        for value in values:
+            self.add(value)
+
+    @classmethod
+    def from_range(cls, start: int, stop: int) -> "RoaringBitmap":
+        """All values in [start, stop)."""
+        bitmap = cls()
+        value = max(0, start)
+        while value < stop:
+            hi = value >> CHUNK_BITS
+            lo, hi_end = value & CHUNK_MASK, min(stop, (hi + 1) << CHUNK_BITS)
+            width = hi_end - value
+            container = _normalize(((1 << width) - 1) << lo)
+            if container is not None:
+                bitmap._chunks[hi] = container
+            value = hi_end
+        return bitmap
+
+    def add(self, value: int):
+        hi, lo = value >> CHUNK_BITS, value & CHUNK_MASK
+        container = self._chunks.get(hi)
+        if container is None:
+            self._chunks[hi] = array('H', [lo])
+        elif isinstance(container, int):
+            self._chunks[hi] = container | (1 << lo)
+        else:
+            # Rows arrive in seq order, so this is almost always an append
+            if container[-1] < lo:
+                container.append(lo)
+            else:
+                i = bisect_left(container, lo)
+                if i < len(container) and container[i] == lo:
+                    return
+                container.insert(i, lo)
+            if len(container) > ARRAY_MAX:
+                self._chunks[hi] = _bits_from_array(container)
+
+    def __contains__(self, value: int) -> bool:
+        container = self._chunks.get(value >> CHUNK_BITS)
+        if container is None:
+            return False
+        lo = value & CHUNK_MASK
+        if isinstance(container, int):
+            return bool(container >> lo & 1)
+        i = bisect_left(container, lo)
+        return i < len(container) and container[i] == lo
+
+    def __len__(self) -> int:
+        return sum(_cardinality(c) for c in self._chunks.values())
+
+    def __iter__(self) -> Iterator[int]:
+        for hi in sorted(self._chunks):
+            container = self._chunks[hi]
+            base = hi << CHUNK_BITS
+            for lo in (_array_from_bits(container) if isinstance(container, int) else container):
+                yield base + lo
+
+    def _combine(self, other: "RoaringBitmap", op, keep_left: bool, keep_right: bool) -> "RoaringBitmap":
+        result = RoaringBitmap()
+        for hi in self._chunks.keys() | other._chunks.keys():
+            a, b = self._chunks.get(hi), other._chunks.get(hi)
+            if a is not None and b is not None:
+                container = op(a, b)
+            elif a is not None:
+                container = _copy(a) if keep_left else None
+            else:
+                container = _copy(b) if keep_right else None
+            if container is not None:
+                result._chunks[hi] = container
+        return result
+
+    def __and__(self, other: "RoaringBitmap") -> "RoaringBitmap":
+        return self._combine(other, _and, False, False)
+
+    def __or__(self, other: "RoaringBitmap") -> "RoaringBitmap":
+        return self._combine(other, _or, True, True)
+
+    def __sub__(self, other: "RoaringBitmap") -> "RoaringBitmap":
+        return self._combine(other, _andnot, True, False)
+
+    def and_cardinality(self, other: "RoaringBitmap") -> int:
+        """len(self & other) without building the result."""
+        total = 0
+        for hi, a in self._chunks.items():
+            b = other._chunks.get(hi)
+            if b is not None:
+                container = _and(a, b)
+                if container is not None:
+                    total += _cardinality(container)
+        return total
+
+    def memory_bytes(self) -> int:
+        total = 0
+        for container in self._chunks.values():
+            total += container.itemsize * len(container) if isinstance(container, array) else (container.bit_length() + 7) // 8
+        return total
+
+
+# --- Dashboard index ---
+
+DIMENSIONS = ('privacy', 'macro', 'pii')
+
+
+class BitmapIndex:
+    """Bitmaps of row seqs per (dimension, value), kept in step with the store."""
+
+    def __init__(self):
+        self._bitmaps: Dict[tuple, RoaringBitmap] = {}
+        # Day (timestamp[:10]) -> seqs; seq order is not time order, so windows use these
+        self._days: Dict[str, RoaringBitmap] = {}
+        self.all = RoaringBitmap()
+        self.last_seq = 0
+        self.purges = 0
+        self._lock = threading.RLock()
+
+    def add(self, seq: int, privacy_status: str, macro_category: str, pii_names: Iterable[str] = (),
+            timestamp: Optional[str] = None):
+        keys = [('privacy', privacy_status), ('macro', macro_category)] + [('pii', name) for name in pii_names]
+        for key in keys:
+            bitmap = self._bitmaps.get(key)
+            if bitmap is None:
+                bitmap = self._bitmaps[key] = RoaringBitmap()
+            bitmap.add(seq)
+        if timestamp is not None:
+            day = self._days.get(timestamp[:10])
+            if day is None:
+                day = self._days[timestamp[:10]] = RoaringBitmap()
+            day.add(seq)
+        self.all.add(seq)
+        self.last_seq = max(self.last_seq, seq)
+
+    def catch_up(self, store) -> int:
+        """Indexes rows written (by any worker) since the last call and drops purged ones."""
+        with self._lock:
+            from storage import pii_names_for
+            purges = store.purges()
+            if purges != self.purges:
+                if self.last_seq:  # nothing to drop before the first load
+                    self._keep_only(RoaringBitmap(store.seqs_between()))
+                self.purges = purges
+            added = 0
+            columns = ['seq', 'timestamp', 'category', 'privacy_reason', 'privacy_status', 'macro_category',
+                       'detected_pii']
+            for row in store.iter_after(self.last_seq, columns):
+                pii = pii_names_for(row['privacy_status'], row['category'], row['privacy_reason'], row['detected_pii'])
+                self.add(row['seq'], row['privacy_status'], row['macro_category'], pii, row['timestamp'])
+                added += 1
+            return added
+
+    def _keep_only(self, live: RoaringBitmap):
+        """Removes seqs not in `live` (rows deleted by a retention purge)."""
+        self.all = self.all & live
+        self._bitmaps = {key: bitmap & live for key, bitmap in self._bitmaps.items()}
+        self._bitmaps = {key: bitmap for key, bitmap in self._bitmaps.items() if len(bitmap)}
+        self._days = {day: bitmap & live for day, bitmap in self._days.items()}
+        self._days = {day: bitmap for day, bitmap in self._days.items() if len(bitmap)}
+
+    def bitmap(self, dimension: str, value: str) -> RoaringBitmap:
+        return self._bitmaps.get((dimension, value), RoaringBitmap())
+
+    def values(self, dimension: str) -> List[str]:
+        return sorted(value for dim, value in self._bitmaps if dim == dimension)
+
+    def evaluate(self, expr: Dict, store) -> RoaringBitmap:
+        """
+        Filter expression -> bitmap of matching seqs. Expressions are dicts:
+          {"privacy": "Sigiloso"}, {"macro": "Dados Bancários"}, {"pii": "CPF"}
+            (a list value means any of them)
+          {"days": 7}, {"since": "2026-01-01", "until": "2026-02-01"}
+          {"and": [expr, ...]}, {"or": [expr, ...]}, {"not": expr}
+        Several keys in one dict are AND-ed.
+        """
+        if not isinstance(expr, dict) or not expr:
+            raise ValueError(f"Filtro inválido: {expr!r}")
+        parts = []
+        for key, value in expr.items():
+            if key == 'and' or key == 'or':
+                if not isinstance(value, list) or not value:
+                    raise ValueError(f"'{key}' espera uma lista de filtros")
+                subs = [self.evaluate(e, store) for e in value]
+                result = subs[0]
+                for sub in subs[1:]:
+                    result = (result & sub) if key == 'and' else (result | sub)
+                parts.append(result)
+            elif key == 'not':
+                parts.append(self.all - self.evaluate(value, store))
+            elif key in DIMENSIONS:
+                values = value if isinstance(value, list) else [value]
+                result = RoaringBitmap()
+                for v in values:
+                    result = result | self.bitmap(key, self._canonical(key, v))
+                parts.append(result)
+            elif key == 'days':
+                since = datetime.datetime.now() - datetime.timedelta(days=_days(value))
+                parts.append(self._time_range(store, since.isoformat(), None))
+            elif key == 'since':
+                parts.append(self._time_range(store, _timestamp(value), _timestamp(expr.get('until'))))
+            elif key == 'until':
+                if 'since' not in expr:
+                    parts.append(self._time_range(store, None, _timestamp(value)))
+            else:
+                raise ValueError(f"Campo de filtro desconhecido: {key}")
+        result = parts[0]
+        for part in parts[1:]:
+            result = result & part
+        return result
+
+    @staticmethod
+    def _canonical(dimension: str, value: str) -> str:
+        if dimension == 'pii':
+            entry = get_pii_taxonomy().lookup(value)
+            return entry['name'] if entry else value
+        if dimension == 'privacy':
+            from storage import normalize_privacy
+            return normalize_privacy(value)
+        return value
+
+    def _time_range(self, store, since: Optional[str], until: Optional[str]) -> RoaringBitmap:
+        """
+        Rows logged between `since` and `until` (inclusive prefix, as in the CSV
+        export and the timeseries): whole days from the day bitmaps; a day cut
+        by a bound finer than a date comes from the timestamp index.
+        """
+        fine_since = since is not None and len(since) > 10
+        fine_until = until is not None and len(until) > 10
+        result = RoaringBitmap()
+        for day, bitmap in self._days.items():
+            if since is not None and (day <= since[:10] if fine_since else day < since):
+                continue
+            if until is not None and (day >= until[:10] if fine_until else day[:len(until)] > until):
+                continue
+            result = result | bitmap
+        if fine_since:
+            # The first day, from `since` to the end of that day (or `until`, if sooner)
+            first_until = min((u for u in (until, since[:10]) if u), key=lambda u: u + '\U0010ffff')
+            result = result | (RoaringBitmap(store.seqs_between(since, first_until)) & self.all)
+        if fine_until and not (fine_since and since[:10] == until[:10]):
+            # The last day, from its start (or `since`, if later) to `until`
+            last_since = max(s for s in (since, until[:10]) if s)
+            result = result | (RoaringBitmap(store.seqs_between(last_since, until)) & self.all)
+        return result
+
+    def counts(self, bitmap: RoaringBitmap) -> Dict:
+        """Dashboard counters of a slice, from bitmap intersections only."""
+        out = {"total_count": len(bitmap), "privacy_counts": {}, "category_counts": {}, "pii_counts": {}}
+        names = {'privacy': 'privacy_counts', 'macro': 'category_counts', 'pii': 'pii_counts'}
+        for (dimension, value), other in self._bitmaps.items():
+            n = bitmap.and_cardinality(other)
+            if n:
+                out[names[dimension]][value] = n
+        return out
+
+    def slice(self, expr: Optional[Dict], store) -> Dict:
+        """Catches up with the store, then evaluates `expr` (every row when None) and counts the slice."""
+        with self._lock:
+            self.catch_up(store)
+            return self.counts(self.all if expr is None else self.evaluate(expr, store))
+
+    def stats(self) -> Dict:
+        return {
+            "rows": len(self.all),
+            "last_seq": self.last_seq,
+            "bitmaps": len(self._bitmaps) + len(self._days),
+            "memory_bytes": self.all.memory_bytes() + sum(
+                b.memory_bytes() for b in (*self._bitmaps.values(), *self._days.values())),
+        }
+
+
+def _days(value) -> float:
+    """A `days` filter value: a number of days between 0 and MAX_DAYS."""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"'days' deve ser um número: {value!r}")
+    try:
+        days = float(value)
+    except ValueError:
+        raise ValueError(f"'days' deve ser um número: {value!r}")
+    if not 0 <= days <= MAX_DAYS:
+        raise ValueError(f"'days' deve estar entre 0 e {MAX_DAYS}")
+    return days
+
+
+def _timestamp(value) -> Optional[str]:
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f"Data inválida: {value!r}")
+    return value
+
+
+def parse_filter(raw: str) -> Dict:
+    """JSON filter expression from a query parameter."""
+    try:
+        expr = json.loads(raw)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Filtro JSON inválido: {e}")
+    if not isinstance(expr, dict):
+        raise ValueError("O filtro deve ser um objeto JSON")
+    return expr
+
+
+_index: Optional[BitmapIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_bitmap_index() -> BitmapIndex:
+    """Process-wide index; call `slice`/`catch_up` with the store to bring it up to date."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = BitmapIndex()
+        return _index
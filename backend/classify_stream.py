@@ -0,0 +1,167 @@
+"""
+Streaming Batch Classification
+------------------------------
+Backs POST /api/classify/batch: NDJSON requests in, NDJSON results out,
+written as each chunk of texts finishes (not in input order; every result
+carries the `index` of its input line).
+
+- The request body is read line by line and grouped into chunks; a chunk is
+  classified with one analyze_privacy_batch call in a worker thread (one
+  regex pass per PII type, LLM micro-batches).
+- At most `concurrency` chunks are classified at once.
+- Backpressure: the chunk queue and the result queue are bounded, so when
+  the client uploads faster than we classify (or reads results slower), the
+  reader stops pulling the request body and memory stays at a few chunks.
+- A line longer than MAX_LINE_BYTES is skipped (reported as an error)
+  without being buffered.
+- NDJSONStreamingResponse streams the results while the body is still being
+  read (Starlette's StreamingResponse would compete with the body reader for
+  ASGI `receive` messages to watch for a disconnect).
+"""
+import asyncio
+import json
+import time
+import uuid
+from typing import AsyncIterator, Callable, Dict, List, Optional, Union
+
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+
+CHUNK_SIZE = 32
+DEFAULT_CONCURRENCY = 4
+MAX_CONCURRENCY = 16
+MAX_LINE_BYTES = 1 << 20
+
+_DONE = object()
+
+
+async def iter_lines(chunks: AsyncIterator[bytes],
+                     max_line_bytes: int = MAX_LINE_BYTES) -> AsyncIterator[Union[bytes, ValueError]]:
+    """Lines of a streamed body; an over-long line yields a ValueError instead."""
+    buffer = bytearray()
+    skipping = False
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b'\n', start)
+            if end < 0:
+                if not skipping:
+                    buffer += chunk[start:]
+                    if len(buffer) > max_line_bytes:
+                        buffer.clear()
+                        skipping = True
+                break
+            if skipping:
+                skipping = False
+                yield ValueError(f"Linha maior que {max_line_bytes} bytes")
+            else:
+                buffer += chunk[start:end]
+                yield bytes(buffer)
+                buffer.clear()
+            start = end + 1
+    if skipping:
+        yield ValueError(f"Linha maior que {max_line_bytes} bytes")
+    elif buffer:
+        yield bytes(buffer)
+
+
+def parse_item(line: Union[bytes, ValueError]) -> Dict:
+    """{"text", "id"} from one NDJSON line (an object with `text`, or a bare JSON string)."""
+    if isinstance(line, ValueError):
+        raise line
+    try:
+        item = json.loads(line)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"JSON inválido ({e})")
+    if isinstance(item, str):
+        item = {"text": item}
+    if not isinstance(item, dict) or not isinstance(item.get('text'), str):
+        raise ValueError("Item deve ter o campo 'text'")
+    item_id = item.get('id')
+    return {"text": item['text'], "id": str(item_id) if item_id is not None else str(uuid.uuid4())}
+
+
+def _line(result: Dict) -> bytes:
+    return json.dumps(result, ensure_ascii=False).encode('utf-8') + b'\n'
+
+
+async def classify_stream(lines: AsyncIterator[Union[bytes, ValueError]],
+                          classify_batch: Callable[[List[str]], List[Dict]],
+                          concurrency: int = DEFAULT_CONCURRENCY,
+                          chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """
+    NDJSON result lines for the input lines. `classify_batch(texts)` runs in
+    a worker thread and returns one result dict per text.
+    """
+    concurrency = max(1, min(int(concurrency), MAX_CONCURRENCY))
+    chunks: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+    results: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+    failure: List[Optional[Exception]] = [None]
+
+    async def read():
+        chunk, index = [], 0
+        try:
+            async for line in lines:
+                if isinstance(line, bytes) and not line.strip():
+                    continue
+                try:
+                    chunk.append((index, parse_item(line)))
+                except ValueError as e:
+                    await results.put([{"index": index, "id": None, "status": "error", "detail": str(e)}])
+                index += 1
+                if len(chunk) >= chunk_size:
+                    await chunks.put(chunk)
+                    chunk = []
+            if chunk:
+                await chunks.put(chunk)
+        except Exception as e:
+            failure[0] = e
+        for _ in range(concurrency):
+            await chunks.put(_DONE)
+
+    async def work():
+        while True:
+            chunk = await chunks.get()
+            if chunk is _DONE:
+                await results.put(_DONE)
+                return
+            started = time.perf_counter()
+            try:
+                answers = await asyncio.to_thread(classify_batch, [item['text'] for _, item in chunk])
+                latency_ms = round((time.perf_counter() - started) * 1000 / len(chunk), 2)
+                out = [{"index": index, "id": item['id'], "status": "ok", **answer, "latency_ms": latency_ms}
+                       for (index, item), answer in zip(chunk, answers)]
+            except Exception as e:
+                print(f"Batch classification error: {e}")
+                out = [{"index": index, "id": item['id'], "status": "error", "detail": str(e)}
+                       for index, item in chunk]
+            await results.put(out)
+
+    tasks = [asyncio.create_task(read())] + [asyncio.create_task(work()) for _ in range(concurrency)]
+    try:
+        finished = 0
+        while finished < concurrency:
+            out = await results.get()
+            if out is _DONE:
+                finished += 1
+                continue
+            yield b''.join(_line(result) for result in out)
+        if failure[0] is not None:
+            yield _line({"index": None, "id": None, "status": "error", "detail": f"Leitura interrompida: {failure[0]}"})
+    finally:
+        for task in tasks:  # client gone: stop reading and classifying
+            task.cancel()
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """
+    Streams without a disconnect listener: the request body is read by the
+    stream itself, which sees the disconnect (and a closed socket fails the send).
+    """
+    media_type = 'application/x-ndjson'
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
@@ -0,0 +1,136 @@
+"""
+CSV Export
+----------
+Streaming, compressed and conditional export of the classification log
+(/data/classifications.csv).
+
+- The body is generated from the store in chunks (optionally filtered by
+  since / until / privacy through the storage indexes) and gzip-compressed
+  on the fly when the client accepts it. gzip output is deterministic (zlib
+  writes no timestamp), so the same rows always produce the same bytes.
+- The ETag is derived from the store's state (last seq, retention mark), the
+  filters and the encoding, so it is computed without reading the rows and
+  `If-None-Match` / `If-Modified-Since` can be answered with 304. The body
+  stops at the last seq of that state, so it always matches its ETag.
+- Range requests (resuming a download) are served from an export file built
+  once per ETag under data/exports/; only the newest few are kept, and
+  none touched in the last few minutes is removed.
+"""
+import email.utils
+import datetime
+import hashlib
+import os
+import time
+import zlib
+from typing import Dict, Iterator, Optional
+
+from storage import DATA_DIR, ClassificationStore
+
+EXPORTS_DIR = os.path.join(DATA_DIR, 'exports')
+MAX_CACHED_EXPORTS = 8
+PRUNE_GRACE_SECONDS = 300
+GZIP_LEVEL = 6
+
+
+def export_filters(since: Optional[str] = None, until: Optional[str] = None,
+                   privacy: Optional[str] = None) -> Dict[str, Optional[str]]:
+    return {"since": since or None, "until": until or None, "privacy": privacy or None}
+
+
+def export_etag(state, filters: Dict, gzipped: bool) -> str:
+    """ETag of an export of the store in `state` (from `store.export_state()`)."""
+    last_seq, purges, _ = state
+    key = f"{last_seq}|{purges}|{filters['since']}|{filters['until']}|{filters['privacy']}|{int(gzipped)}"
+    return '"' + hashlib.sha1(key.encode('utf-8')).hexdigest()[:20] + '"'
+
+
+def last_modified(state) -> Optional[str]:
+    """HTTP date of the newest row (stored timestamps are local time)."""
+    _, _, timestamp = state
+    if not timestamp:
+        return None
+    try:
+        return email.utils.formatdate(datetime.datetime.fromisoformat(timestamp).timestamp(), usegmt=True)
+    except ValueError:
+        return None
+
+
+def not_modified(headers, etag: str, modified: Optional[str]) -> bool:
+    """True when the client's copy (If-None-Match, else If-Modified-Since) is current."""
+    if_none_match = headers.get('if-none-match')
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or etag in tags or f"W/{etag}" in tags
+    if_modified_since = headers.get('if-modified-since')
+    if if_modified_since and modified:
+        try:
+            return email.utils.parsedate_to_datetime(modified) <= email.utils.parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def iter_export(store: ClassificationStore, state, filters: Dict, gzipped: bool) -> Iterator[bytes]:
+    """
+    The export body in chunks, gzip-compressed when `gzipped`. Rows written
+    after `state` was taken are left out, so the body always matches its ETag.
+    """
+    rows = store.iter_export(filters['since'], filters['until'], filters['privacy'], through_seq=state[0])
+    chunks = store.iter_csv(rows)
+    if not gzipped:
+        for chunk in chunks:
+            yield chunk.encode('utf-8')
+        return
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _write_export(path: str, store: ClassificationStore, state, filters: Dict, gzipped: bool) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        for chunk in iter_export(store, state, filters, gzipped):
+            f.write(chunk)
+    os.replace(tmp_path, path)
+
+
+def prune_exports(keep: str) -> None:
+    """
+    Drop all but the newest MAX_CACHED_EXPORTS files. Files touched within
+    PRUNE_GRACE_SECONDS are kept, since another worker may have just handed
+    them to a FileResponse that has not opened them yet. Files that vanish
+    mid-scan (pruned by another worker) are skipped.
+    """
+    cached = []
+    for name in os.listdir(EXPORTS_DIR):
+        if name.endswith('.tmp'):
+            continue
+        path = os.path.join(EXPORTS_DIR, name)
+        try:
+            cached.append((os.stat(path).st_mtime, path))
+        except OSError:
+            continue
+    cutoff = time.time() - PRUNE_GRACE_SECONDS
+    cached.sort(reverse=True)
+    for mtime, old in cached[MAX_CACHED_EXPORTS:]:
+        if old != keep and mtime < cutoff:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+def export_file(store: ClassificationStore, state, filters: Dict, gzipped: bool) -> str:
+    """Path of the export for this state, written once (for Range requests); prunes old exports."""
+    etag = export_etag(state, filters, gzipped)
+    os.makedirs(EXPORTS_DIR, exist_ok=True)
+    path = os.path.join(EXPORTS_DIR, etag.strip('"') + ('.csv.gz' if gzipped else '.csv'))
+    try:
+        os.utime(path)  # most recently used: kept by the pruning below
+    except FileNotFoundError:
+        _write_export(path, store, state, filters, gzipped)
+    prune_exports(keep=path)
+    return path
@@ -0,0 +1,121 @@
+"""
+Submission Dedupe Index
+-----------------------
+Makes writes idempotent on the submission id: a replayed /api/submit (mobile
+retries, the simulation flow) must not add a second row.
+
+- A scalable Bloom filter over every stored id answers "definitely new" from
+  memory for almost all submissions; only a "maybe seen" answer (a real
+  replay, or a ~1% false positive) costs an exact lookup on the id index.
+- The filter grows by stacking a new layer of twice the capacity when the
+  current one is full, so it never has to be rebuilt.
+- Checks run inside the store's write transaction: before each batch the
+  filter catches up with ids written by other workers (a primary-key range
+  read of the rows past the last seq seen), so the check is exact across
+  processes.
+"""
+import hashlib
+import math
+import sqlite3
+import threading
+from typing import Dict, List
+
+FALSE_POSITIVE_RATE = 0.01
+INITIAL_CAPACITY = 4096
+
+
+class BloomFilter:
+    """Fixed-capacity Bloom filter (double hashing over one BLAKE2b digest)."""
+
+    def __init__(self, capacity: int, error_rate: float = FALSE_POSITIVE_RATE):
+        self.capacity = max(1, capacity)
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key: str):
+        new = False
+        for pos in self._positions(key):
+            mask = 1 << (pos & 7)
+            if not self.bits[pos >> 3] & mask:
+                self.bits[pos >> 3] |= mask
+                new = True
+        if new:  # re-adding a key (e.g. on catch-up) does not use capacity
+            self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class DedupeIndex:
+    """Scalable Bloom filter of stored submission ids, kept in step with the store."""
+
+    def __init__(self, initial_capacity: int = INITIAL_CAPACITY):
+        self._layers: List[BloomFilter] = [BloomFilter(initial_capacity)]
+        self.last_seq = 0
+        self.loaded = False
+        self.exact_checks = 0
+        self.bloom_negatives = 0
+        self.duplicates = 0
+        self._lock = threading.Lock()
+
+    def add(self, key: str):
+        layer = self._layers[-1]
+        if layer.count >= layer.capacity:
+            layer = BloomFilter(layer.capacity * 2)
+            self._layers.append(layer)
+        layer.add(key)
+
+    def might_contain(self, key: str) -> bool:
+        return any(key in layer for layer in self._layers)
+
+    def catch_up(self, conn: sqlite3.Connection):
+        """
+        Adds ids committed since the last call (all of them on first use); call
+        inside the write transaction. Only committed rows advance `last_seq`:
+        the seq of a rolled-back insert is reused by the next one.
+        """
+        with self._lock:
+            if not self.loaded:
+                total = conn.execute("SELECT COUNT(*) FROM classifications").fetchone()[0]
+                self._layers = [BloomFilter(max(INITIAL_CAPACITY, 2 * total))]
+                self.loaded = True
+            for key, seq in conn.execute("SELECT id, seq FROM classifications WHERE seq > ? ORDER BY seq",
+                                         (self.last_seq,)):
+                if not self.might_contain(key):
+                    self.add(key)
+                self.last_seq = seq
+
+    def is_duplicate(self, conn: sqlite3.Connection, key: str) -> bool:
+        """Exact answer; reads the id index only when the filter says the id may exist."""
+        with self._lock:
+            if not self.might_contain(key):
+                self.bloom_negatives += 1
+                return False
+            self.exact_checks += 1
+            found = conn.execute("SELECT 1 FROM classifications WHERE id = ? LIMIT 1", (key,)).fetchone() is not None
+            if found:
+                self.duplicates += 1
+            return found
+
+    def record(self, key: str):
+        """Notes an id inserted in the current transaction."""
+        with self._lock:
+            self.add(key)
+
+    def stats(self) -> Dict:
+        return {
+            "layers": len(self._layers),
+            "ids": sum(layer.count for layer in self._layers),
+            "memory_bytes": sum(len(layer.bits) for layer in self._layers),
+            "bloom_negatives": self.bloom_negatives,
+            "exact_checks": self.exact_checks,
+            "duplicates": self.duplicates,
+        }
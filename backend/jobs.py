@@ -0,0 +1,431 @@
+"""
+Bulk Classification Jobs
+------------------------
+Long reprocessing runs outside a single HTTP request: submit a file
+(CSV/XLSX/NDJSON) or "reprocess the whole log", get a job id, poll progress,
+throughput and ETA, then download the results (NDJSON).
+
+Each job lives in data/jobs/<id>/:
+- job.json      state and checkpoint (replaced atomically)
+- upload.<fmt>  the uploaded file; input.ndjson is its normalized form
+                ({"row", "id", "text"} per line), built once
+- results.ndjson
+- cancel        marker file asking the runner to stop the job
+
+Checkpoints: after each chunk the results are appended and fsynced, then
+job.json records the input cursor (byte offset in input.ndjson, or the last
+log seq for reprocessing) and the results file size. A job interrupted by a
+crash or restart is picked up again at startup: the results file is cut back
+to the checkpointed size (dropping a chunk written after the last
+checkpoint) and the job continues from the cursor, so every input row
+appears in the results exactly once.
+
+Reprocessing reads the log up to the last seq at submission and reports the
+new verdict next to the stored one; it does not rewrite the log.
+
+Jobs run one at a time on a background thread. With several server workers,
+a per-job file lock keeps a job on one process (POSIX only), and only the
+worker holding the maintenance lease (main.py) resumes interrupted jobs.
+"""
+import csv
+import datetime
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterator, List, Optional
+
+from storage import DATA_DIR, ClassificationStore, get_store
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+JOBS_DIR = os.path.join(DATA_DIR, 'jobs')
+CHUNK_SIZE = 256
+
+KIND_FILE = "file"
+KIND_REPROCESS = "reprocess"
+INPUT_FORMATS = ('csv', 'xlsx', 'ndjson')
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+ACTIVE_STATUSES = (STATUS_QUEUED, STATUS_RUNNING)
+
+# Column names recognised as the request text in spreadsheets (case-insensitive)
+TEXT_COLUMN_HINTS = ("TEXTO", "MANIFESTAÇÃO", "DESCRIÇÃO", "TEXT")
+
+
+def input_format(filename: Optional[str], content_type: Optional[str] = None) -> Optional[str]:
+    """csv/xlsx/ndjson from the file extension or the content type."""
+    ext = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    if ext == 'jsonl':
+        ext = 'ndjson'
+    if ext in INPUT_FORMATS:
+        return ext
+    content_type = (content_type or '').lower()
+    if 'ndjson' in content_type or 'jsonl' in content_type:
+        return 'ndjson'
+    if 'spreadsheetml' in content_type:
+        return 'xlsx'
+    if 'csv' in content_type:
+        return 'csv'
+    return None
+
+
+def _text_column(header: List[str], requested: Optional[str] = None) -> int:
+    names = [str(name or '').strip() for name in header]
+    if requested:
+        if requested not in names:
+            raise ValueError(f"Coluna '{requested}' não encontrada")
+        return names.index(requested)
+    for i, name in enumerate(names):
+        if any(hint in name.upper() for hint in TEXT_COLUMN_HINTS):
+            return i
+    # Fallback used by the e-SIC scripts: second column if available, else the first
+    return 1 if len(names) > 1 else 0
+
+
+def _table_items(rows: Iterator[list], text_column: Optional[str]) -> Iterator[Dict]:
+    header = next(rows, None)
+    if header is None:
+        return
+    text_index = _text_column(header, text_column)
+    names = [str(name or '').strip().lower() for name in header]
+    id_index = names.index('id') if 'id' in names else None
+    for row_number, row in enumerate(rows, 1):
+        text = row[text_index] if text_index < len(row) else None
+        if text is None or str(text).strip() == '':
+            continue
+        item_id = row[id_index] if id_index is not None and id_index < len(row) else None
+        yield {"row": row_number, "id": str(item_id) if item_id not in (None, '') else str(uuid.uuid4()),
+               "text": str(text)}
+
+
+def iter_input(path: str, fmt: str, text_column: Optional[str] = None) -> Iterator[Dict]:
+    """Normalized {"row", "id", "text"} items (or {"row", "error"}) of an uploaded file."""
+    if fmt == 'csv':
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            sample = f.read(4096)
+            f.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+            except csv.Error:
+                dialect = csv.excel
+            yield from _table_items(csv.reader(f, dialect), text_column)
+    elif fmt == 'xlsx':
+        import openpyxl
+        workbook = openpyxl.load_workbook(path, read_only=True)
+        try:
+            rows = (list(row) for row in workbook.worksheets[0].iter_rows(values_only=True))
+            yield from _table_items(rows, text_column)
+        finally:
+            workbook.close()
+    elif fmt == 'ndjson':
+        from classify_stream import parse_item
+        with open(path, 'rb') as f:
+            for row_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield {"row": row_number, **parse_item(line)}
+                except ValueError as e:
+                    yield {"row": row_number, "error": str(e)}
+    else:
+        raise ValueError(f"Formato não suportado: {fmt}")
+
+
+def describe(state: Dict) -> Dict:
+    """Job state as returned by the API, with progress, throughput and ETA."""
+    view = {k: v for k, v in state.items() if k not in ('cursor', 'results_bytes', 'enabled_pii_types')}
+    view['elapsed_s'] = round(state.get('elapsed_s', 0.0), 3)
+    total, processed = state.get('total'), state.get('processed', 0)
+    elapsed = state.get('elapsed_s', 0.0)
+    rate = processed / elapsed if elapsed > 0 else None
+    view['progress'] = round(processed / total, 4) if total else (1.0 if state['status'] == STATUS_DONE else 0.0)
+    view['throughput_per_s'] = round(rate, 2) if rate else None
+    view['eta_s'] = round((total - processed) / rate, 1) if rate and total and state['status'] in ACTIVE_STATUSES else None
+    return view
+
+
+class JobManager:
+    """Creates, runs (one background thread) and resumes jobs stored under `directory`."""
+
+    def __init__(self, store: ClassificationStore, directory: str = JOBS_DIR,
+                 classify: Optional[Callable[[List[str], Optional[List[str]]], List[Dict]]] = None,
+                 chunk_size: int = CHUNK_SIZE):
+        self.store = store
+        self.directory = directory
+        self.chunk_size = max(1, int(chunk_size))
+        self._classify = classify
+        self._queue: "queue.Queue" = queue.Queue()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    # --- State on disk ---
+
+    def _path(self, job_id: str, name: str = '') -> str:
+        return os.path.join(self.directory, job_id, name)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        if not job_id or os.path.basename(job_id) != job_id:
+            return None
+        try:
+            with open(self._path(job_id, 'job.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, state: Dict):
+        path = self._path(state['id'], 'job.json')
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def list(self) -> List[Dict]:
+        jobs = [self.get(name) for name in os.listdir(self.directory)]
+        return sorted((job for job in jobs if job), key=lambda job: job['created_at'], reverse=True)
+
+    def results_path(self, job_id: str) -> str:
+        return self._path(job_id, 'results.ndjson')
+
+    # --- Submission ---
+
+    def _new(self, kind: str, enabled_pii_types: Optional[List[str]], **fields) -> Dict:
+        from ai_service import configured_pii_types
+        job_id = uuid.uuid4().hex[:12]
+        os.makedirs(self._path(job_id))
+        state = {
+            "id": job_id, "kind": kind, "status": STATUS_QUEUED,
+            "created_at": datetime.datetime.now().isoformat(), "started_at": None, "finished_at": None,
+            # Snapshot, so a resumed job keeps classifying with the same settings
+            "enabled_pii_types": configured_pii_types(enabled_pii_types),
+            "total": None, "processed": 0, "errors": 0, "elapsed_s": 0.0,
+            "cursor": 0, "results_bytes": 0, "error": None, **fields
+        }
+        return state
+
+    def create_file_job(self, upload_path: str, fmt: str, filename: Optional[str] = None,
+                        text_column: Optional[str] = None, enabled_pii_types: Optional[List[str]] = None) -> Dict:
+        """Takes ownership of `upload_path` (moved into the job directory) and queues the job."""
+        if fmt not in INPUT_FORMATS:
+            raise ValueError(f"Formato não suportado: {fmt}")
+        state = self._new(KIND_FILE, enabled_pii_types, format=fmt, filename=filename,
+                          text_column=text_column, prepared=False)
+        os.replace(upload_path, self._path(state['id'], f"upload.{fmt}"))
+        self._save(state)
+        self._enqueue(state['id'])
+        return state
+
+    def create_reprocess_job(self, enabled_pii_types: Optional[List[str]] = None) -> Dict:
+        """Queues a pass over every row logged so far (rows logged later are not included)."""
+        last_seq, _, _ = self.store.export_state()
+        state = self._new(KIND_REPROCESS, enabled_pii_types, through_seq=last_seq, changed=0)
+        state['total'] = self.store.count()
+        self._save(state)
+        self._enqueue(state['id'])
+        return state
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        state = self.get(job_id)
+        if state and state['status'] in ACTIVE_STATUSES:
+            open(self._path(job_id, 'cancel'), 'w').close()
+        return state
+
+    def resume(self, job_id: str) -> Optional[Dict]:
+        """Queues a failed or cancelled job again, from its last checkpoint."""
+        state = self.get(job_id)
+        if state and state['status'] in (STATUS_FAILED, STATUS_CANCELLED):
+            if os.path.exists(self._path(job_id, 'cancel')):
+                os.remove(self._path(job_id, 'cancel'))
+            state.update(status=STATUS_QUEUED, error=None, finished_at=None)
+            self._save(state)
+            self._enqueue(job_id)
+        return state
+
+    def resume_pending(self) -> List[str]:
+        """Queues jobs left queued/running by a previous process (call at startup)."""
+        pending = [job['id'] for job in reversed(self.list()) if job['status'] in ACTIVE_STATUSES]
+        for job_id in pending:
+            self._enqueue(job_id)
+        return pending
+
+    # --- Runner thread ---
+
+    def _enqueue(self, job_id: str):
+        self._queue.put(job_id)
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run_loop, name="bulk-jobs", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stops after the current chunk; the running job stays resumable."""
+        with self._lock:
+            thread = self._thread
+            if thread is None or not thread.is_alive():
+                return
+            self._stopping.set()
+            self._queue.put(None)
+        thread.join(timeout)
+
+    def wait(self):
+        """Blocks until every queued job has been processed (tests, scripts)."""
+        self._queue.join()
+
+    def _run_loop(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                if job_id is None or self._stopping.is_set():
+                    return
+                self.run(job_id)
+            except Exception as e:
+                print(f"Error running job {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def run(self, job_id: str):
+        """Runs (or resumes) one job to completion in the calling thread."""
+        state = self.get(job_id)
+        if state is None or state['status'] not in ACTIVE_STATUSES:
+            return
+        with open(self._path(job_id, 'lock'), 'w') as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return  # another worker process is running it
+            state = self.get(job_id)  # re-read under the lock
+            if state['status'] not in ACTIVE_STATUSES:
+                return
+            try:
+                self._execute(state)
+            except Exception as e:
+                print(f"Job {job_id} failed: {e}")
+                state.update(status=STATUS_FAILED, error=str(e), finished_at=datetime.datetime.now().isoformat())
+                self._save(state)
+
+    def _execute(self, state: Dict):
+        job_id = state['id']
+        if state['status'] == STATUS_QUEUED:
+            state.update(status=STATUS_RUNNING, started_at=state['started_at'] or datetime.datetime.now().isoformat())
+            self._save(state)
+        if state['kind'] == KIND_FILE and not state.get('prepared'):
+            self._prepare(state)
+
+        classify = self._classify
+        if classify is None:
+            from ai_service import analyze_privacy_batch as classify
+        chunks = self._file_chunks(state) if state['kind'] == KIND_FILE else self._log_chunks(state)
+
+        # Drop results written after the last checkpoint (crash between append and checkpoint)
+        with open(self.results_path(job_id), 'ab') as out:
+            out.truncate(state['results_bytes'])
+        with open(self.results_path(job_id), 'ab') as out:
+            for items, cursor in chunks:
+                if self._stopping.is_set():
+                    return
+                if os.path.exists(self._path(job_id, 'cancel')):
+                    state.update(status=STATUS_CANCELLED, finished_at=datetime.datetime.now().isoformat())
+                    self._save(state)
+                    return
+                started = time.perf_counter()
+                lines = self._classify_chunk(state, items, classify)
+                out.write(b''.join(json.dumps(line, ensure_ascii=False).encode('utf-8') + b'\n' for line in lines))
+                out.flush()
+                os.fsync(out.fileno())
+                state['elapsed_s'] += time.perf_counter() - started
+                state.update(cursor=cursor, results_bytes=out.tell(), processed=state['processed'] + len(items))
+                self._save(state)
+
+        state.update(status=STATUS_DONE, finished_at=datetime.datetime.now().isoformat())
+        self._save(state)
+        print(f"Job {job_id} done: {state['processed']} rows")
+
+    def _classify_chunk(self, state: Dict, items: List[Dict], classify) -> List[Dict]:
+        valid = [item for item in items if 'error' not in item]
+        answers = iter(classify([item['text'] for item in valid], state['enabled_pii_types']) if valid else [])
+        lines = []
+        for item in items:
+            if 'error' in item:
+                state['errors'] += 1
+                lines.append({"row": item['row'], "id": None, "status": "error", "detail": item['error']})
+                continue
+            result = next(answers)
+            if state['kind'] == KIND_FILE:
+                lines.append({"row": item['row'], "id": item['id'], "status": "ok", **result})
+            else:
+                changed = result.get('privacy_status') != item['privacy_status']
+                state['changed'] += int(changed)
+                lines.append({"seq": item['seq'], "id": item['id'], "status": "ok",
+                              "previous_privacy_status": item['privacy_status'],
+                              "previous_detected_pii": item['detected_pii'], **result, "changed": changed})
+        return lines
+
+    # --- Inputs ---
+
+    def _prepare(self, state: Dict):
+        """Normalizes the upload into input.ndjson once (redone if interrupted)."""
+        path = self._path(state['id'], 'input.ndjson')
+        tmp_path = f"{path}.tmp"
+        total = 0
+        with open(tmp_path, 'wb') as f:
+            for item in iter_input(self._path(state['id'], f"upload.{state['format']}"), state['format'],
+                                   state.get('text_column')):
+                f.write(json.dumps(item, ensure_ascii=False).encode('utf-8') + b'\n')
+                total += 1
+        os.replace(tmp_path, path)
+        state.update(prepared=True, total=total, cursor=0)
+        self._save(state)
+
+    def _file_chunks(self, state: Dict) -> Iterator:
+        with open(self._path(state['id'], 'input.ndjson'), 'rb') as f:
+            f.seek(state['cursor'])
+            while True:
+                items = [json.loads(line) for line in itertools.islice(f, self.chunk_size)]
+                if not items:
+                    return
+                yield items, f.tell()
+
+    def _log_chunks(self, state: Dict) -> Iterator:
+        rows = self.store.iter_after(state['cursor'], ['id', 'text_snippet', 'privacy_status', 'detected_pii'],
+                                     block_size=self.chunk_size)
+        rows = itertools.takewhile(lambda row: row['seq'] <= state['through_seq'], rows)
+        while True:
+            block = list(itertools.islice(rows, self.chunk_size))
+            if not block:
+                return
+            items = [{"seq": row['seq'], "id": row['id'], "text": row['text_snippet'] or '',
+                      "privacy_status": row['privacy_status'],
+                      "detected_pii": json.loads(row['detected_pii']) if row['detected_pii'] else []}
+                     for row in block]
+            yield items, block[-1]['seq']
+
+
+# --- Process-wide manager ---
+
+_manager: Optional[JobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = JobManager(get_store())
+    return _manager
@@ -0,0 +1,96 @@
+"""
+Keyword Automaton
+-----------------
+Aho-Corasick multi-keyword matcher. All keywords are found in a single
+left-to-right pass over the text, independent of how many keywords there are.
+
+Matching is accent- and case-insensitive ("prontuario" matches "Prontuário");
+hit positions are reported in the coordinates of the original text.
+"""
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from text_utils import fold_text, fold_with_offsets
+
+
+class KeywordAutomaton:
+    """
+    Built once from (keyword, payload) pairs (a bare string is its own payload).
+    Several keywords may share a payload, e.g. all context terms of one PII type.
+    """
+
+    def __init__(self, keywords: Iterable[Union[str, Tuple[str, Any]]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[Tuple[int, Any], ...]] = [()]
+        self.payloads: Set[Any] = set()
+
+        for item in keywords:
+            keyword, payload = (item, item) if isinstance(item, str) else item
+            folded = fold_text(keyword).strip()
+            if folded:
+                self._insert(folded, payload)
+        self._build_failure_links()
+
+    def _insert(self, keyword: str, payload: Any):
+        state = 0
+        for ch in keyword:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] += ((len(keyword), payload),)
+        self.payloads.add(payload)
+
+    def _build_failure_links(self):
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+    def __len__(self):
+        return len(self._goto)
+
+    def iter_matches(self, text: str, whole_words: bool = False) -> Iterator[Tuple[int, int, Any]]:
+        """Yields (start, end, payload) for every keyword occurrence, in text order of their end."""
+        if not text:
+            return
+        folded, offsets = fold_with_offsets(text)
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(folded):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length, payload in out[state]:
+                start = i - length + 1
+                if whole_words and (
+                    (start > 0 and folded[start - 1].isalnum()) or
+                    (i + 1 < len(folded) and folded[i + 1].isalnum())
+                ):
+                    continue
+                yield offsets[start], offsets[i] + 1, payload
+
+    def find_all(self, text: str, whole_words: bool = False) -> List[Tuple[int, int, Any]]:
+        """All hits as (start, end, payload) in original-text coordinates."""
+        return list(self.iter_matches(text, whole_words))
+
+    def matched(self, text: str, whole_words: bool = False) -> Set[Any]:
+        """Distinct payloads found in the text."""
+        return {payload for _, _, payload in self.iter_matches(text, whole_words)}
+
+    def contains_any(self, text: str, accept: Optional[Set[Any]] = None, whole_words: bool = False) -> bool:
+        """True at the first hit whose payload is in `accept` (any hit when None)."""
+        for _, _, payload in self.iter_matches(text, whole_words):
+            if accept is None or payload in accept:
+                return True
+        return False
@@ -0,0 +1,253 @@
+"""
+Local Manifestation Classifier
+------------------------------
+Small offline model used by `ai_service.classify_text` before any LLM call.
+
+Features are hashed word uni/bi-grams plus character n-grams (accent-folded),
+weighted with TF-IDF and L2-normalized. Two linear softmax heads are trained
+offline (see scripts/train_classifier.py): one over categories and one over
+subcategories, the latter masked to the subcategories of the chosen category.
+
+The trained model is stored as a compressed .npz artifact in data/ and loaded
+once per process; inference is a handful of NumPy row lookups.
+"""
+import os
+import json
+import re
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from text_utils import fold_text
+
+MODEL_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'classifier_model.npz')
+
+N_FEATURES = 2 ** 15
+CHAR_NGRAMS = (3, 4)
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def _hash(term: str, n_features: int) -> int:
+    return zlib.crc32(term.encode('utf-8')) % n_features
+
+
+def extract_features(text: str, n_features: int = N_FEATURES) -> Dict[int, float]:
+    """Returns raw term counts keyed by hashed feature index."""
+    tokens = _TOKEN_RE.findall(fold_text(text))
+    counts: Dict[int, float] = {}
+
+    grams = list(tokens)
+    grams.extend(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    for tok in tokens:
+        padded = f" {tok} "
+        for n in CHAR_NGRAMS:
+            grams.extend("#" + padded[i:i + n] for i in range(len(padded) - n + 1))
+
+    for g in grams:
+        idx = _hash(g, n_features)
+        counts[idx] = counts.get(idx, 0.0) + 1.0
+    return counts
+
+
+def _softmax(z: np.ndarray) -> np.ndarray:
+    z = z - z.max(axis=-1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+class LocalClassifier:
+    """Hashed TF-IDF + linear softmax classifier for manifestation categories."""
+
+    def __init__(self, idf: np.ndarray, cat_weights: np.ndarray, cat_bias: np.ndarray,
+                 sub_weights: np.ndarray, sub_bias: np.ndarray,
+                 categories: List[str], subcategories: List[Tuple[str, str]]):
+        self.idf = idf.astype(np.float32)
+        self.cat_weights = cat_weights.astype(np.float32)
+        self.cat_bias = cat_bias.astype(np.float32)
+        self.sub_weights = sub_weights.astype(np.float32)
+        self.sub_bias = sub_bias.astype(np.float32)
+        self.categories = list(categories)
+        self.subcategories = list(subcategories)  # (category_id, subcategory) pairs
+        self.n_features = int(idf.shape[0])
+
+        self._sub_mask = {}
+        for cat_index, cat_id in enumerate(self.categories):
+            mask = np.full(len(self.subcategories), -np.inf, dtype=np.float32)
+            for j, (owner, _) in enumerate(self.subcategories):
+                if owner == cat_id:
+                    mask[j] = 0.0
+            self._sub_mask[cat_index] = mask
+
+    # --- Vectorization ---
+
+    def vectorize(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the sparse TF-IDF vector as (indices, values)."""
+        counts = extract_features(text, self.n_features)
+        if not counts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        idx = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        tf = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        values = (1.0 + np.log(tf)) * self.idf[idx]
+        norm = np.linalg.norm(values)
+        if norm > 0:
+            values /= norm
+        return idx, values
+
+    # --- Inference ---
+
+    def predict(self, text: str) -> Optional[Dict]:
+        """
+        Returns {"id", "subcategory", "probability", "subcategory_probability"}
+        or None when the text has no usable features.
+        """
+        idx, values = self.vectorize(text)
+        if idx.size == 0:
+            return None
+
+        cat_probs = _softmax(values @ self.cat_weights[idx] + self.cat_bias)
+        cat_index = int(cat_probs.argmax())
+
+        sub_scores = values @ self.sub_weights[idx] + self.sub_bias + self._sub_mask[cat_index]
+        sub_probs = _softmax(sub_scores)
+        sub_index = int(sub_probs.argmax())
+
+        return {
+            "id": self.categories[cat_index],
+            "subcategory": self.subcategories[sub_index][1],
+            "probability": float(cat_probs[cat_index]),
+            "subcategory_probability": float(sub_probs[sub_index]),
+        }
+
+    # --- Serialization ---
+
+    def save(self, path: str = MODEL_FILE):
+        meta = {
+            "version": 1,
+            "n_features": self.n_features,
+            "char_ngrams": list(CHAR_NGRAMS),
+            "categories": self.categories,
+            "subcategories": self.subcategories,
+        }
+        np.savez_compressed(
+            path,
+            meta=np.array(json.dumps(meta, ensure_ascii=False)),
+            idf=self.idf.astype(np.float16),
+            cat_weights=self.cat_weights.astype(np.float16),
+            cat_bias=self.cat_bias,
+            sub_weights=self.sub_weights.astype(np.float16),
+            sub_bias=self.sub_bias,
+        )
+
+    @classmethod
+    def load(cls, path: str = MODEL_FILE) -> "LocalClassifier":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            return cls(
+                idf=data['idf'], cat_weights=data['cat_weights'], cat_bias=data['cat_bias'],
+                sub_weights=data['sub_weights'], sub_bias=data['sub_bias'],
+                categories=meta['categories'],
+                subcategories=[tuple(s) for s in meta['subcategories']],
+            )
+
+
+# --- Training ---
+
+def _csr_matrix(rows: List[Dict[int, float]], idf: np.ndarray):
+    """Builds the L2-normalized TF-IDF matrix as sparse (row ids, cols, values) triplets."""
+    row_ids, cols, vals = [], [], []
+    for i, counts in enumerate(rows):
+        idx = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        tf = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        v = (1.0 + np.log(tf)) * idf[idx]
+        norm = np.linalg.norm(v)
+        if norm > 0:
+            v /= norm
+        row_ids.append(np.full(idx.size, i, dtype=np.int64))
+        cols.append(idx)
+        vals.append(v.astype(np.float32))
+    return np.concatenate(row_ids), np.concatenate(cols), np.concatenate(vals)
+
+
+def _fit_softmax(X, n_rows: int, n_features: int, y: np.ndarray, n_classes: int,
+                 epochs: int = 60, lr: float = 2.0, l2: float = 1e-4) -> Tuple[np.ndarray, np.ndarray]:
+    """Full-batch gradient descent on the multinomial logistic loss over a sparse matrix."""
+    row_ids, cols, vals = X
+    W = np.zeros((n_features, n_classes), dtype=np.float32)
+    b = np.zeros(n_classes, dtype=np.float32)
+    Y = np.eye(n_classes, dtype=np.float32)[y]
+    for _ in range(epochs):
+        scores = np.zeros((n_rows, n_classes), dtype=np.float32)
+        np.add.at(scores, row_ids, vals[:, None] * W[cols])
+        G = (_softmax(scores + b) - Y) / n_rows
+        grad = np.zeros_like(W)
+        np.add.at(grad, cols, vals[:, None] * G[row_ids])
+        W -= lr * (grad + l2 * W)
+        b -= lr * G.sum(axis=0)
+    return W, b
+
+
+def train(samples: List[Tuple[str, str, str]], taxonomy: List[Dict],
+          n_features: int = N_FEATURES, epochs: int = 60) -> LocalClassifier:
+    """
+    Trains a classifier from (text, category_id, subcategory) samples.
+    `taxonomy` is the list of categories from data/categories.json.
+    Samples with unknown categories are ignored; unknown subcategories only
+    contribute to the category head.
+    """
+    categories = [c['id'] for c in taxonomy]
+    subcategories = [(c['id'], s) for c in taxonomy for s in c['subcategories']]
+    cat_pos = {cid: i for i, cid in enumerate(categories)}
+    sub_pos = {pair: i for i, pair in enumerate(subcategories)}
+
+    samples = [s for s in samples if s[1] in cat_pos]
+    if not samples:
+        raise ValueError("Nenhum exemplo rotulado com categoria conhecida")
+
+    rows = [extract_features(text, n_features) for text, _, _ in samples]
+    df = np.zeros(n_features, dtype=np.float32)
+    for counts in rows:
+        df[list(counts.keys())] += 1.0
+    idf = np.log((1.0 + len(rows)) / (1.0 + df)) + 1.0
+
+    y_cat = np.array([cat_pos[c] for _, c, _ in samples])
+    cat_w, cat_b = _fit_softmax(_csr_matrix(rows, idf), len(rows), n_features,
+                                y_cat, len(categories), epochs=epochs)
+
+    sub_rows = [i for i, (_, c, s) in enumerate(samples) if (c, s) in sub_pos]
+    sub_w = np.zeros((n_features, len(subcategories)), dtype=np.float32)
+    sub_b = np.zeros(len(subcategories), dtype=np.float32)
+    if sub_rows:
+        y_sub = np.array([sub_pos[(samples[i][1], samples[i][2])] for i in sub_rows])
+        sub_w, sub_b = _fit_softmax(_csr_matrix([rows[i] for i in sub_rows], idf), len(sub_rows),
+                                    n_features, y_sub, len(subcategories), epochs=epochs)
+
+    return LocalClassifier(idf, cat_w, cat_b, sub_w, sub_b, categories, subcategories)
+
+
+# --- Process-wide instance ---
+
+_model: Optional[LocalClassifier] = None
+_model_loaded = False
+
+
+def get_local_classifier() -> Optional[LocalClassifier]:
+    """Loads the artifact on first use; returns None if it was never trained."""
+    global _model, _model_loaded
+    if not _model_loaded:
+        _model_loaded = True
+        try:
+            if os.path.exists(MODEL_FILE):
+                _model = LocalClassifier.load(MODEL_FILE)
+        except Exception as e:
+            print(f"Error loading local classifier: {e}")
+            _model = None
+    return _model
+
+
+def reload_local_classifier() -> Optional[LocalClassifier]:
+    """Drops the cached model so the next call re-reads the artifact."""
+    global _model, _model_loaded
+    _model, _model_loaded = None, False
+    return get_local_classifier()
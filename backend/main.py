@@ -1,10 +1,12 @@
-from fastapi import FastAPI, HTTPException, Header
+from fastapi import FastAPI, HTTPException, Header, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 import os
 import sys
-import csv
+import asyncio
+import base64
+import time
 import datetime
 import uuid
 from typing import List, Optional
@@ -14,6 +16,8 @@ import json
 sys.path.append(os.path.dirname(__file__))
 
 from ai_service import classify_text
+from taxonomy import get_pii_taxonomy
+from storage import get_store
 
 app = FastAPI(title="Participa DF API")
 
@@ -38,171 +42,416 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def load_local_models():
+    """Loads the local classifier artifact once, before the first request."""
+    from local_classifier import get_local_classifier
+    get_local_classifier()
+    # Opens the SQLite log (and imports a legacy classifications.csv once)
+    get_store()
+
+    from write_behind import configure_submission_logger
+    config = await get_config()
+    configure_submission_logger(
+        config.get('submit_durability', 'group'),
+        config.get('submit_batch_size', 200),
+        config.get('submit_flush_ms', 10)
+    )
+    global log_maintenance_task
+    log_maintenance_task = asyncio.create_task(log_maintenance_loop())
+    asyncio.create_task(load_columnar_cache())
+
+async def load_columnar_cache():
+    """Fills the dashboard's columnar cache in the background; queries catch up on their own."""
+    from columnar_cache import get_columnar_cache
+    try:
+        await asyncio.to_thread(get_columnar_cache().catch_up, get_store())
+    except Exception as e:
+        print(f"Error loading columnar cache: {e}")
+
+# Seals finished days into data/segments/ and applies LGPD retention (retention_days > 0)
+LOG_MAINTENANCE_INTERVAL = 3600
+log_maintenance_task = None
+
+# With several workers (WEB_CONCURRENCY > 1) only the holder of this lease in the
+# store resumes interrupted jobs and runs the log maintenance. It renews the lease
+# every LEADER_RENEW_INTERVAL seconds; if it dies, another worker takes over once
+# LEADER_LEASE_TTL has passed.
+LEADER_LEASE = "maintenance"
+LEADER_RENEW_INTERVAL = 60
+LEADER_LEASE_TTL = 180
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+async def run_log_maintenance():
+    from segments import SegmentArchive
+    from parquet_export import ParquetExporter, parquet_available
+    try:
+        config = await get_config()
+        archive = SegmentArchive(get_store())
+        result = await asyncio.to_thread(archive.run_maintenance, config.get('retention_days', 0))
+        if parquet_available():
+            # Day files for the analytics export, converted once per sealed day
+            result["parquet"] = await asyncio.to_thread(ParquetExporter(archive).sync)
+        if result["sealed"] or result.get("retention", {}).get("rows"):
+            print(f"Log maintenance: {result}")
+    except Exception as e:
+        print(f"Error in log maintenance: {e}")
+
+async def log_maintenance_loop():
+    from jobs import get_job_manager
+    leader, maintenance, last_run = False, None, None
+    while True:
+        try:
+            was_leader = leader
+            leader = await asyncio.to_thread(get_store().acquire_lease, LEADER_LEASE, WORKER_ID, LEADER_LEASE_TTL)
+            if leader and not was_leader:
+                # Bulk jobs interrupted by a crash/restart continue from their last checkpoint
+                resumed = get_job_manager().resume_pending()
+                if resumed:
+                    print(f"Resuming bulk jobs: {resumed}")
+            due = last_run is None or time.monotonic() - last_run >= LOG_MAINTENANCE_INTERVAL
+            if leader and due and (maintenance is None or maintenance.done()):
+                # Not awaited: the lease keeps being renewed while a long seal runs
+                last_run = time.monotonic()
+                maintenance = asyncio.create_task(run_log_maintenance())
+        except Exception as e:
+            print(f"Error in log maintenance: {e}")
+        await asyncio.sleep(LEADER_RENEW_INTERVAL)
+
+@app.on_event("shutdown")
+async def drain_submission_queue():
+    """Flushes queued submissions before the process exits."""
+    from write_behind import get_submission_logger
+    from jobs import get_job_manager
+    if log_maintenance_task is not None:
+        log_maintenance_task.cancel()
+    await asyncio.to_thread(get_submission_logger().stop)
+    # The running job stops after its current chunk and resumes on the next start
+    await asyncio.to_thread(get_job_manager().stop, 30)
+    # Lets another worker take over the maintenance right away
+    await asyncio.to_thread(get_store().release_lease, LEADER_LEASE, WORKER_ID)
+
 # Input model
 class ClassificationRequest(BaseModel):
     text: str
     enabled_pii_types: Optional[List[str]] = None  # Optional list of enabled PII type IDs
 
-# --- CSV Logging Setup ---
-# backend/main.py -> ../data/classifications.csv
-LOG_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'classifications.csv')
+# --- Classification Log Setup ---
+# backend/main.py -> ../data/classifications.db (SQLite, see storage.py)
 CONFIG_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'system_config.json')
 
-def log_to_csv(data):
+# Structured detection fields sent back by clients (see analyze_privacy)
+DETECTION_TIERS = ("regex", "context", "llm")
+MAX_PROVIDER_LENGTH = 100
+MAX_DETECTED_PII = 32
+MAX_PII_LABEL_LENGTH = 100
+
+def submission_record(data):
     """
-    Logs classification result to CSV.
+    Classification result as a log record.
     Fields: id, timestamp, type, category, privacy, privacy_reason, text_snippet
+    Raises ValueError when the structured detection fields are out of bounds.
     """
-    file_exists = os.path.exists(LOG_FILE)
-    
     # Ensure id is present
-    submission_id = data.get('id', str(uuid.uuid4()))
-    
-    with open(LOG_FILE, mode='a', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        if not file_exists:
-            writer.writerow(['id', 'timestamp', 'type', 'category', 'privacy', 'privacy_reason', 'text_snippet'])
-            
-        writer.writerow([
-            submission_id,
-            datetime.datetime.now().isoformat(),
-            data.get('type', 'Texto'),
-            data.get('category', 'Geral'),
-            data.get('privacy', 'Desconhecido'),
-            data.get('reason', ''),
-            data.get('text', '') # Full text
-        ])
-    return submission_id
+    record = dict(data)
+    record['id'] = data.get('id') or str(uuid.uuid4())
+    record['timestamp'] = datetime.datetime.now().isoformat()
+
+    if record.get('tier') is not None and record['tier'] not in DETECTION_TIERS:
+        raise ValueError(f"tier inválido (use {', '.join(DETECTION_TIERS)})")
+    if record.get('provider') is not None and len(record['provider']) > MAX_PROVIDER_LENGTH:
+        raise ValueError(f"provider maior que {MAX_PROVIDER_LENGTH} caracteres")
+    latency = record.get('latency_ms')
+    if latency is not None and not 0 <= latency < float('inf'):
+        raise ValueError("latency_ms deve ser um número não negativo")
+    detected = record.get('detected_pii')
+    if detected is not None:
+        if len(detected) > MAX_DETECTED_PII or any(len(label) > MAX_PII_LABEL_LENGTH for label in detected):
+            raise ValueError(f"detected_pii aceita até {MAX_DETECTED_PII} tipos de até {MAX_PII_LABEL_LENGTH} caracteres")
+        record['detected_pii'] = list(dict.fromkeys(detected))
+    return record
+
+def log_to_csv(data):
+    """
+    Logs classification result to the classification store synchronously
+    (name kept from the CSV log; /data/classifications.csv exports the same layout).
+    /api/submit goes through the write-behind logger instead.
+    """
+    return get_store().insert(submission_record(data))
 
 @app.get("/data/classifications.csv")
-async def download_csv(x_admin_password: Optional[str] = Header(None)):
+async def download_csv(request: Request, x_admin_password: Optional[str] = Header(None),
+                       since: Optional[str] = None, until: Optional[str] = None, privacy: Optional[str] = None):
     """
-    Endpoint to download the CSV file.
+    Endpoint to download the classification log as CSV (exported from the store).
+    Streams gzip when accepted, answers If-None-Match/If-Modified-Since with 304
+    and serves Range requests (resumed downloads). `since`/`until` (ISO) and
+    `privacy` export only the matching rows.
     """
     if x_admin_password != "admin123":
         raise HTTPException(status_code=403, detail="Acesso negado")
     
+    from fastapi.responses import FileResponse, Response, StreamingResponse
+    import csv_export
+    store = get_store()
+    filters = csv_export.export_filters(since, until, privacy if privacy != "Todos" else None)
+    gzipped = 'gzip' in request.headers.get('accept-encoding', '').lower()
+    state = await asyncio.to_thread(store.export_state)
+    etag = csv_export.export_etag(state, filters, gzipped)
+    headers = {
+        "Content-Disposition": 'attachment; filename="classifications.csv"',
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Vary": "Accept-Encoding",
+        "Cache-Control": "private, no-cache"
+    }
+    modified = csv_export.last_modified(state)
+    if modified:
+        headers["Last-Modified"] = modified
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+
+    if csv_export.not_modified(request.headers, etag, modified):
+        return Response(status_code=304, headers={k: v for k, v in headers.items() if k != "Content-Encoding"})
+    if request.headers.get('range'):
+        # Byte ranges need a fixed body: built once per ETag, then served from disk
+        path = await asyncio.to_thread(csv_export.export_file, store, state, filters, gzipped)
+        return FileResponse(path, media_type='text/csv', headers=headers)
+    return StreamingResponse(csv_export.iter_export(store, state, filters, gzipped), media_type='text/csv', headers=headers)
+
+@app.get("/api/export/parquet")
+async def download_parquet(x_admin_password: Optional[str] = Header(None), day: Optional[str] = None):
+    """
+    Classification history as Parquet (typed, dictionary-encoded columns,
+    timestamp statistics per row group). `day` (AAAA-MM-DD) returns the file
+    of one sealed day; otherwise every day plus today's rows. Needs pyarrow.
+    """
+    if x_admin_password != "admin123":
+        raise HTTPException(status_code=403, detail="Acesso negado")
+
     from fastapi.responses import FileResponse
-    if os.path.exists(LOG_FILE):
-        return FileResponse(
-            LOG_FILE, 
-            media_type='text/csv',
-            filename='classifications.csv'
-        )
+    from parquet_export import ParquetExporter, parquet_available
+    from segments import SegmentArchive
+    if not parquet_available():
+        raise HTTPException(status_code=503, detail="Exportação Parquet indisponível: instale pyarrow (pip install pyarrow)")
+
+    exporter = ParquetExporter(SegmentArchive(get_store()))
+    if day:
+        await asyncio.to_thread(exporter.sync)
+        path = exporter.segment_path(day)
+        if not os.path.exists(path):
+            raise HTTPException(status_code=404, detail="Dia não encontrado entre os segmentos selados")
+        filename = os.path.basename(path)
     else:
-        raise HTTPException(status_code=404, detail="CSV file not found")
+        path = await asyncio.to_thread(exporter.export)
+        filename = "classifications.parquet"
+    return FileResponse(path, media_type='application/vnd.apache.parquet', filename=filename)
+
+@app.get("/api/near-duplicate-stats")
+async def get_near_duplicate_stats(x_admin_password: Optional[str] = Header(None)):
+    """
+    Hit rate and memory of the near-duplicate classification index.
+    """
+    if x_admin_password != "admin123":
+        raise HTTPException(status_code=403, detail="Acesso negado")
+
+    from taxonomy import get_category_taxonomy
+    from near_duplicate import get_near_duplicate_index, DEFAULT_THRESHOLD
+    config = await get_config()
+    index = get_near_duplicate_index(get_category_taxonomy(), config.get('near_duplicate_threshold', DEFAULT_THRESHOLD))
+    return index.stats()
+
+@app.get("/api/dashboard-slice")
+async def get_dashboard_slice(
+    x_admin_password: Optional[str] = Header(None),
+    privacy: Optional[str] = None,
+    macro: Optional[str] = None,
+    pii: Optional[List[str]] = Query(None),
+    days: Optional[float] = None,
+    filter: Optional[str] = None
+):
+    """
+    Dashboard counters for a combination of filters, evaluated on bitmap indexes
+    (no row is read). Simple parameters are AND-ed, e.g.
+    ?privacy=Sigiloso&macro=Dados Bancários&days=7. `filter` takes a JSON
+    expression with and/or/not, e.g. {"or": [{"pii": "CPF"}, {"macro": "Dados de Saúde"}]}.
+    """
+    if x_admin_password != "admin123":
+        raise HTTPException(status_code=403, detail="Acesso negado")
+
+    from bitmap_index import get_bitmap_index, parse_filter
+    clauses = []
+    if privacy and privacy != "Todos": clauses.append({"privacy": privacy})
+    if macro: clauses.append({"macro": macro})
+    if pii: clauses.append({"pii": pii})
+    if days: clauses.append({"days": days})
+    try:
+        if filter: clauses.append(parse_filter(filter))
+        expr = {"and": clauses} if clauses else None
+        # catch_up reads new rows (and the time filters query SQLite): off the event loop
+        return await asyncio.to_thread(get_bitmap_index().slice, expr, get_store())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/dashboard-groupby")
+async def get_dashboard_groupby(
+    x_admin_password: Optional[str] = Header(None),
+    group_by: str = "macro",
+    privacy: Optional[str] = None,
+    macro: Optional[str] = None,
+    category: Optional[str] = None,
+    pii: Optional[List[str]] = Query(None),
+    tier: Optional[str] = None,
+    provider: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None
+):
+    """
+    Ad-hoc counts and mean latency grouped by privacy, macro, category, pii,
+    tier, provider, day or hour, computed on the in-memory columnar cache.
+    """
+    if x_admin_password != "admin123":
+        raise HTTPException(status_code=403, detail="Acesso negado")
+
+    from columnar_cache import get_columnar_cache
+    cache = get_columnar_cache()
+    filters = {"privacy": privacy if privacy != "Todos" else None, "macro": macro, "category": category,
+               "pii": pii, "tier": tier, "provider": provider, "since": since, "until": until}
+    def query():
+        cache.catch_up(get_store())
+        return cache.group_by(group_by, **filters)
+
+    try:
+        # Both hold the cache lock (the startup load can hold it for a while): off the event loop
+        return await asyncio.to_thread(query)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# A 90-day hourly chart is 2,160 buckets
+MAX_TIMESERIES_BUCKETS = 2200
+TIMESERIES_STEP = {"hour": (datetime.timedelta(hours=1), "%Y-%m-%dT%H"), "day": (datetime.timedelta(days=1), "%Y-%m-%d")}
+
+@app.get("/api/dashboard-timeseries")
+async def get_dashboard_timeseries(
+    x_admin_password: Optional[str] = Header(None),
+    granularity: str = "day",
+    days: float = 30,
+    start: Optional[str] = None,
+    end: Optional[str] = None
+):
+    """
+    Trend chart data from the hourly/daily rollups: one entry per bucket
+    (zero-filled) with total, privacy, macro category and PII type counts.
+    The range is `start`..`end` (ISO) or the last `days` days.
+    """
+    if x_admin_password != "admin123":
+        raise HTTPException(status_code=403, detail="Acesso negado")
+    if granularity not in TIMESERIES_STEP:
+        raise HTTPException(status_code=400, detail="granularity deve ser 'hour' ou 'day'")
+
+    step, fmt = TIMESERIES_STEP[granularity]
+    try:
+        end_dt = datetime.datetime.fromisoformat(end) if end else datetime.datetime.now()
+        start_dt = datetime.datetime.fromisoformat(start) if start else end_dt - datetime.timedelta(days=days)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Data inválida (use o formato ISO)")
+    first = datetime.datetime.strptime(start_dt.strftime(fmt), fmt)
+    if end_dt < first or (end_dt - first) // step + 1 > MAX_TIMESERIES_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Intervalo inválido (máximo de {MAX_TIMESERIES_BUCKETS} buckets)")
+
+    series = await asyncio.to_thread(get_store().timeseries, granularity, first.strftime(fmt), end_dt.strftime(fmt))
+    buckets = []
+    current = first
+    while current <= end_dt:
+        bucket = current.strftime(fmt)
+        counters = series.get(bucket, {})
+        buckets.append({
+            "bucket": bucket,
+            "total": counters.get("total", {}).get("", 0),
+            "privacy_counts": counters.get("privacy", {}),
+            "category_counts": counters.get("macro", {}),
+            "pii_counts": counters.get("pii", {}),
+        })
+        current += step
+
+    return {"granularity": granularity, "start": buckets[0]["bucket"], "end": buckets[-1]["bucket"], "buckets": buckets}
 
 @app.get("/api/dashboard-data")
 async def get_dashboard_data(x_admin_password: Optional[str] = Header(None), privacy_filter: Optional[str] = None):
     """
-    Returns aggregated data for the dashboard from the CSV log.
+    Returns aggregated data for the dashboard from the classification store.
     Supports filtering by privacy status.
     """
     if x_admin_password != "admin123":
         raise HTTPException(status_code=403, detail="Acesso negado")
     
-    if not os.path.exists(LOG_FILE):
-        return {
-            "total_count": 0,
-            "privacy_counts": {"Público": 0, "Sigiloso": 0},
-            "category_counts": {},
-            "recent_logs": []
-        }
-        
     try:
-        total_count = 0
+        store = get_store()
         privacy_counts = {"Público": 0, "Sigiloso": 0}
-        category_counts = {}
-        recent_logs = []
-        
-        with open(LOG_FILE, mode='r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            rows = list(reader)
-            
-            filtered_rows = []
-            
-            for row in rows:
-                p_status = row.get('privacy', 'Público')
-                if 'Sigiloso' in p_status: p_status = 'Sigiloso'
-                elif 'Público' in p_status: p_status = 'Público'
-                
-                cat = row.get('category', 'Geral')
-                text_snippet = row.get('text_snippet', '').lower()
-                detected_pii = row.get('category', '').lower()
-
-                # Apply Filter
-                if privacy_filter and privacy_filter != "Todos":
-                    # Standard Status Filter
-                    if privacy_filter in ["Sigiloso", "Público"]:
-                        if p_status != privacy_filter:
-                            continue
-                    
-                    # Advanced Deep Search Filter
-                    else:
-                        match_found = False
-                        filter_lower = privacy_filter.lower()
-                        
-                        # 1. Broad Category Keywords Map
-                        keywords = []
-                        if privacy_filter == "Dados Pessoais":
-                            keywords = ["dados pessoais", "cpf", "rg", "email", "e-mail", "telefone", "celular", "endereço", "cep", "passaporte", "eleitor", "nascimento", "cnh", "nome completo", "nome"]
-                        elif privacy_filter == "Dados Bancários":
-                            keywords = ["dados bancários", "conta bancária", "cartão de crédito", "pix", "banco", "agência", "conta"]
-                        elif privacy_filter == "Dados Veiculares":
-                            keywords = ["dados veiculares", "placa", "renavam", "veículo"]
-                        elif privacy_filter == "Dados de Saúde":
-                            keywords = ["dados de saúde", "prontuário", "paciente", "médico", "doença", "exame", "atestado", "saúde"]
-                        elif privacy_filter == "Dados Sensíveis (Violência Doméstica)":
-                            keywords = ["violência doméstica", "conflitos familiares", "agressão", "medida protetiva"]
-                        else:
-                            # Specific Filter (e.g. "CPF", "Pix") - Add direct keyword
-                            # We replace some common terms for better matching
-                            clean_filter = filter_lower.replace("e-mail", "email").replace("pix", "pix")
-                            keywords = [filter_lower, clean_filter]
-
-                        # 2. Check for Keyword in Category Label OR Privacy Reason OR Text Snippet
-                        # This ensures "Pix" finds rows with "Chave Pix" even if category is "Geral"
-                        privacy_reason = row.get('privacy_reason', '').lower()
-                        for k in keywords:
-                            if k in detected_pii or k in text_snippet or k in privacy_reason:
-                                match_found = True
-                                break
-                        
-                        if not match_found:
-                            continue
-
-                filtered_rows.append(row)
-
-                # Stats calculation
+
+        pii_counts = None
+
+        if not privacy_filter or privacy_filter == "Todos":
+            # Counters maintained on each submit; no row is scanned
+            privacy_counts.update(store.privacy_counts())
+            category_counts = store.category_counts()
+            pii_counts = store.pii_counts()
+            recent_logs = store.recent(50)
+            total_count = store.count()
+
+        # Standard Status Filter
+        elif privacy_filter in ["Sigiloso", "Público"]:
+            category_counts = store.category_counts(privacy_filter)
+            total_count = sum(category_counts.values())
+            privacy_counts[privacy_filter] = total_count
+            recent_logs = store.recent(50, privacy_filter)
+
+        # Advanced Deep Search Filter
+        else:
+            # Any search term of the filter (macro category or specific PII type, e.g. "CPF", "Pix")
+            # in Category Label OR Privacy Reason OR Text Snippet.
+            # This ensures "Pix" finds rows with "Chave Pix" even if category is "Geral"
+            # Candidates come from the inverted index (union over terms of the intersection of
+            # each term's word postings); the automaton then confirms the words are adjacent.
+            pii_index = get_pii_taxonomy()
+            search_automaton, search_accept = pii_index.search_matcher(privacy_filter)
+            candidate_seqs = store.search(pii_index.search_terms(privacy_filter))
+            columns = ['privacy_status', 'macro_category']
+            if candidate_seqs is None:
+                candidates = store.iter_newest(columns=columns)
+            else:
+                candidates = store.iter_seqs(candidate_seqs, columns=columns)
+
+            category_counts = {}
+            recent_logs = []
+            total_count = 0
+            # Newest first, so the first 50 matches are the recent logs
+            for row in candidates:
+                match_found = any(
+                    search_automaton.contains_any(row.get(field) or '', search_accept, whole_words=True)
+                    for field in ('category', 'privacy_reason', 'text_snippet')
+                )
+                if not match_found:
+                    continue
+
+                # Stats calculation (macro category precomputed at write time)
+                p_status = row.pop('privacy_status')
+                main_cat = row.pop('macro_category')
                 privacy_counts[p_status] = privacy_counts.get(p_status, 0) + 1
-                
-                # Macro Category Mapping for Charts
-                main_cat = "Público"
-                if p_status == "Sigiloso":
-                    cat_lower = cat.lower()
-                    if any(k in cat_lower for k in ["prontuário", "paciente", "saúde"]):
-                        main_cat = "Dados de Saúde"
-                    elif any(k in cat_lower for k in ["banco", "conta", "agência", "pix", "cartão"]):
-                        main_cat = "Dados Bancários"
-                    elif any(k in cat_lower for k in ["veículo", "placa", "renavam"]):
-                        main_cat = "Dados Veiculares"
-                    elif any(k in cat_lower for k in ["violência", "agressão", "medida protetiva"]):
-                        main_cat = "Dados Sensíveis (Violência Doméstica)"
-                    else:
-                        # Default to Personal Data if it's sensitive but doesn't match above
-                        main_cat = "Dados Pessoais"
-                
                 category_counts[main_cat] = category_counts.get(main_cat, 0) + 1
-
-            total_count = len(filtered_rows)
-            recent_logs = filtered_rows[-50:][::-1]
+                total_count += 1
+                if len(recent_logs) < 50:
+                    recent_logs.append(row)
             
-        return {
+        result = {
             "total_count": total_count,
             "privacy_counts": privacy_counts,
             "category_counts": category_counts,
             "recent_logs": recent_logs
         }
+        if pii_counts is not None:
+            result["pii_counts"] = pii_counts
+        return result
             
     except Exception as e:
         print(f"Error reading log file: {e}")
@@ -211,54 +460,117 @@ async def get_dashboard_data(x_admin_password: Optional[str] = Header(None), pri
             "error": str(e)
         }
 
+SUBMISSIONS_PAGE_SIZE = 50
+SUBMISSIONS_MAX_PAGE_SIZE = 200
+
+def encode_cursor(seq):
+    return base64.urlsafe_b64encode(f"s{seq}".encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        if not raw.startswith('s'):
+            raise ValueError(cursor)
+        return int(raw[1:])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
 @app.get("/api/submissions")
-async def get_submissions():
+async def get_submissions(limit: int = SUBMISSIONS_PAGE_SIZE, cursor: Optional[str] = None,
+                          owner: Optional[str] = None, x_admin_password: Optional[str] = Header(None)):
     """
-    Returns all submissions from CSV for the 'My Submissions' view.
+    Returns one page of submissions (newest first) for the 'My Submissions' view.
+    `owner` is the citizen's key sent with /api/submit; only their rows are read.
+    Listing every citizen's submissions (no owner) requires the admin password.
+    Pass the returned `next_cursor` back as `cursor` to get the next page.
     Formats data to match the frontend's submission structure.
     """
-    if not os.path.exists(LOG_FILE):
-        return {"submissions": []}
-        
+    if not owner and x_admin_password != "admin123":
+        raise HTTPException(status_code=403, detail="Acesso negado")
+
+    limit = max(1, min(limit, SUBMISSIONS_MAX_PAGE_SIZE))
+    before = decode_cursor(cursor) if cursor else None
     try:
         submissions = []
-        
-        with open(LOG_FILE, mode='r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            rows = list(reader)
-            
-            # Reverse to show newest first
-            for row in reversed(rows):
-                # Format to match frontend structure
-                submission = {
-                    "id": row.get('id', '')[:8],  # Short ID for display
-                    "date": datetime.datetime.fromisoformat(row.get('timestamp', '')).strftime('%d/%m/%Y %H:%M:%S') if row.get('timestamp') else '',
-                    "text": row.get('text_snippet', ''),
-                    "type": row.get('type', 'Texto'),
-                    "category": row.get('category', 'Geral'),
-                    "privacy": row.get('privacy', 'Público')
-                }
-                submissions.append(submission)
+        rows, next_before = get_store().page(limit, before, owner=owner or None)
+
+        for row in rows:
+            # Format to match frontend structure
+            submission = {
+                "id": row.get('id', '')[:8],  # Short ID for display
+                "full_id": row.get('id', ''),
+                "date": datetime.datetime.fromisoformat(row.get('timestamp', '')).strftime('%d/%m/%Y %H:%M:%S') if row.get('timestamp') else '',
+                "text": row.get('text_snippet', ''),
+                "type": row.get('type', 'Texto'),
+                "category": row.get('category', 'Geral'),
+                "privacy": row.get('privacy', 'Público')
+            }
+            submissions.append(submission)
             
-        return {"submissions": submissions}
+        return {
+            "submissions": submissions,
+            "next_cursor": encode_cursor(next_before) if next_before is not None else None
+        }
             
     except Exception as e:
         print(f"Error reading submissions: {e}")
         return {
             "submissions": [],
+            "next_cursor": None,
             "error": str(e)
         }
 
 
+# Shortest id prefix accepted by the lookup (the short ids shown to citizens)
+SHORT_ID_LENGTH = 8
+
+@app.get("/api/submissions/{submission_id}")
+async def get_submission(submission_id: str, owner: Optional[str] = None,
+                         x_admin_password: Optional[str] = Header(None)):
+    """
+    Returns one submission by the id returned from /api/submit, or by its
+    8-character short id. `owner` restricts the lookup to that citizen's rows;
+    looking up any row requires the admin password.
+    """
+    if not owner and x_admin_password != "admin123":
+        raise HTTPException(status_code=403, detail="Acesso negado")
+
+    key = submission_id.strip()
+    if len(key) < SHORT_ID_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Informe ao menos {SHORT_ID_LENGTH} caracteres do protocolo")
+    rows = get_store().lookup(key, owner=owner or None)
+    if not rows:
+        raise HTTPException(status_code=404, detail="Manifestação não encontrada")
+    if len(rows) > 1:
+        raise HTTPException(status_code=409, detail="Protocolo ambíguo; informe mais caracteres")
+
+    row = rows[0]
+    return {
+        "id": row['id'],
+        "short_id": row['id'][:SHORT_ID_LENGTH],
+        "timestamp": row['timestamp'],
+        "date": datetime.datetime.fromisoformat(row['timestamp']).strftime('%d/%m/%Y %H:%M:%S') if row['timestamp'] else '',
+        "text": row['text_snippet'],
+        "type": row['type'],
+        "category": row['category'],
+        "privacy": row['privacy'],
+        "privacy_reason": row['privacy_reason'],
+        "detected_pii": json.loads(row['detected_pii']) if row['detected_pii'] else None,
+        "tier": row['tier'],
+        "provider": row['provider'],
+        "latency_ms": row['latency_ms']
+    }
 
 @app.post("/api/classify")
 async def classify(request: ClassificationRequest):
     from ai_service import classify_and_filter
+    started = time.perf_counter()
     result = classify_and_filter(request.text, enabled_pii_types=request.enabled_pii_types)
     
     if result:
+        result['latency_ms'] = round((time.perf_counter() - started) * 1000, 2)
         # Generate temporary UUID for this classification session
-        # This is NOT yet logged to CSV
+        # This is NOT yet logged to the store
         result['id'] = str(uuid.uuid4())
         return result
     else:
@@ -272,6 +584,21 @@ async def classify(request: ClassificationRequest):
             "privacy_status": "Público"
         }
 
+@app.post("/api/classify/batch")
+async def classify_batch(request: Request, enabled_pii_types: Optional[List[str]] = Query(None),
+                         concurrency: int = Query(4, ge=1, le=16)):
+    """
+    Classifies an NDJSON body (one {"text", "id"?} object or JSON string per
+    line) and streams NDJSON results as they complete, each with the `index`
+    of its line. Memory stays bounded however fast the client uploads.
+    """
+    from functools import partial
+    from ai_service import analyze_privacy_batch
+    import classify_stream
+    lines = classify_stream.iter_lines(request.stream())
+    classify = partial(analyze_privacy_batch, enabled_pii_types=enabled_pii_types)
+    return classify_stream.NDJSONStreamingResponse(classify_stream.classify_stream(lines, classify, concurrency))
+
 class SubmissionData(BaseModel):
     id: str
     text: str
@@ -279,19 +606,210 @@ class SubmissionData(BaseModel):
     category: str = "Geral"
     privacy: str = "Público"
     reason: str = ""
+    owner: Optional[str] = None  # Citizen/session key for 'My Submissions'
+    # Structured outputs of /api/classify (analyze_privacy), stored as typed columns
+    detected_pii: Optional[List[str]] = None
+    tier: Optional[str] = None
+    provider: Optional[str] = None
+    latency_ms: Optional[float] = None
 
 @app.post("/api/submit")
 async def submit_manifestation(data: SubmissionData):
     """
-    Permanently logs a manifestation to the CSV file.
+    Permanently logs a manifestation to the classification store
+    (batched by the write-behind logger; see submit_durability in the config).
+    Idempotent on `id`: a retried submission is stored once and gets the same response.
     """
+    from write_behind import get_submission_logger
+    try:
+        record = submission_record(data.dict())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     try:
-        submission_id = log_to_csv(data.dict())
+        submission_id = await get_submission_logger().submit(record)
         return {"status": "success", "id": submission_id}
     except Exception as e:
-        print(f"Error submitting to CSV: {e}")
+        print(f"Error submitting to store: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to save submission: {str(e)}")
 
+SUBMIT_BATCH_MAX_ITEMS = 1000
+
+def parse_batch_body(body: bytes, content_type: str) -> list:
+    """JSON array, or NDJSON (one object per line); a line that fails to parse becomes an error item."""
+    text = body.decode('utf-8')
+    if 'ndjson' not in content_type and text.lstrip().startswith('['):
+        items = json.loads(text)
+        if not isinstance(items, list):
+            raise ValueError("Esperada uma lista JSON")
+        return items
+    items = []
+    for number, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            items.append(json.loads(line))
+        except json.JSONDecodeError as e:
+            items.append(ValueError(f"Linha {number}: JSON inválido ({e.msg})"))
+    return items
+
+@app.post("/api/submit/batch")
+async def submit_batch(request: Request):
+    """
+    Logs many manifestations in one transaction. The body is a JSON array of
+    /api/submit payloads, or NDJSON (Content-Type: application/x-ndjson).
+    Returns one status per item, in order: "created", "duplicate" (id already
+    stored; idempotent like /api/submit) or "error" (invalid item, not stored).
+    """
+    try:
+        items = parse_batch_body(await request.body(), request.headers.get('content-type', ''))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Corpo inválido: {e}")
+    if len(items) > SUBMIT_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Máximo de {SUBMIT_BATCH_MAX_ITEMS} itens por lote")
+
+    results, records = [], []
+    for index, item in enumerate(items):
+        try:
+            if isinstance(item, Exception):
+                raise item
+            if not isinstance(item, dict):
+                raise ValueError("Item deve ser um objeto JSON")
+            record = submission_record(SubmissionData(**item).dict())
+        except Exception as e:
+            results.append({"index": index, "id": item.get('id') if isinstance(item, dict) else None,
+                            "status": "error", "detail": str(e)})
+            continue
+        results.append({"index": index, "id": record['id'], "status": None})
+        records.append(record)
+
+    config = await get_config()
+    durable = config.get('submit_durability', 'group') != 'async'
+    try:
+        inserted = await asyncio.to_thread(get_store().insert_batch, records, durable) if records else []
+    except Exception as e:
+        print(f"Error submitting batch to store: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to save submissions: {str(e)}")
+
+    flags = iter(inserted)
+    for result in results:
+        if result["status"] is None:
+            result["status"] = "created" if next(flags) else "duplicate"
+    return {
+        "status": "success",
+        "created": sum(1 for r in results if r["status"] == "created"),
+        "duplicates": sum(1 for r in results if r["status"] == "duplicate"),
+        "errors": sum(1 for r in results if r["status"] == "error"),
+        "results": results
+    }
+
+# --- Bulk Jobs ---
+
+JOB_MAX_UPLOAD_BYTES = 512 * 1024 * 1024
+
+@app.post("/api/jobs", status_code=202)
+async def create_job(request: Request, x_admin_password: Optional[str] = Header(None),
+                     filename: Optional[str] = None, format: Optional[str] = None,
+                     text_column: Optional[str] = None, enabled_pii_types: Optional[List[str]] = Query(None)):
+    """
+    Queues a bulk classification job for the file sent as the request body
+    (CSV, XLSX or NDJSON; from `format`, the `filename` extension or the
+    Content-Type). Poll GET /api/jobs/{id}, then download /api/jobs/{id}/results.
+    """
+    if x_admin_password != "admin123":
+        raise HTTPException(status_code=403, detail="Acesso negado")
+
+    import jobs
+    fmt = format or jobs.input_format(filename, request.headers.get('content-type'))
+    if fmt not in jobs.INPUT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Formato não suportado (use {', '.join(jobs.INPUT_FORMATS)})")
+    manager = jobs.get_job_manager()
+    upload_path = os.path.join(manager.directory, f"upload-{uuid.uuid4().hex}.tmp")
+    size = 0
+    try:
+        # Streamed to disk: the upload is never held in memory
+        with open(upload_path, 'wb') as f:
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > JOB_MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail="Arquivo muito grande")
+                f.write(chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Arquivo vazio")
+        state = await asyncio.to_thread(manager.create_file_job, upload_path, fmt, filename, text_column,
+                                        enabled_pii_types)
+    finally:
+        if os.path.exists(upload_path):
+            os.remove(upload_path)
+    return jobs.describe(state)
+
+@app.post("/api/jobs/reprocess", status_code=202)
+async def create_reprocess_job(x_admin_password: Optional[str] = Header(None),
+                               enabled_pii_types: Optional[List[str]] = Query(None)):
+    """Queues a job that re-classifies every logged submission (e.g. after enabling new PII types)."""
+    if x_admin_password != "admin123":
+        raise HTTPException(status_code=403, detail="Acesso negado")
+    import jobs
+    state = await asyncio.to_thread(jobs.get_job_manager().create_reprocess_job, enabled_pii_types)
+    return jobs.describe(state)
+
+@app.get("/api/jobs")
+async def list_jobs(x_admin_password: Optional[str] = Header(None)):
+    if x_admin_password != "admin123":
+        raise HTTPException(status_code=403, detail="Acesso negado")
+    import jobs
+    return {"jobs": [jobs.describe(state) for state in jobs.get_job_manager().list()]}
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, x_admin_password: Optional[str] = Header(None)):
+    """Status, progress, throughput (rows/s) and ETA (seconds) of a job."""
+    if x_admin_password != "admin123":
+        raise HTTPException(status_code=403, detail="Acesso negado")
+    import jobs
+    state = jobs.get_job_manager().get(job_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return jobs.describe(state)
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str, x_admin_password: Optional[str] = Header(None)):
+    """Stops a queued/running job after its current chunk (resumable with /resume)."""
+    if x_admin_password != "admin123":
+        raise HTTPException(status_code=403, detail="Acesso negado")
+    import jobs
+    state = jobs.get_job_manager().cancel(job_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return jobs.describe(state)
+
+@app.post("/api/jobs/{job_id}/resume")
+async def resume_job(job_id: str, x_admin_password: Optional[str] = Header(None)):
+    """Queues a failed or cancelled job again from its last checkpoint."""
+    if x_admin_password != "admin123":
+        raise HTTPException(status_code=403, detail="Acesso negado")
+    import jobs
+    state = await asyncio.to_thread(jobs.get_job_manager().resume, job_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return jobs.describe(state)
+
+@app.get("/api/jobs/{job_id}/results")
+async def download_job_results(job_id: str, x_admin_password: Optional[str] = Header(None)):
+    """Results as NDJSON (one line per input row), once the job is no longer running."""
+    if x_admin_password != "admin123":
+        raise HTTPException(status_code=403, detail="Acesso negado")
+    from fastapi.responses import FileResponse
+    import jobs
+    manager = jobs.get_job_manager()
+    state = manager.get(job_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    if state['status'] in jobs.ACTIVE_STATUSES:
+        raise HTTPException(status_code=409, detail="Job ainda em execução")
+    path = manager.results_path(job_id)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Job sem resultados")
+    return FileResponse(path, media_type='application/x-ndjson', filename=f"job-{job_id}-results.ndjson")
+
 # --- Configuration Endpoints ---
 
 @app.get("/api/config")
@@ -304,7 +822,13 @@ async def get_config():
         "ollama_url": "http://localhost:11434",
         "gemini_api_key": "",
         "openai_api_key": "",
-        "anthropic_api_key": ""
+        "anthropic_api_key": "",
+        "classifier_confidence_threshold": 0.7,
+        "near_duplicate_threshold": 0.9,
+        "submit_durability": "group",
+        "submit_batch_size": 200,
+        "submit_flush_ms": 10,
+        "retention_days": 0
     }
     if os.path.exists(CONFIG_FILE):
         try:
@@ -326,6 +850,12 @@ class ConfigUpdate(BaseModel):
     gemini_api_key: Optional[str] = ""
     openai_api_key: Optional[str] = ""
     anthropic_api_key: Optional[str] = ""
+    classifier_confidence_threshold: Optional[float] = 0.7
+    near_duplicate_threshold: Optional[float] = 0.9
+    submit_durability: Optional[str] = "group"
+    submit_batch_size: Optional[int] = 200
+    submit_flush_ms: Optional[float] = 10
+    retention_days: Optional[int] = 0
 
 @app.post("/api/config")
 async def update_config(config: ConfigUpdate, x_admin_password: Optional[str] = Header(None)):
@@ -334,9 +864,21 @@ async def update_config(config: ConfigUpdate, x_admin_password: Optional[str] =
         raise HTTPException(status_code=403, detail="Acesso negado")
     
     try:
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(config.dict(), f, indent=4)
-        return {"status": "success", "config": config.dict()}
+        # Keep settings the admin form does not send (e.g. tuning knobs edited by hand)
+        merged = {}
+        if os.path.exists(CONFIG_FILE):
+            try:
+                with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+                    merged = json.load(f)
+            except Exception:
+                merged = {}
+        merged.update(config.dict(exclude_unset=True))
+        # Write-then-rename so other workers never read a half-written file
+        tmp_path = f"{CONFIG_FILE}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(merged, f, indent=4)
+        os.replace(tmp_path, CONFIG_FILE)
+        return {"status": "success", "config": merged}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -365,4 +907,10 @@ else:
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # One worker per core: WEB_CONCURRENCY=4 python main.py
+    # Workers share data/classifications.db; SQLite serializes their writes.
+    workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+    if workers > 1:
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=workers, app_dir=os.path.dirname(os.path.abspath(__file__)))
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
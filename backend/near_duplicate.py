@@ -0,0 +1,179 @@
+"""
+Near-Duplicate Classification Index
+-----------------------------------
+SimHash fingerprints of previously classified texts, so that a text that is
+almost identical to a known one (same complaint, different quadra number) can
+reuse the known manifestation category instead of calling the LLM again.
+
+Only the category is reused: privacy/PII verdicts are always recomputed,
+since two near-identical texts can differ exactly in the personal data.
+
+Lookups use LSH banding: the 64-bit fingerprint is split into
+(max_distance + 1) bands, so any fingerprint within `max_distance` bits must
+match at least one band exactly (pigeonhole) and only those buckets are scanned.
+"""
+import re
+import sys
+import threading
+import hashlib
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from text_utils import fold_text
+from taxonomy import CategoryTaxonomy
+
+FINGERPRINT_BITS = 64
+DEFAULT_THRESHOLD = 0.9
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+_DIGITS_RE = re.compile(r'\d+')
+
+
+def _features(text: str) -> Dict[str, int]:
+    # Numbers (quadra, lote, protocol) are masked so they don't dominate short texts
+    tokens = _TOKEN_RE.findall(_DIGITS_RE.sub('0', fold_text(text)))
+    feats: Dict[str, int] = {}
+    for tok in tokens:
+        feats[tok] = feats.get(tok, 0) + 1
+    for a, b in zip(tokens, tokens[1:]):
+        key = f"{a} {b}"
+        feats[key] = feats.get(key, 0) + 1
+    return feats
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash over accent-folded word uni/bi-grams."""
+    weights = [0] * FINGERPRINT_BITS
+    for feat, count in _features(text).items():
+        h = int.from_bytes(hashlib.blake2b(feat.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += count if (h >> bit) & 1 else -count
+    fingerprint = 0
+    for bit, w in enumerate(weights):
+        if w > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def _band_layout(max_distance: int) -> List[Tuple[int, int]]:
+    """Splits 64 bits into max_distance + 1 (shift, mask) bands."""
+    n_bands = max(1, min(max_distance + 1, FINGERPRINT_BITS))
+    layout, start = [], 0
+    for i in range(n_bands):
+        width = FINGERPRINT_BITS // n_bands + (1 if i < FINGERPRINT_BITS % n_bands else 0)
+        layout.append((start, (1 << width) - 1))
+        start += width
+    return layout
+
+
+class NearDuplicateIndex:
+    """SimHash + LSH banding index mapping texts to a reusable category label."""
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self.max_distance = int((1.0 - threshold) * FINGERPRINT_BITS)
+        self._bands = _band_layout(self.max_distance)
+        self._buckets: List[Dict[int, array]] = [{} for _ in self._bands]
+        self._fingerprints = array('Q')
+        self._labels = array('H')       # index into self._label_table
+        self._label_table: List[Tuple[str, str]] = []
+        self._label_pos: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+
+    def __len__(self):
+        return len(self._fingerprints)
+
+    def add(self, text: str, category_id: str, subcategory: str = ""):
+        fp = simhash(text)
+        label = (category_id, subcategory or "")
+        with self._lock:
+            pos = self._label_pos.get(label)
+            if pos is None:
+                pos = self._label_pos[label] = len(self._label_table)
+                self._label_table.append(label)
+            entry = len(self._fingerprints)
+            self._fingerprints.append(fp)
+            self._labels.append(pos)
+            for (shift, mask), buckets in zip(self._bands, self._buckets):
+                key = (fp >> shift) & mask
+                bucket = buckets.get(key)
+                if bucket is None:
+                    bucket = buckets[key] = array('I')
+                bucket.append(entry)
+
+    def lookup(self, text: str) -> Optional[Dict]:
+        """Returns {"id", "subcategory", "similarity"} of the closest known text, or None."""
+        fp = simhash(text)
+        best, best_distance = None, self.max_distance + 1
+        with self._lock:
+            self.lookups += 1
+            for (shift, mask), buckets in zip(self._bands, self._buckets):
+                for entry in buckets.get((fp >> shift) & mask, ()):
+                    distance = bin(fp ^ self._fingerprints[entry]).count('1')
+                    if distance < best_distance:
+                        best, best_distance = entry, distance
+            if best is None:
+                return None
+            self.hits += 1
+            category_id, subcategory = self._label_table[self._labels[best]]
+        return {
+            "id": category_id,
+            "subcategory": subcategory,
+            "similarity": 1.0 - best_distance / FINGERPRINT_BITS,
+        }
+
+    def memory_bytes(self) -> int:
+        """Approximate resident size of the index structures."""
+        total = sys.getsizeof(self._fingerprints) + sys.getsizeof(self._labels)
+        for buckets in self._buckets:
+            total += sys.getsizeof(buckets)
+            total += sum(sys.getsizeof(b) for b in buckets.values())
+        total += sum(sys.getsizeof(a) + sys.getsizeof(b) for a, b in self._label_table)
+        return total
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self),
+            "threshold": self.threshold,
+            "max_hamming_distance": self.max_distance,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+            "memory_bytes": self.memory_bytes(),
+        }
+
+
+def build_from_history(taxonomy: CategoryTaxonomy, threshold: float = DEFAULT_THRESHOLD,
+                       rows: Optional[Iterable[Dict]] = None) -> NearDuplicateIndex:
+    """
+    Indexes logged texts (the classification store by default) whose category
+    resolves to a manifestation category (by id or display name). Rows labelled
+    only with privacy macro categories carry no reusable category and are skipped.
+    """
+    index = NearDuplicateIndex(threshold)
+    try:
+        if rows is None:
+            from storage import get_store
+            rows = get_store().iter_rows()
+        for row in rows:
+            cat_id = taxonomy.resolve_label(row.get('category'))
+            if cat_id and row.get('text_snippet'):
+                index.add(row['text_snippet'], cat_id)
+    except Exception as e:
+        print(f"Error building near-duplicate index: {e}")
+    return index
+
+
+_index: Optional[NearDuplicateIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_near_duplicate_index(taxonomy: CategoryTaxonomy, threshold: float = DEFAULT_THRESHOLD) -> NearDuplicateIndex:
+    """Process-wide index, built from the history on first use (or when the threshold changes)."""
+    global _index
+    with _index_lock:
+        if _index is None or _index.threshold != threshold:
+            _index = build_from_history(taxonomy, threshold)
+        return _index
@@ -0,0 +1,170 @@
+"""
+Parquet Export
+--------------
+Columnar analytics export of the classification history (optional
+dependency: `pip install pyarrow`).
+
+- Typed columns: int64 seq, timestamp[us], float32 latency, list<string>
+  detected PII; categorical columns (type, category, privacy, status, macro
+  category, tier, provider) are dictionary-encoded, so pandas loads them as
+  `category` dtype.
+- Built incrementally: one Parquet file per sealed day
+  (data/parquet/classifications-YYYY-MM-DD.parquet), written once when the
+  day is sealed (and again if a late part of that day is sealed); only the
+  unsealed tail is converted on each export.
+  Files of segments removed by retention are deleted too.
+- The combined export appends each day file as its own row groups, so the
+  row-group statistics on `timestamp` let readers skip days
+  (`pd.read_parquet(path, filters=[("timestamp", ">=", ...)])`).
+"""
+import datetime
+import json
+import os
+from itertools import chain
+from typing import Dict, Iterable, List, Optional
+
+from segments import SegmentArchive
+from storage import DATA_DIR
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+PARQUET_DIR = os.path.join(DATA_DIR, 'parquet')
+COMBINED_PREFIX = 'classifications-all-'
+
+CATEGORICAL_COLUMNS = ['type', 'category', 'privacy', 'privacy_status', 'macro_category', 'tier', 'provider']
+TEXT_COLUMNS = ['id', 'privacy_reason', 'text_snippet', 'owner_key']
+
+
+def parquet_available() -> bool:
+    return pa is not None
+
+
+def _schema():
+    fields = [pa.field('seq', pa.int64()), pa.field('timestamp', pa.timestamp('us'))]
+    fields += [pa.field(name, pa.string()) for name in TEXT_COLUMNS]
+    fields += [pa.field(name, pa.dictionary(pa.int32(), pa.string())) for name in CATEGORICAL_COLUMNS]
+    fields += [pa.field('detected_pii', pa.list_(pa.string())), pa.field('latency_ms', pa.float32())]
+    return pa.schema(fields)
+
+
+def _timestamp(value: Optional[str]) -> Optional[datetime.datetime]:
+    try:
+        return datetime.datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def _detected(value: Optional[str]) -> Optional[List[str]]:
+    try:
+        return json.loads(value) if value else None
+    except ValueError:
+        return None
+
+
+def rows_table(rows: Iterable[Dict]):
+    """Rows (store dicts or segment CSV rows, all values as stored) -> typed Arrow table."""
+    names = ['seq', 'timestamp'] + TEXT_COLUMNS + CATEGORICAL_COLUMNS + ['detected_pii', 'latency_ms']
+    columns: Dict[str, list] = {name: [] for name in names}
+    for row in rows:
+        columns['seq'].append(int(row['seq']))
+        columns['timestamp'].append(_timestamp(row.get('timestamp')))
+        for name in TEXT_COLUMNS + CATEGORICAL_COLUMNS:
+            columns[name].append(row.get(name) or None)
+        columns['detected_pii'].append(_detected(row.get('detected_pii')))
+        latency = row.get('latency_ms')
+        columns['latency_ms'].append(float(latency) if latency not in (None, '') else None)
+
+    schema = _schema()
+    arrays = []
+    for field in schema:
+        if pa.types.is_dictionary(field.type):
+            arrays.append(pa.array(columns[field.name], pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(columns[field.name], field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+class ParquetExporter:
+    """Per-segment Parquet files plus the combined export, next to a SegmentArchive."""
+
+    def __init__(self, archive: SegmentArchive, directory: str = PARQUET_DIR):
+        if pa is None:
+            raise RuntimeError("pyarrow não está instalado (pip install pyarrow)")
+        self.archive = archive
+        self.store = archive.store
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def segment_path(self, day: str) -> str:
+        return os.path.join(self.directory, f"classifications-{day}.parquet")
+
+    def _write(self, table, path: str):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        pq.write_table(table, tmp_path, compression='zstd', write_statistics=True)
+        os.replace(tmp_path, path)
+
+    def sync(self) -> List[str]:
+        """
+        Converts sealed days that have no Parquet file yet (or gained a late
+        part since) and deletes the files of days dropped by retention.
+        Returns the converted days.
+        """
+        days: Dict[str, List[Dict]] = {}
+        for segment in self.archive.segments():
+            days.setdefault(segment['day'], []).append(segment)
+        converted = []
+        for day, parts in days.items():
+            path = self.segment_path(day)
+            if not os.path.exists(path) or pq.ParquetFile(path).metadata.num_rows != sum(s['rows'] for s in parts):
+                rows = chain.from_iterable(self.archive.read(s) for s in parts)
+                if len(parts) > 1:
+                    rows = sorted(rows, key=lambda row: (row['timestamp'], int(row['seq'])))
+                self._write(rows_table(rows), path)
+                converted.append(day)
+
+        keep = {os.path.basename(self.segment_path(day)) for day in days}
+        for name in os.listdir(self.directory):
+            if name.endswith('.parquet') and not name.startswith(COMBINED_PREFIX) and name not in keep:
+                os.remove(os.path.join(self.directory, name))
+        return converted
+
+    def tail_table(self):
+        """Rows not sealed into a segment yet (today's, and late rows of sealed days)."""
+        columns = ['timestamp'] + TEXT_COLUMNS + CATEGORICAL_COLUMNS + ['detected_pii', 'latency_ms']
+        return rows_table(self.archive.iter_unsealed(columns))
+
+    def export(self) -> str:
+        """
+        Path of the combined export: the day files' row groups followed by the
+        tail. Rebuilt only when a segment was sealed/dropped or rows were added.
+        """
+        self.sync()
+        segments = self.archive.segments()
+        days = list(dict.fromkeys(s['day'] for s in segments))
+        last_seq, purges, _ = self.store.export_state()
+        key = f"{days[-1] if days else 'none'}-{len(segments)}-{last_seq}-{purges}"
+        path = os.path.join(self.directory, f"{COMBINED_PREFIX}{key}.parquet")
+        if os.path.exists(path):
+            return path
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with pq.ParquetWriter(tmp_path, _schema(), compression='zstd', write_statistics=True) as writer:
+            for day in days:
+                writer.write_table(pq.read_table(self.segment_path(day)))
+            tail = self.tail_table()
+            if tail.num_rows:
+                writer.write_table(tail)
+        os.replace(tmp_path, path)
+
+        for name in os.listdir(self.directory):
+            if name.startswith(COMBINED_PREFIX) and os.path.join(self.directory, name) != path:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+        return path
@@ -0,0 +1,217 @@
+"""
+Sealed Log Segments
+-------------------
+Date-partitioned archive of the classification log: one immutable,
+gzip-compressed CSV per complete day under data/segments/, listed in
+data/segments/manifest.json.
+
+- `seal` writes a segment for each finished day that is not sealed yet, with
+  the rows whose timestamp falls on that day (timestamp index, in time
+  order). Seq order is not time order (rows are stamped before a write-behind
+  batch assigns their seqs), so the manifest also keeps the last seq each
+  pass saw: a row of a sealed day committed after its pass is written to an
+  extra part of that day on the next pass. A sealed file is never rewritten.
+- `segments(since, until)` / `iter_rows(since, until)` open only the segments
+  whose day falls in the range.
+- `apply_retention(days)` deletes whole segment files older than the window
+  and the same rows from the SQLite store
+  (`ClassificationStore.purge_before`), so an LGPD purge never rewrites the log.
+
+Manifest updates run under the store's write lock (BEGIN IMMEDIATE), so
+several uvicorn workers can seal and purge concurrently.
+"""
+import csv
+import datetime
+import gzip
+import json
+import os
+from itertools import chain, groupby
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from storage import DATA_DIR, ROW_COLUMNS, ClassificationStore
+
+SEGMENTS_DIR = os.path.join(DATA_DIR, 'segments')
+MANIFEST_NAME = 'manifest.json'
+
+# Segment CSV header: the store's seq followed by every stored column
+SEGMENT_FIELDS = ['seq'] + ROW_COLUMNS
+
+
+def _day(value: datetime.date) -> str:
+    return value.isoformat()
+
+
+def _after_day(day: str) -> str:
+    """Sorts above every timestamp of `day` (and below the next day's)."""
+    return day + '\U0010ffff'
+
+
+class SegmentArchive:
+    """Daily gzip segments of a ClassificationStore plus their manifest."""
+
+    def __init__(self, store: ClassificationStore, directory: str = SEGMENTS_DIR):
+        self.store = store
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, MANIFEST_NAME)
+        os.makedirs(directory, exist_ok=True)
+
+    # --- Manifest ---
+
+    def manifest(self) -> Dict:
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"Error reading segment manifest: {e}")
+        return {"segments": []}
+
+    @staticmethod
+    def watermark(manifest: Dict) -> Tuple[str, int]:
+        """
+        (last sealed day, last seq seen by a seal pass): every row of a day up
+        to the first with a seq up to the second is in a segment. Manifests
+        written before parts existed fall back to their last segment.
+        """
+        segments = manifest["segments"]
+        return (manifest.get("sealed_through", max((s["day"] for s in segments), default="")),
+                manifest.get("sealed_seq", max((s["last_seq"] for s in segments), default=0)))
+
+    def _write_manifest(self, manifest: Dict):
+        manifest["segments"].sort(key=lambda s: (s["day"], s.get("part", 0)))
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    def segments(self, since: Optional[str] = None, until: Optional[str] = None) -> List[Dict]:
+        """Manifest entries whose day lies in [since, until] (ISO dates or timestamps)."""
+        return [s for s in self.manifest()["segments"]
+                if (not since or s["day"] >= since[:10]) and (not until or s["day"] <= until[:10])]
+
+    def path(self, segment: Dict) -> str:
+        return os.path.join(self.directory, segment["file"])
+
+    # --- Sealing ---
+
+    def seal(self, through: Optional[str] = None) -> List[Dict]:
+        """
+        Seals every complete day up to `through` (ISO date, default yesterday;
+        today's rows are still being written), plus rows of sealed days logged
+        since the last pass. Returns the new manifest entries.
+        """
+        through = through or _day(datetime.date.today() - datetime.timedelta(days=1))
+        manifest = self.manifest()
+        sealed_day, sealed_seq = self.watermark(manifest)
+        snapshot = self.store.export_state()[0]
+        if snapshot <= sealed_seq and through <= sealed_day:
+            return []
+
+        rows = chain(
+            self.store.iter_logged(None, sealed_day, ROW_COLUMNS, after_seq=sealed_seq,
+                                   through_seq=snapshot) if sealed_day else (),
+            self.store.iter_logged(_after_day(sealed_day) if sealed_day else None, through, ROW_COLUMNS,
+                                   through_seq=snapshot))
+        parts = {}
+        for s in manifest["segments"]:
+            parts[s["day"]] = max(parts.get(s["day"], -1), s.get("part", 0))
+        written = [self._write_segment(day, day_rows, parts.get(day, -1) + 1)
+                   for day, day_rows in groupby(rows, key=lambda row: row['timestamp'][:10])]
+
+        with self.store.transaction():
+            manifest = self.manifest()
+            if self.watermark(manifest) != (sealed_day, sealed_seq):
+                for _, tmp_path in written:  # another worker sealed these rows first
+                    os.remove(tmp_path)
+                return []
+            for segment, tmp_path in written:
+                os.replace(tmp_path, self.path(segment))
+                manifest["segments"].append(segment)
+            manifest["sealed_through"] = max(sealed_day, through)
+            manifest["sealed_seq"] = max(sealed_seq, snapshot)
+            self._write_manifest(manifest)
+        return [segment for segment, _ in written]
+
+    def _write_segment(self, day: str, rows: Iterator[Dict], part: int) -> Tuple[Dict, str]:
+        """Writes one day's rows to a temporary file; returns (manifest entry, temporary path)."""
+        name = f"classifications-{day}.csv.gz" if not part else f"classifications-{day}.{part}.csv.gz"
+        tmp_path = os.path.join(self.directory, f"{name}.{os.getpid()}.tmp")
+        count, seqs = 0, []
+        with gzip.open(tmp_path, 'wt', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(SEGMENT_FIELDS)
+            for row in rows:
+                writer.writerow([row[field] for field in SEGMENT_FIELDS])
+                count += 1
+                seqs.append(row['seq'])
+
+        segment = {
+            "day": day,
+            "file": name,
+            "rows": count,
+            "first_seq": min(seqs),
+            "last_seq": max(seqs),
+            "bytes": os.path.getsize(tmp_path),
+            "sealed_at": datetime.datetime.now().isoformat(),
+        }
+        if part:
+            segment["part"] = part
+        return segment, tmp_path
+
+    def iter_unsealed(self, columns: List[str]) -> Iterator[Dict]:
+        """Store rows that are in no segment yet (today's, and late rows of sealed days), in time order."""
+        sealed_day, sealed_seq = self.watermark(self.manifest())
+        if not sealed_day:
+            yield from self.store.iter_logged(None, None, columns)
+            return
+        yield from self.store.iter_logged(None, sealed_day, columns, after_seq=sealed_seq)
+        yield from self.store.iter_logged(_after_day(sealed_day), None, columns)
+
+    # --- Reads ---
+
+    def iter_rows(self, since: Optional[str] = None, until: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Rows of the sealed days in [since, until], opening only those segments
+        (oldest first within each segment; a day's late parts follow it).
+        """
+        for segment in self.segments(since, until):
+            for row in self.read(segment):
+                if since and row['timestamp'] < since:
+                    continue
+                # A date-only `until` includes that whole day
+                if until and row['timestamp'][:len(until)] > until:
+                    break  # segments are in time order
+                yield row
+
+    def read(self, segment: Dict) -> Iterator[Dict]:
+        """Every row of one segment (values as text)."""
+        with gzip.open(self.path(segment), 'rt', encoding='utf-8', newline='') as f:
+            yield from csv.DictReader(f)
+
+    # --- Retention ---
+
+    def apply_retention(self, days: int, today: Optional[datetime.date] = None) -> Dict:
+        """
+        Drops everything older than `days` days: whole segment files plus the
+        same rows in the store. Returns what was removed.
+        """
+        cutoff = _day((today or datetime.date.today()) - datetime.timedelta(days=days))
+        purged_rows = self.store.purge_before(cutoff)
+        with self.store.transaction():
+            manifest = self.manifest()
+            expired = [s for s in manifest["segments"] if s["day"] < cutoff]
+            manifest["segments"] = [s for s in manifest["segments"] if s["day"] >= cutoff]
+            self._write_manifest(manifest)
+        for segment in expired:
+            try:
+                os.remove(self.path(segment))
+            except FileNotFoundError:
+                pass
+        return {"cutoff": cutoff, "rows": purged_rows, "segments": [s["day"] for s in expired]}
+
+    def run_maintenance(self, retention_days: Optional[int] = None) -> Dict:
+        """Seals finished days, then applies retention when it is configured (> 0)."""
+        result = {"sealed": [s["day"] for s in self.seal()]}
+        if retention_days:
+            result["retention"] = self.apply_retention(int(retention_days))
+        return result
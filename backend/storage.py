@@ -0,0 +1,871 @@
+"""
+Classification Storage
+----------------------
+SQLite (WAL mode) storage for logged manifestations, replacing the
+append-only data/classifications.csv.
+
+- Every write is a single indexed INSERT; readers query by index instead of
+  parsing the whole history (timestamp, privacy status, macro category, id).
+- The macro category and normalized privacy status are computed once at
+  write time, so readers never re-derive them per row.
+- Dashboard counters (total, per privacy status, per macro category, per PII
+  type) live in the `aggregates` table and are updated in the same transaction
+  as each insert, so unfiltered dashboard reads never touch the rows;
+  `rebuild_aggregates` recomputes them from the rows for recovery.
+- The `rollups` table holds the same counters (total, privacy, macro, PII)
+  per hour and per day bucket, also updated with each insert, so trend
+  charts read one row per bucket and dimension key instead of the rows
+  (90 days at hourly resolution = 2,160 buckets).
+- The `postings` table is an inverted index (accent-folded token -> row seq)
+  over category, privacy reason and text, written with each row, so the deep
+  search reads only rows that contain the filter's words.
+- `purge_before` (LGPD retention, driven by segments.py) deletes the rows
+  logged before a cutoff (timestamp index) and subtracts their counters.
+- `migrate_csv` imports an existing classifications.csv once; `iter_csv` /
+  `export_csv` produce the legacy CSV layout for /data/classifications.csv.
+"""
+import os
+import csv
+import io
+import json
+import datetime
+import hashlib
+import sqlite3
+import threading
+import time
+import uuid
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from dedupe_index import DedupeIndex
+from taxonomy import PUBLIC_CATEGORY, get_pii_taxonomy
+from text_utils import index_tokens
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+DB_FILE = os.path.join(DATA_DIR, 'classifications.db')
+LEGACY_CSV_FILE = os.path.join(DATA_DIR, 'classifications.csv')
+
+# Column order of the legacy CSV log (and of the CSV export)
+CSV_FIELDS = ['id', 'timestamp', 'type', 'category', 'privacy', 'privacy_reason', 'text_snippet']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS classifications (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    type TEXT NOT NULL DEFAULT 'Texto',
+    category TEXT NOT NULL DEFAULT 'Geral',
+    privacy TEXT NOT NULL DEFAULT 'Desconhecido',
+    privacy_reason TEXT NOT NULL DEFAULT '',
+    text_snippet TEXT NOT NULL DEFAULT '',
+    privacy_status TEXT NOT NULL,
+    macro_category TEXT NOT NULL,
+    owner_key TEXT,
+    detected_pii TEXT,
+    tier TEXT,
+    provider TEXT,
+    latency_ms REAL
+);
+CREATE INDEX IF NOT EXISTS idx_classifications_id ON classifications(id);
+CREATE INDEX IF NOT EXISTS idx_classifications_timestamp ON classifications(timestamp);
+CREATE INDEX IF NOT EXISTS idx_classifications_privacy ON classifications(privacy_status, seq);
+CREATE INDEX IF NOT EXISTS idx_classifications_macro ON classifications(macro_category, seq);
+CREATE TABLE IF NOT EXISTS aggregates (
+    dimension TEXT NOT NULL,
+    key TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollups (
+    granularity TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    dimension TEXT NOT NULL,
+    key TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (granularity, bucket, dimension, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS postings (
+    token TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (token, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+_SELECT_CSV = "SELECT " + ", ".join(CSV_FIELDS) + " FROM classifications"
+
+# Columns written by INSERT, in `_row_values` order
+ROW_COLUMNS = CSV_FIELDS + ['privacy_status', 'macro_category', 'owner_key',
+                            'detected_pii', 'tier', 'provider', 'latency_ms']
+
+# Columns added after the first schema: (name, declaration), plus the indexes that need them
+COLUMN_UPGRADES = [
+    ('owner_key', "TEXT"),
+    ('detected_pii', "TEXT"),   # JSON list of PII display names found by analyze_privacy
+    ('tier', "TEXT"),           # what decided the privacy verdict: regex / context / llm
+    ('provider', "TEXT"),       # "local" or "<llm provider>:<model>"
+    ('latency_ms', "REAL"),     # /api/classify processing time
+]
+UPGRADE_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_classifications_owner ON classifications(owner_key, seq) WHERE owner_key IS NOT NULL;
+"""
+
+# Aggregate dimensions; 'status_macro' keys are "<privacy status>|<macro category>"
+AGG_TOTAL, AGG_PRIVACY, AGG_MACRO, AGG_STATUS_MACRO, AGG_PII = 'total', 'privacy', 'macro', 'status_macro', 'pii'
+
+_UPSERT_AGGREGATE = (
+    "INSERT INTO aggregates (dimension, key, count) VALUES (?, ?, ?) "
+    "ON CONFLICT(dimension, key) DO UPDATE SET count = count + excluded.count"
+)
+
+# Rollup buckets: prefixes of the ISO timestamp ("2026-01-31T14" / "2026-01-31")
+GRANULARITY_HOUR, GRANULARITY_DAY = 'hour', 'day'
+BUCKET_WIDTH = {GRANULARITY_HOUR: 13, GRANULARITY_DAY: 10}
+ROLLUP_DIMENSIONS = (AGG_TOTAL, AGG_PRIVACY, AGG_MACRO, AGG_PII)
+
+_UPSERT_ROLLUP = (
+    "INSERT INTO rollups (granularity, bucket, dimension, key, count) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT(granularity, bucket, dimension, key) DO UPDATE SET count = count + excluded.count"
+)
+
+
+def normalize_privacy(privacy: Optional[str]) -> str:
+    """Collapses free-form privacy labels ("Sigiloso (LGPD)") to the dashboard statuses."""
+    privacy = privacy or 'Público'
+    if 'Sigiloso' in privacy: return 'Sigiloso'
+    if 'Público' in privacy: return 'Público'
+    return privacy
+
+
+def owner_key_for(owner: Optional[str]) -> Optional[str]:
+    """
+    Stored form of a citizen's owner/session token: a SHA-256 digest, so the
+    database (and its exports) never hold the bearer token itself.
+    """
+    owner = (owner or '').strip()
+    if not owner:
+        return None
+    return hashlib.sha256(owner.encode('utf-8')).hexdigest()[:32]
+
+
+def macro_category_for(privacy_status: str, category: Optional[str], detected_pii: Optional[List[str]] = None) -> str:
+    """
+    Chart bucket: the PII macro category for sensitive rows, "Público" otherwise.
+    Taken from the detected PII types when known, else from the category label.
+    """
+    if privacy_status != 'Sigiloso':
+        return PUBLIC_CATEGORY
+    pii_index = get_pii_taxonomy()
+    if detected_pii:
+        macro = pii_index.macro_for(detected_pii)
+        if macro != PUBLIC_CATEGORY:
+            return macro
+    return pii_index.macro_for_label(category)
+
+
+def pii_names_for(privacy_status: str, category: Optional[str], reason: Optional[str],
+                  detected_pii: Optional[str]) -> List[str]:
+    """
+    PII type names of a stored row: the typed `detected_pii` column (JSON) when
+    present; rows logged before it existed fall back to the names in category/reason.
+    """
+    if privacy_status != 'Sigiloso':
+        return []
+    pii_index = get_pii_taxonomy()
+    if detected_pii:
+        try:
+            labels = json.loads(detected_pii)
+        except ValueError:
+            labels = []
+        names = []
+        for label in labels:
+            entry = pii_index.lookup(label)
+            name = entry['name'] if entry else label
+            if name not in names:
+                names.append(name)
+        return names
+    return [pii_index.name(type_id) for type_id in pii_index.types_in(category, reason)]
+
+
+class ClassificationStore:
+    """
+    Thread- and process-safe handle on the SQLite database (one connection per
+    thread). Every write is a BEGIN IMMEDIATE transaction, so concurrent uvicorn
+    workers queue on SQLite's write lock instead of interleaving records.
+    """
+
+    def __init__(self, path: str = DB_FILE):
+        self.path = path
+        self._local = threading.local()
+        self.dedupe = DedupeIndex()
+        # Write transactions committed with synchronous=FULL (one WAL fsync each)
+        self.durable_commits = 0
+        self.connection().executescript(SCHEMA)
+        self._upgrade_schema()
+        # Databases written before the aggregates table existed
+        if self.get_meta('aggregates_built') is None or self.get_meta('rollups_built') is None:
+            self.rebuild_aggregates(if_missing=True)
+        if self.get_meta('postings_built') is None:
+            self.rebuild_search_index(if_missing=True)
+
+    def _upgrade_schema(self):
+        """Adds columns introduced after a database was created (once, under the write lock)."""
+        conn = self.connection()
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(classifications)")}
+        if any(name not in existing for name, _ in COLUMN_UPGRADES):
+            with self.transaction():
+                existing = {row[1] for row in conn.execute("PRAGMA table_info(classifications)")}
+                for name, declaration in COLUMN_UPGRADES:
+                    if name not in existing:
+                        conn.execute(f"ALTER TABLE classifications ADD COLUMN {name} {declaration}")
+        conn.executescript(UPGRADE_INDEXES)
+
+    # --- Connections ---
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            # Other workers may hold the write lock: wait for it instead of failing
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def transaction(self):
+        return _Transaction(self.connection())
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # --- Writes ---
+
+    def _row_values(self, data: Dict) -> tuple:
+        privacy = data.get('privacy') or 'Desconhecido'
+        status = normalize_privacy(privacy)
+        category = data.get('category') or 'Geral'
+        detected = data.get('detected_pii')
+        if isinstance(detected, str):
+            detected = json.loads(detected) if detected else None
+        latency = data.get('latency_ms')
+        return (
+            data.get('id') or str(uuid.uuid4()),
+            data.get('timestamp') or datetime.datetime.now().isoformat(),
+            data.get('type') or 'Texto',
+            category,
+            privacy,
+            data.get('reason', data.get('privacy_reason', '')) or '',
+            data.get('text', data.get('text_snippet', '')) or '',
+            status,
+            macro_category_for(status, category, detected),
+            data.get('owner_key') or owner_key_for(data.get('owner')),
+            json.dumps(list(detected), ensure_ascii=False) if detected is not None else None,
+            data.get('tier') or None,
+            data.get('provider') or None,
+            float(latency) if latency not in (None, '') else None,
+        )
+
+    _INSERT = (
+        f"INSERT INTO classifications ({', '.join(ROW_COLUMNS)}) "
+        f"VALUES ({', '.join('?' * len(ROW_COLUMNS))})"
+    )
+
+    @staticmethod
+    def _counter_keys(values: tuple) -> List[tuple]:
+        """(dimension, key) counters one row increments, for a `_row_values` tuple."""
+        category, reason, status, macro, detected = values[3], values[5], values[7], values[8], values[10]
+        keys = [(AGG_TOTAL, ''), (AGG_PRIVACY, status), (AGG_MACRO, macro), (AGG_STATUS_MACRO, f"{status}|{macro}")]
+        keys += [(AGG_PII, name) for name in pii_names_for(status, category, reason, detected)]
+        return keys
+
+    @classmethod
+    def _aggregate_deltas(cls, values_list: Iterable[tuple]) -> Tuple[Dict[tuple, int], Dict[tuple, int]]:
+        """
+        Counter increments for rows given as `_row_values` tuples: totals keyed
+        (dimension, key) and rollups keyed (granularity, bucket, dimension, key).
+        """
+        deltas: Dict[tuple, int] = {}
+        rollups: Dict[tuple, int] = {}
+        for values in values_list:
+            timestamp = values[1] or ''
+            for key in cls._counter_keys(values):
+                deltas[key] = deltas.get(key, 0) + 1
+                if key[0] not in ROLLUP_DIMENSIONS:
+                    continue
+                for granularity, width in BUCKET_WIDTH.items():
+                    rollup = (granularity, timestamp[:width]) + key
+                    rollups[rollup] = rollups.get(rollup, 0) + 1
+        return deltas, rollups
+
+    @staticmethod
+    def _apply_deltas(conn: sqlite3.Connection, deltas: Tuple[Dict[tuple, int], Dict[tuple, int]]):
+        totals, rollups = deltas
+        conn.executemany(_UPSERT_AGGREGATE, [key + (n,) for key, n in totals.items()])
+        conn.executemany(_UPSERT_ROLLUP, [key + (n,) for key, n in rollups.items()])
+
+    @staticmethod
+    def _postings(seq: int, values: tuple) -> List[tuple]:
+        # category, privacy_reason, text_snippet
+        return [(tok, seq) for tok in index_tokens(f"{values[3]}\n{values[5]}\n{values[6]}")]
+
+    def _write_rows(self, conn: sqlite3.Connection, values_list: List[tuple]) -> List[bool]:
+        """
+        Inserts rows, their postings and their counter increments; call inside a
+        transaction. Rows whose id is already stored (replays) are skipped, so
+        writes are idempotent on the id. Returns, per row, whether it was inserted.
+        """
+        self.dedupe.catch_up(conn)
+        postings, inserted, flags = [], [], []
+        for values in values_list:
+            if self.dedupe.is_duplicate(conn, values[0]):
+                flags.append(False)
+                continue
+            seq = conn.execute(self._INSERT, values).lastrowid
+            self.dedupe.record(values[0])
+            postings += self._postings(seq, values)
+            inserted.append(values)
+            flags.append(True)
+        conn.executemany("INSERT OR IGNORE INTO postings (token, seq) VALUES (?, ?)", postings)
+        self._apply_deltas(conn, self._aggregate_deltas(inserted))
+        return flags
+
+    def _set_durable(self, durable: bool):
+        # WAL + NORMAL only fsyncs at checkpoints; FULL fsyncs the WAL on every commit
+        self.connection().execute("PRAGMA synchronous=FULL" if durable else "PRAGMA synchronous=NORMAL")
+
+    def insert(self, data: Dict, durable: bool = False) -> str:
+        """
+        Stores one submission. Accepts the API field names (`reason`, `text`)
+        as well as the CSV ones (`privacy_reason`, `text_snippet`).
+        With `durable`, the commit is fsynced before returning. A submission
+        whose id is already stored is not written again; its id is returned.
+        """
+        values = self._row_values(data)
+        self._set_durable(durable)
+        with self.transaction() as conn:
+            self._write_rows(conn, [values])
+        self.durable_commits += durable
+        return values[0]
+
+    def insert_many(self, rows: Iterable[Dict], durable: bool = False) -> int:
+        """
+        Stores several rows in one transaction (one fsync for all of them with
+        `durable`). Returns how many were new (replayed ids are skipped).
+        """
+        return sum(self.insert_batch(rows, durable))
+
+    def insert_batch(self, rows: Iterable[Dict], durable: bool = False) -> List[bool]:
+        """Like `insert_many`, but reports per row whether it was new (False: id already stored)."""
+        values = [self._row_values(r) for r in rows]
+        self._set_durable(durable)
+        with self.transaction() as conn:
+            flags = self._write_rows(conn, values)
+        self.durable_commits += durable
+        return flags
+
+    def rebuild_aggregates(self, if_missing: bool = False) -> int:
+        """
+        Recomputes every counter and time rollup from the stored rows (recovery /
+        after manual edits). With `if_missing`, does nothing if another process
+        already built them.
+        """
+        conn = self.connection()
+        with self.transaction():
+            if (if_missing and self.get_meta('aggregates_built') is not None
+                    and self.get_meta('rollups_built') is not None):
+                return 0
+            conn.execute("DELETE FROM aggregates")
+            conn.execute("DELETE FROM rollups")
+            cursor = conn.execute(f"SELECT {', '.join(ROW_COLUMNS)} FROM classifications")
+            rows = 0
+            while True:
+                batch = cursor.fetchmany(1000)
+                if not batch:
+                    break
+                rows += len(batch)
+                self._apply_deltas(conn, self._aggregate_deltas(batch))
+            built = datetime.datetime.now().isoformat()
+            self.set_meta('aggregates_built', built, conn)
+            self.set_meta('rollups_built', built, conn)
+        return rows
+
+    def purge_before(self, timestamp: str) -> int:
+        """
+        LGPD retention: deletes every row logged before `timestamp` (ISO text),
+        found through the timestamp index (seq order is not time order: rows are
+        stamped before a write-behind batch assigns their seqs); counters,
+        rollups and postings of the deleted rows are subtracted in the same
+        transaction.
+        """
+        conn = self.connection()
+        with self.transaction():
+            cursor = conn.execute(
+                f"SELECT seq, {', '.join(ROW_COLUMNS)} FROM classifications WHERE timestamp < ?", (timestamp,))
+            rows = 0
+            while True:
+                batch = cursor.fetchmany(1000)
+                if not batch:
+                    break
+                rows += len(batch)
+                values = [tuple(row)[1:] for row in batch]
+                totals, rollups = self._aggregate_deltas(values)
+                self._apply_deltas(conn, ({k: -n for k, n in totals.items()}, {k: -n for k, n in rollups.items()}))
+                conn.executemany("DELETE FROM postings WHERE token = ? AND seq = ?", [
+                    posting for row in batch for posting in self._postings(row[0], tuple(row)[1:])])
+            if rows:
+                conn.execute("DELETE FROM classifications WHERE timestamp < ?", (timestamp,))
+                conn.execute("DELETE FROM aggregates WHERE count <= 0")
+                conn.execute("DELETE FROM rollups WHERE count <= 0")
+                # In-memory indexes (bitmap_index, columnar_cache) drop deleted seqs when this changes
+                self.set_meta('purges', str(self.purges() + 1), conn)
+        return rows
+
+    def purges(self) -> int:
+        """Number of retention purges that deleted rows."""
+        return int(self.get_meta('purges', '0'))
+
+    def rebuild_search_index(self, if_missing: bool = False) -> int:
+        """Recomputes the postings table from the stored rows."""
+        conn = self.connection()
+        with self.transaction():
+            if if_missing and self.get_meta('postings_built') is not None:
+                return 0
+            conn.execute("DELETE FROM postings")
+            cursor = conn.execute(
+                "SELECT seq, id, timestamp, type, category, privacy, privacy_reason, text_snippet FROM classifications")
+            rows = 0
+            while True:
+                batch = cursor.fetchmany(1000)
+                if not batch:
+                    break
+                rows += len(batch)
+                conn.executemany("INSERT OR IGNORE INTO postings (token, seq) VALUES (?, ?)", [
+                    posting for row in batch for posting in self._postings(row[0], tuple(row)[1:])])
+            self.set_meta('postings_built', datetime.datetime.now().isoformat(), conn)
+        return rows
+
+    # --- Reads ---
+
+    def _aggregate(self, dimension: str) -> Dict[str, int]:
+        rows = self.connection().execute(
+            "SELECT key, count FROM aggregates WHERE dimension = ? AND count > 0", (dimension,))
+        return {key: n for key, n in rows}
+
+    def count(self) -> int:
+        return self._aggregate(AGG_TOTAL).get('', 0)
+
+    def privacy_counts(self) -> Dict[str, int]:
+        return self._aggregate(AGG_PRIVACY)
+
+    def category_counts(self, privacy_status: Optional[str] = None) -> Dict[str, int]:
+        if privacy_status:
+            prefix = f"{privacy_status}|"
+            return {key[len(prefix):]: n for key, n in self._aggregate(AGG_STATUS_MACRO).items() if key.startswith(prefix)}
+        return self._aggregate(AGG_MACRO)
+
+    def pii_counts(self) -> Dict[str, int]:
+        """Sensitive rows per PII type name named in their category or reason."""
+        return self._aggregate(AGG_PII)
+
+    def timeseries(self, granularity: str, start: str, end: str) -> Dict[str, Dict[str, Dict[str, int]]]:
+        """
+        Rollup counters of the buckets between `start` and `end` (ISO text,
+        inclusive, truncated to the bucket width): {bucket: {dimension: {key: n}}}.
+        Only buckets with rows are present; total counts are under key ''.
+        """
+        width = BUCKET_WIDTH[granularity]
+        rows = self.connection().execute(
+            "SELECT bucket, dimension, key, count FROM rollups "
+            "WHERE granularity = ? AND bucket >= ? AND bucket <= ? AND count > 0 ORDER BY bucket",
+            (granularity, start[:width], end[:width]))
+        series: Dict[str, Dict[str, Dict[str, int]]] = {}
+        for bucket, dimension, key, n in rows:
+            series.setdefault(bucket, {}).setdefault(dimension, {})[key] = n
+        return series
+
+    def iter_newest(self, predicate: Optional[Callable[[Dict], bool]] = None, privacy_status: Optional[str] = None,
+                    columns: Optional[List[str]] = None, block_size: int = 256) -> Iterator[Dict]:
+        """
+        Rows newest first that satisfy `predicate`, read backwards from the end of
+        the log in blocks of `block_size` (keyset on seq, so each block is an index
+        range scan). Stop iterating as soon as enough rows were taken; no read
+        transaction is held open between blocks.
+        """
+        select = ", ".join(['seq'] + CSV_FIELDS + [c for c in (columns or []) if c not in CSV_FIELDS])
+        clauses, params = [], []
+        if privacy_status:
+            clauses.append("privacy_status = ?")
+            params.append(privacy_status)
+        before = None
+        while True:
+            where = clauses + (["seq < ?"] if before is not None else [])
+            sql = f"SELECT {select} FROM classifications"
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            sql += " ORDER BY seq DESC LIMIT ?"
+            block = self.connection().execute(
+                sql, params + ([before] if before is not None else []) + [block_size]).fetchall()
+            for row in block:
+                before = row['seq']
+                record = dict(row)
+                del record['seq']
+                if predicate is None or predicate(record):
+                    yield record
+            if len(block) < block_size:
+                return
+
+    def recent(self, limit: int = 50, privacy_status: Optional[str] = None,
+               predicate: Optional[Callable[[Dict], bool]] = None) -> List[Dict]:
+        """Newest `limit` rows (matching `predicate`), in the CSV layout."""
+        block_size = limit if predicate is None else max(limit, 256)
+        return list(islice(self.iter_newest(predicate, privacy_status, block_size=block_size), limit))
+
+    def page(self, limit: int, before: Optional[int] = None,
+             owner: Optional[str] = None) -> Tuple[List[Dict], Optional[int]]:
+        """
+        One page of rows newest first, starting below sequence number `before`.
+        With `owner`, only that citizen's rows (range scan on the owner index).
+        Returns (rows, next_before); next_before is None on the last page.
+        """
+        sql = "SELECT seq, " + ", ".join(CSV_FIELDS) + " FROM classifications"
+        clauses, params = [], []
+        if owner is not None:
+            clauses.append("owner_key = ?")
+            params.append(owner_key_for(owner))
+        if before is not None:
+            clauses.append("seq < ?")
+            params.append(before)
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        rows = self.connection().execute(sql + " ORDER BY seq DESC LIMIT ?", params + [limit + 1]).fetchall()
+        next_before = rows[limit - 1]['seq'] if len(rows) > limit else None
+        page = []
+        for row in rows[:limit]:
+            record = dict(row)
+            del record['seq']
+            page.append(record)
+        return page, next_before
+
+    def lookup(self, key: str, owner: Optional[str] = None, limit: int = 2) -> List[Dict]:
+        """
+        Rows whose id is `key`, or else starts with it (the 8-character short
+        ids shown to citizens): an index seek, then a range scan on the id
+        index. With `owner`, only that citizen's rows. At most `limit` rows, so
+        callers can tell a unique prefix from an ambiguous one.
+        """
+        sql = f"SELECT {', '.join(ROW_COLUMNS)} FROM classifications WHERE "
+        owner_clause, owner_params = ("", [])
+        if owner is not None:
+            owner_clause, owner_params = " AND owner_key = ?", [owner_key_for(owner)]
+        conn = self.connection()
+        rows = conn.execute(sql + "id = ?" + owner_clause + " LIMIT ?", [key] + owner_params + [limit]).fetchall()
+        if not rows:
+            # Every id starting with `key` sorts between it and key + the highest code point
+            rows = conn.execute(sql + "id >= ? AND id < ?" + owner_clause + " ORDER BY id LIMIT ?",
+                                [key, key + '\U0010ffff'] + owner_params + [limit]).fetchall()
+        return [dict(row) for row in rows]
+
+    def search(self, terms: Iterable[str]) -> Optional[List[int]]:
+        """
+        Inverted-index lookup: seq numbers (newest first) of rows containing every
+        token of at least one term, i.e. a union of posting-list intersections.
+        Returns None when a term has no indexable token (caller must scan instead).
+        """
+        selects, params = [], []
+        for term in terms:
+            tokens = sorted(index_tokens(term))
+            if not tokens:
+                return None
+            # Compound operators bind left to right in SQLite: wrap each intersection
+            selects.append("SELECT seq FROM (" + " INTERSECT ".join(
+                ["SELECT seq FROM postings WHERE token = ?"] * len(tokens)) + ")")
+            params += tokens
+        if not selects:
+            return []
+        sql = "SELECT seq FROM (" + " UNION ".join(selects) + ") ORDER BY seq DESC"
+        return [seq for (seq,) in self.connection().execute(sql, params)]
+
+    def iter_seqs(self, seqs: List[int], columns: Optional[List[str]] = None, chunk: int = 500) -> Iterator[Dict]:
+        """Rows for the given seq numbers, in the given order, fetched in chunks."""
+        select = ", ".join(['seq'] + CSV_FIELDS + [c for c in (columns or []) if c not in CSV_FIELDS])
+        for start in range(0, len(seqs), chunk):
+            part = seqs[start:start + chunk]
+            rows = self.connection().execute(
+                f"SELECT {select} FROM classifications WHERE seq IN ({','.join('?' * len(part))})", part).fetchall()
+            by_seq = {row['seq']: row for row in rows}
+            for seq in part:
+                row = by_seq.get(seq)
+                if row is not None:
+                    record = dict(row)
+                    del record['seq']
+                    yield record
+
+    def iter_after(self, seq: int, columns: List[str], block_size: int = 1000) -> Iterator[Dict]:
+        """Rows with seq > `seq` in insertion order (keyset blocks), for index catch-up."""
+        select = ", ".join(dict.fromkeys(['seq'] + columns))
+        while True:
+            block = self.connection().execute(
+                f"SELECT {select} FROM classifications WHERE seq > ? ORDER BY seq LIMIT ?", (seq, block_size)).fetchall()
+            for row in block:
+                seq = row['seq']
+                yield dict(row)
+            if len(block) < block_size:
+                return
+
+    def iter_logged(self, since: Optional[str], until: Optional[str], columns: List[str],
+                    after_seq: int = 0, through_seq: Optional[int] = None,
+                    block_size: int = 1000) -> Iterator[Dict]:
+        """
+        Rows logged between `since` and `until` (see time_clause) with a seq in
+        (after_seq, through_seq], in timestamp order (timestamp index, keyset
+        blocks), for the segment archive.
+        """
+        select = ", ".join(dict.fromkeys(['seq', 'timestamp'] + columns))
+        clauses, params = self.time_clause(since, until)
+        clauses.append("seq > ?")
+        params.append(after_seq)
+        if through_seq is not None:
+            clauses.append("seq <= ?")
+            params.append(through_seq)
+        position: List = []
+        while True:
+            where = clauses + (["(timestamp, seq) > (?, ?)"] if position else [])
+            block = self.connection().execute(
+                f"SELECT {select} FROM classifications WHERE {' AND '.join(where)} "
+                f"ORDER BY timestamp, seq LIMIT ?", params + position + [block_size]).fetchall()
+            for row in block:
+                yield dict(row)
+            if len(block) < block_size:
+                return
+            position = [block[-1]['timestamp'], block[-1]['seq']]
+
+    @staticmethod
+    def time_clause(since: Optional[str] = None, until: Optional[str] = None,
+                    column: str = "timestamp") -> Tuple[List[str], List[str]]:
+        """
+        SQL conditions (and params) for rows logged between `since` and `until`
+        (ISO text, inclusive; a date-only `until` covers that whole day).
+        `column="+timestamp"` keeps SQLite from choosing the timestamp index.
+        """
+        clauses, params = [], []
+        if since:
+            clauses.append(f"{column} >= ?")
+            params.append(since)
+        if until:
+            # Every timestamp starting with `until` sorts below until + the highest code point
+            clauses.append(f"{column} < ?")
+            params.append(until + '\U0010ffff')
+        return clauses, params
+
+    def seq_range(self, since: Optional[str] = None, until: Optional[str] = None) -> Tuple[int, Optional[int]]:
+        """
+        [start, stop) seq bounds enclosing every row logged between `since` and
+        `until` (see time_clause), from the timestamp index; stop is None when
+        unbounded. Timestamps are stamped before the seq is assigned (write-behind
+        batches, several workers), so rows of other times can fall inside the
+        bounds: readers filter by time_clause too.
+        """
+        clauses, params = self.time_clause(since, until)
+        if not clauses:
+            return 0, None
+        row = self.connection().execute(
+            f"SELECT MIN(seq), MAX(seq) FROM classifications WHERE {' AND '.join(clauses)}", params).fetchone()
+        if row[0] is None:
+            return 0, 0
+        return row[0], row[1] + 1
+
+    def seqs_between(self, since: Optional[str] = None, until: Optional[str] = None) -> List[int]:
+        """
+        Seqs of the rows logged between `since` and `until` (see time_clause),
+        from the timestamp index; every stored seq when both are None.
+        """
+        clauses, params = self.time_clause(since, until)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return [row[0] for row in self.connection().execute(f"SELECT seq FROM classifications{where}", params)]
+
+    def iter_export(self, since: Optional[str] = None, until: Optional[str] = None,
+                    privacy_status: Optional[str] = None, through_seq: Optional[int] = None,
+                    block_size: int = 1000) -> Iterator[Dict]:
+        """
+        Rows in the CSV layout, in seq order, restricted to a time range (seq
+        bounds on the primary key, then the timestamp itself), a privacy status
+        (privacy index) and/or rows up to `through_seq` (a snapshot); keyset
+        blocks, so no read transaction stays open while streaming.
+        """
+        start, stop = self.seq_range(since, until)
+        if through_seq is not None:
+            stop = through_seq + 1 if stop is None else min(stop, through_seq + 1)
+        clauses, params = ["seq >= ?"], [start]
+        if stop is not None:
+            clauses.append("seq < ?")
+            params.append(stop)
+        # Checked per row; the keyset walk stays on the primary key
+        time_clauses, time_params = self.time_clause(since, until, "+timestamp")
+        clauses += time_clauses
+        params += time_params
+        if privacy_status:
+            clauses.append("privacy_status = ?")
+            params.append(privacy_status)
+        sql = f"SELECT seq, {', '.join(CSV_FIELDS)} FROM classifications WHERE {' AND '.join(clauses)} ORDER BY seq LIMIT ?"
+        while True:
+            block = self.connection().execute(sql, params + [block_size]).fetchall()
+            for row in block:
+                record = dict(row)
+                del record['seq']
+                yield record
+            if len(block) < block_size:
+                return
+            params[0] = block[-1]['seq'] + 1
+
+    def export_state(self) -> Tuple[int, int, Optional[str]]:
+        """(last seq, purge count, last timestamp): changes whenever an export's content can."""
+        row = self.connection().execute(
+            "SELECT seq, timestamp FROM classifications ORDER BY seq DESC LIMIT 1").fetchone()
+        purges = self.purges()
+        if row is None:
+            return 0, purges, None
+        return row['seq'], purges, row['timestamp']
+
+    def iter_rows(self, newest_first: bool = False, columns: Optional[List[str]] = None) -> Iterator[Dict]:
+        """Streams every row (CSV layout plus any extra `columns`) without materializing the table."""
+        select = ", ".join(CSV_FIELDS + [c for c in (columns or []) if c not in CSV_FIELDS])
+        order = "DESC" if newest_first else "ASC"
+        cursor = self.connection().execute(f"SELECT {select} FROM classifications ORDER BY seq {order}")
+        for row in cursor:
+            yield dict(row)
+
+    # --- Meta ---
+
+    def get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        row = self.connection().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key: str, value: str, conn: Optional[sqlite3.Connection] = None):
+        (conn or self.connection()).execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value))
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """
+        Takes or renews the lease `name` for `owner` (a meta row "owner|expiry")
+        when it is free, expired or already held by `owner`: at most one holder
+        across worker processes. Holders renew well before `ttl` seconds pass.
+        """
+        key, now = f"lease:{name}", time.time()
+        with self.transaction():
+            held = self.get_meta(key)
+            if held:
+                holder, _, expires = held.rpartition('|')
+                if holder != owner and float(expires) > now:
+                    return False
+            self.set_meta(key, f"{owner}|{now + ttl}")
+        return True
+
+    def release_lease(self, name: str, owner: str):
+        """Frees the lease `name` if `owner` holds it (another worker can take it at once)."""
+        key = f"lease:{name}"
+        with self.transaction():
+            held = self.get_meta(key)
+            if held and held.rpartition('|')[0] == owner:
+                self.connection().execute("DELETE FROM meta WHERE key = ?", (key,))
+
+    # --- CSV import / export ---
+
+    def migrate_csv(self, csv_path: str = LEGACY_CSV_FILE, rename: bool = True) -> int:
+        """
+        One-shot import of a legacy classifications.csv (single transaction).
+        The file is renamed to *.migrated afterwards so it is never imported twice;
+        the check runs under the write lock, so concurrent workers import it once.
+        Repeated ids in the file are imported once. Returns the rows imported.
+        """
+        marker = f"migrated:{os.path.abspath(csv_path)}"
+        with self.transaction() as conn:
+            if self.get_meta(marker) is not None or not os.path.exists(csv_path):
+                return 0
+            with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+                rows = list(csv.DictReader(f))
+            imported = sum(self._write_rows(conn, [self._row_values(r) for r in rows]))
+            self.set_meta(marker, datetime.datetime.now().isoformat(), conn)
+        if rename:
+            os.replace(csv_path, csv_path + '.migrated')
+        return imported
+
+    def iter_csv(self, rows: Optional[Iterable[Dict]] = None, batch_size: int = 500) -> Iterator[str]:
+        """Yields the CSV export (header first) in chunks of `batch_size` rows."""
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(CSV_FIELDS)
+        pending = 0
+        for row in (self.iter_rows() if rows is None else rows):
+            writer.writerow([row.get(k, '') for k in CSV_FIELDS])
+            pending += 1
+            if pending >= batch_size:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+                pending = 0
+        yield buf.getvalue()
+
+    def export_csv(self, csv_path: str) -> int:
+        """Writes the whole log to `csv_path` in the legacy CSV layout."""
+        count = 0
+
+        def counted():
+            nonlocal count
+            for row in self.iter_rows():
+                count += 1
+                yield row
+
+        tmp_path = csv_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+            for chunk in self.iter_csv(counted()):
+                f.write(chunk)
+        os.replace(tmp_path, csv_path)
+        return count
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK around a block (takes the write lock up front)."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+# --- Process-wide store ---
+
+_store: Optional[ClassificationStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ClassificationStore:
+    """Opens data/classifications.db on first use, importing a legacy CSV log if the DB is empty."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = ClassificationStore(DB_FILE)
+                if os.path.exists(LEGACY_CSV_FILE) and store.count() == 0:
+                    try:
+                        imported = store.migrate_csv(LEGACY_CSV_FILE)
+                        if imported:
+                            print(f"Migrated {imported} rows from {LEGACY_CSV_FILE}")
+                    except Exception as e:
+                        print(f"Error migrating legacy CSV: {e}")
+                _store = store
+    return _store
@@ -0,0 +1,235 @@
+"""
+Taxonomy Indexes
+----------------
+Immutable, precomputed views of the JSON taxonomies in data/, built once and
+rebuilt only when the underlying file changes (mtime/size check per call).
+
+- CategoryTaxonomy: manifestation categories from data/categories.json, with
+  ID -> category lookups, subcategory sets and the prompt fragment the LLM
+  providers embed in their classification prompts.
+- PIITaxonomy: PII types from data/pii_config.json, with O(1)
+  type/name/alias -> display name -> macro category -> severity lookups,
+  the dashboard search terms per macro category, and keyword automata for
+  sensitive-context detection and the dashboard deep search.
+"""
+import os
+import json
+import threading
+from types import MappingProxyType
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from keyword_automaton import KeywordAutomaton
+from text_utils import fold_text
+
+CATEGORIES_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'categories.json')
+PII_CONFIG_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'pii_config.json')
+
+PUBLIC_CATEGORY = "Público"
+DEFAULT_SENSITIVE_CATEGORY = "Dados Pessoais"
+
+
+class CategoryTaxonomy:
+    """Read-only manifestation taxonomy. Do not mutate; build a new one instead."""
+
+    __slots__ = ('categories', 'by_id', 'by_label', 'subcategories', 'prompt_fragment')
+
+    def __init__(self, categories: List[Dict]):
+        frozen = tuple(MappingProxyType(dict(c, subcategories=tuple(c['subcategories']))) for c in categories)
+        object.__setattr__(self, 'categories', frozen)
+        object.__setattr__(self, 'by_id', MappingProxyType({c['id']: c for c in frozen}))
+
+        by_label = {}
+        for c in frozen:
+            by_label[c['id'].lower()] = c['id']
+            by_label[c['name'].lower()] = c['id']
+        object.__setattr__(self, 'by_label', MappingProxyType(by_label))
+        object.__setattr__(self, 'subcategories', MappingProxyType(
+            {c['id']: frozenset(c['subcategories']) for c in frozen}))
+        object.__setattr__(self, 'prompt_fragment', ", ".join(
+            f"{c['id']} ({', '.join(c['subcategories'])})" for c in frozen))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CategoryTaxonomy is immutable")
+
+    def __iter__(self):
+        return iter(self.categories)
+
+    def __len__(self):
+        return len(self.categories)
+
+    def as_list(self) -> List[Dict]:
+        """Plain dict copies, as json.load would return them."""
+        return [dict(c, subcategories=list(c['subcategories'])) for c in self.categories]
+
+    def resolve_label(self, label: Optional[str]) -> Optional[str]:
+        """Maps a category id or display name (any case) to its id."""
+        return self.by_label.get((label or '').strip().lower())
+
+    def resolve(self, cat_id: Optional[str], subcategory: Optional[str] = None) -> Optional[Dict]:
+        """
+        Returns a mutable copy of the category with `selected_subcategory` set
+        (the first subcategory when `subcategory` is not one of its own), or None.
+        """
+        cat = self.by_id.get(cat_id)
+        if cat is None:
+            return None
+        res = dict(cat, subcategories=list(cat['subcategories']))
+        res['selected_subcategory'] = subcategory if subcategory in self.subcategories[cat_id] else cat['subcategories'][0]
+        return res
+
+
+class PIITaxonomy:
+    """Read-only PII type index derived from pii_config.json."""
+
+    __slots__ = ('types', 'by_label', 'macros', 'macro_priority', 'macro_terms',
+                 'context_automaton', 'search_automaton', 'label_automaton')
+
+    def __init__(self, config: Dict):
+        types, by_label, context_terms = {}, {}, []
+        for group in config.get('pii_types', {}).values():
+            for t in group.get('types', []):
+                entry = MappingProxyType({
+                    'id': t['id'],
+                    'name': t['name'],
+                    'macro': t.get('macro', group.get('macro', DEFAULT_SENSITIVE_CATEGORY)),
+                    'severity': t.get('severity', 'medium'),
+                    'aliases': tuple(t.get('aliases', ())),
+                })
+                types[t['id']] = entry
+                for label in (t['id'], t['name'], *entry['aliases']):
+                    by_label.setdefault(label.strip().lower(), entry)
+                context_terms += [(term, t['id']) for term in t.get('context_terms', ())]
+
+        macros = config.get('macro_categories', {})
+        ordered = sorted(macros.items(), key=lambda item: item[1].get('priority', 99))
+        object.__setattr__(self, 'types', MappingProxyType(types))
+        object.__setattr__(self, 'by_label', MappingProxyType(by_label))
+        object.__setattr__(self, 'macros', tuple(name for name, _ in ordered))
+        object.__setattr__(self, 'macro_priority', MappingProxyType(
+            {name: i for i, (name, _) in enumerate(ordered)}))
+        object.__setattr__(self, 'macro_terms', MappingProxyType(
+            {name: tuple(term.lower() for term in spec.get('search_terms', ())) for name, spec in ordered}))
+
+        # Context terms ("prontuário", "medida protetiva") -> PII type id
+        object.__setattr__(self, 'context_automaton', KeywordAutomaton(context_terms))
+        # Every deep-search term (macro terms, PII names and aliases) -> folded term
+        search_terms = {fold_text(term) for terms in self.macro_terms.values() for term in terms}
+        for entry in types.values():
+            search_terms.update(fold_text(label) for label in (entry['name'], *entry['aliases']))
+        object.__setattr__(self, 'search_automaton', KeywordAutomaton((term, term) for term in search_terms))
+        # PII display names and aliases ("Chave PIX", "E-mail") -> PII type id
+        object.__setattr__(self, 'label_automaton', KeywordAutomaton(
+            (label, entry['id']) for entry in types.values() for label in (entry['name'], *entry['aliases'])))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("PIITaxonomy is immutable")
+
+    def lookup(self, label: Optional[str]) -> Optional[Mapping]:
+        """Type entry for a type id, display name or alias (any case)."""
+        return self.by_label.get((label or '').strip().lower())
+
+    def name(self, type_id: str) -> str:
+        entry = self.types.get(type_id)
+        return entry['name'] if entry else type_id
+
+    def severity(self, label: str) -> Optional[str]:
+        entry = self.lookup(label)
+        return entry['severity'] if entry else None
+
+    def macro_for(self, detected_pii: Iterable[str]) -> str:
+        """Highest-priority macro category among the detected PII labels, or "Público"."""
+        best = None
+        for label in detected_pii:
+            entry = self.lookup(label)
+            if entry and (best is None or self.macro_priority.get(entry['macro'], 99) < self.macro_priority.get(best, 99)):
+                best = entry['macro']
+        return best or PUBLIC_CATEGORY
+
+    def macro_for_label(self, label: Optional[str], default: str = DEFAULT_SENSITIVE_CATEGORY) -> str:
+        """Macro category for a logged category label (a macro name or a PII name)."""
+        label = (label or '').strip()
+        if label in self.macro_priority:
+            return label
+        entry = self.lookup(label)
+        return entry['macro'] if entry else default
+
+    def search_terms(self, label: str) -> Tuple[str, ...]:
+        """Lowercased terms the dashboard deep search matches for a filter value."""
+        if label in self.macro_terms:
+            return self.macro_terms[label]
+        lowered = label.strip().lower()
+        terms = [lowered, lowered.replace("e-mail", "email")]
+        entry = self.lookup(label)
+        if entry:
+            terms += [entry['name'].lower(), *(a.lower() for a in entry['aliases'])]
+        return tuple(dict.fromkeys(terms))
+
+    def detect_context(self, text: str, enabled: Iterable[str]) -> List[str]:
+        """Enabled PII type ids whose context terms occur in the text (whole words, one pass)."""
+        hits = self.context_automaton.matched(text, whole_words=True)
+        return [type_id for type_id in enabled if type_id in hits]
+
+    def types_in(self, *texts: Optional[str]) -> List[str]:
+        """PII type ids named in logged labels/reasons ("Dados detectados via regex: CPF, E-mail")."""
+        found = set()
+        for text in texts:
+            found |= self.label_automaton.matched(text or '', whole_words=True)
+        return [type_id for type_id in self.types if type_id in found]
+
+    def search_matcher(self, label: str) -> Tuple[KeywordAutomaton, Set[str]]:
+        """
+        (automaton, accepted payloads) for a deep-search filter value. Known
+        terms reuse the shared automaton; free-text filters get their own.
+        """
+        accept = {fold_text(term) for term in self.search_terms(label)}
+        if accept <= self.search_automaton.payloads:
+            return self.search_automaton, accept
+        return KeywordAutomaton((term, term) for term in accept), accept
+
+
+class _FileBacked:
+    """Caches `build(parsed_json)` and rebuilds it when the file's mtime/size change."""
+
+    def __init__(self, path: str, build: Callable, empty):
+        self.path = path
+        self.build = build
+        self.empty = empty
+        self._stamp = None
+        self._value = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        try:
+            st = os.stat(self.path)
+            stamp = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            stamp = None
+        if stamp == self._stamp and self._value is not None:
+            return self._value
+        with self._lock:
+            if stamp != self._stamp or self._value is None:
+                value = self.empty
+                if stamp is not None:
+                    try:
+                        with open(self.path, 'r', encoding='utf-8') as f:
+                            value = self.build(json.load(f))
+                    except Exception as e:
+                        print(f"Error loading {os.path.basename(self.path)}: {e}")
+                self._value, self._stamp = value, stamp
+            return self._value
+
+
+_categories = _FileBacked(CATEGORIES_FILE, lambda data: CategoryTaxonomy(data['categories']), CategoryTaxonomy([]))
+
+
+def get_category_taxonomy() -> CategoryTaxonomy:
+    """Shared manifestation taxonomy; re-parsed only when data/categories.json changes."""
+    return _categories.get()
+
+
+_pii = _FileBacked(PII_CONFIG_FILE, PIITaxonomy, PIITaxonomy({}))
+
+
+def get_pii_taxonomy() -> PIITaxonomy:
+    """Shared PII type index; re-parsed only when data/pii_config.json changes."""
+    return _pii.get()
@@ -0,0 +1,43 @@
+"""
+Text normalization helpers shared by the classifiers and keyword matchers.
+"""
+import re
+import unicodedata
+from typing import List, Set, Tuple
+
+
+def fold_text(text: str) -> str:
+    """Lowercases and strips accents ("Saúde" -> "saude")."""
+    text = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def fold_with_offsets(text: str) -> Tuple[str, List[int]]:
+    """
+    Like fold_text, but also returns, for each folded character, the index of
+    the original character it came from, so matches can be mapped back.
+    """
+    if text.isascii():
+        return text.lower(), list(range(len(text)))
+    out, offsets = [], []
+    for i, ch in enumerate(text):
+        for c in unicodedata.normalize('NFKD', ch.lower()):
+            if not unicodedata.combining(c):
+                out.append(c)
+                offsets.append(i)
+    return ''.join(out), offsets
+
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Too frequent to narrow a search; never indexed or looked up
+STOPWORDS = frozenset({
+    'a', 'o', 'as', 'os', 'e', 'de', 'da', 'do', 'das', 'dos', 'em', 'na', 'no', 'nas', 'nos',
+    'um', 'uma', 'para', 'por', 'com', 'que', 'se', 'ao', 'aos',
+})
+
+
+def index_tokens(text: str) -> Set[str]:
+    """Distinct accent-folded word tokens worth indexing (no stopwords, no bare numbers)."""
+    return {tok for tok in _TOKEN_RE.findall(fold_text(text or ''))
+            if tok not in STOPWORDS and not tok.isdigit()}
@@ -0,0 +1,195 @@
+"""
+Write-Behind Submission Logger
+------------------------------
+/api/submit hands records to an in-memory queue; a background writer thread
+flushes them to the classification store in batches (size or time trigger),
+so request latency no longer includes a disk write per submission.
+
+Durability modes (system_config.json -> submit_durability):
+- "fsync": every submission is committed and fsynced on its own before the
+  response (no batching; slowest, nothing acknowledged can be lost).
+- "group": the response waits for the batch commit containing the
+  submission. Each batch is one transaction committed with
+  synchronous=FULL, i.e. exactly one fsync per batch instead of one per
+  submission (group commit), and nothing acknowledged can be lost. Default.
+- "async": the response returns as soon as the record is queued; batches
+  are committed with synchronous=NORMAL (no fsync; the WAL is synced at
+  checkpoints). A crash loses at most the records still in the queue, a
+  power loss also the last committed batches.
+
+The queue is drained on shutdown (`stop`) and at interpreter exit.
+"""
+import asyncio
+import atexit
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+from storage import ClassificationStore, get_store
+
+DURABILITY_FSYNC = "fsync"
+DURABILITY_GROUP = "group"
+DURABILITY_ASYNC = "async"
+DURABILITY_MODES = (DURABILITY_FSYNC, DURABILITY_GROUP, DURABILITY_ASYNC)
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_FLUSH_MS = 10
+
+_STOP = object()
+
+
+def _resolve(waiter, result=None, error: Optional[Exception] = None):
+    """Completes a request's future from the writer thread."""
+    if waiter is None:
+        return
+    loop, future = waiter
+
+    def complete():
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    try:
+        loop.call_soon_threadsafe(complete)
+    except RuntimeError:
+        pass  # the request's event loop is gone; nothing is waiting anymore
+
+
+class WriteBehindLogger:
+    """Queue + writer thread in front of a ClassificationStore."""
+
+    def __init__(self, store: ClassificationStore, durability: str = DURABILITY_GROUP,
+                 batch_size: int = DEFAULT_BATCH_SIZE, flush_ms: float = DEFAULT_FLUSH_MS):
+        if durability not in DURABILITY_MODES:
+            print(f"Unknown durability mode '{durability}', using '{DURABILITY_GROUP}'")
+            durability = DURABILITY_GROUP
+        self.store = store
+        self.durability = durability
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.0, float(flush_ms)) / 1000.0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="submission-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Flushes everything queued so far and stops the writer thread."""
+        with self._lock:
+            thread = self._thread
+            if thread is None or not thread.is_alive():
+                return
+            self._queue.put(_STOP)
+        thread.join(timeout)
+
+    async def submit(self, record: Dict) -> str:
+        """Logs one record (which must carry its `id`) according to the durability mode."""
+        if self.durability == DURABILITY_FSYNC:
+            return await asyncio.to_thread(self.store.insert, record, True)
+
+        self.start()
+        if self.durability == DURABILITY_ASYNC:
+            self._queue.put((record, None))
+            return record['id']
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.put((record, (loop, future)))
+        return await future
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> Dict:
+        return {
+            "durability": self.durability,
+            "batch_size": self.batch_size,
+            "flush_ms": self.flush_interval * 1000,
+            "queued": self.pending(),
+            "batches": self.batches,
+            "rows": self.rows,
+        }
+
+    # --- Writer thread ---
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+
+    def _flush(self, batch: List):
+        durable = self.durability != DURABILITY_ASYNC
+        try:
+            self.store.insert_many([record for record, _ in batch], durable=durable)
+        except Exception as e:
+            print(f"Error flushing {len(batch)} submissions, retrying one by one: {e}")
+            for record, waiter in batch:
+                try:
+                    self.store.insert(record, durable=durable)
+                except Exception as row_error:
+                    print(f"Error saving submission {record.get('id')}: {row_error}")
+                    _resolve(waiter, error=row_error)
+                else:
+                    self.rows += 1
+                    _resolve(waiter, record['id'])
+            self.batches += 1
+            return
+        self.batches += 1
+        self.rows += len(batch)
+        for record, waiter in batch:
+            _resolve(waiter, record['id'])
+
+
+_logger: Optional[WriteBehindLogger] = None
+_logger_lock = threading.Lock()
+
+
+def configure_submission_logger(durability: str = DURABILITY_GROUP, batch_size: int = DEFAULT_BATCH_SIZE,
+                                flush_ms: float = DEFAULT_FLUSH_MS) -> WriteBehindLogger:
+    """Replaces the process-wide logger (draining the previous one first)."""
+    global _logger
+    with _logger_lock:
+        previous = _logger
+        _logger = WriteBehindLogger(get_store(), durability, batch_size, flush_ms)
+    if previous is not None:
+        previous.stop()
+    return _logger
+
+
+def get_submission_logger() -> WriteBehindLogger:
+    """Process-wide logger; defaults to group commit until configured at startup."""
+    global _logger
+    if _logger is None:
+        with _logger_lock:
+            if _logger is None:
+                _logger = WriteBehindLogger(get_store())
+    return _logger
+
+
+@atexit.register
+def _drain_at_exit():
+    if _logger is not None:
+        _logger.stop(timeout=10)
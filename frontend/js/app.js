@@ -40,13 +40,26 @@ let latestRedactedText = "";
 let lastClassificationResult = null; // Store last server classification result
 
 // --- Database Logic (Server-Side Only) ---
+
+// Anonymous per-browser key: 'My Submissions' only lists records sent with it
+function getOwnerKey() {
+    let owner = localStorage.getItem('participa_owner_key');
+    if (!owner) {
+        owner = (window.crypto && crypto.randomUUID)
+            ? crypto.randomUUID()
+            : Array.from({ length: 4 }, () => Math.random().toString(36).slice(2)).join('');
+        localStorage.setItem('participa_owner_key', owner);
+    }
+    return owner;
+}
+
 async function saveSubmission(data) {
-    // 1. Send to server for permanent CSV logging
+    // 1. Send to server for permanent logging
     try {
         const response = await fetch('/api/submit', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(data)
+            body: JSON.stringify({ ...data, owner: getOwnerKey() })
         });
 
         if (!response.ok) throw new Error('Erro ao salvar no servidor');
@@ -67,15 +80,24 @@ async function saveSubmission(data) {
         const displayId = finalId.length > 8 ? finalId.substring(0, 8) : finalId;
 
         let privacyMessageHTML = '';
+        if (result.status === 'queued') {
+            // Stored by the service worker; sent with /api/submit/batch when back online
+            privacyMessageHTML += `
+                <div style="background-color: #e2e3e5; color: #383d41; padding: 15px; border-radius: 8px; margin-bottom: 20px; font-size: 0.95rem; text-align: left; border: 1px solid #d6d8db;">
+                    <strong>📶 Sem conexão:</strong><br>
+                    Sua manifestação foi salva neste dispositivo e será enviada automaticamente quando a conexão voltar.
+                </div>
+            `;
+        }
         if (data.privacy === 'Sigiloso') {
-            privacyMessageHTML = `
+            privacyMessageHTML += `
                 <div style="background-color: #fff3cd; color: #856404; padding: 15px; border-radius: 8px; margin-bottom: 20px; font-size: 0.95rem; text-align: left; border: 1px solid #ffeeba;">
                     <strong>⚠️ Atenção:</strong><br>
                     Como sua manifestação possui dados sensíveis, ela foi classificada como <strong>Sigiloso</strong> para proteção da sua identidade.
                 </div>
             `;
         } else {
-            privacyMessageHTML = `
+            privacyMessageHTML += `
                 <p style="color: #666; margin-bottom: 25px;">Status de privacidade: <strong style="color: #28a745;">${data.privacy}</strong></p>
             `;
         }
@@ -110,48 +132,88 @@ async function saveSubmission(data) {
     }
 }
 
-async function renderSubmissions() {
-    submissionsList.innerHTML = '<p style="text-align: center; color: #888; margin-top: 50px;">Carregando...</p>';
+// Ask the service worker to send submissions queued while offline
+window.addEventListener('online', () => {
+    if (navigator.serviceWorker && navigator.serviceWorker.controller) {
+        navigator.serviceWorker.controller.postMessage('flush-submissions');
+    }
+});
 
-    try {
-        // Fetch from server API (unified data source - CSV only)
-        const response = await fetch('/api/submissions');
-        if (!response.ok) throw new Error('Falha ao buscar manifestações');
+const SUBMISSIONS_PAGE_SIZE = 20;
+
+function renderSubmissionItem(item) {
+    const div = document.createElement('div');
+    div.className = 'submission-item';
+
+    const privacyClass = item.privacy === 'Sigiloso' ? 'badge-sensitive' : 'badge-public';
+
+    div.innerHTML = `
+        <div class="submission-header">
+            <span class="submission-protocol">#${item.id}</span>
+            <span class="submission-date">${item.date}</span>
+        </div>
+        <div class="submission-badges">
+            <span class="submission-badge badge-type">${item.type}</span>
+            <span class="submission-badge ${privacyClass}">${item.privacy}</span>
+            <span class="submission-badge badge-category">${item.category}</span>
+        </div>
+        <div class="submission-body">${item.text}</div>
+    `;
+    return div;
+}
 
-        const data = await response.json();
+async function fetchSubmissionsPage(cursor) {
+    const params = new URLSearchParams({ limit: SUBMISSIONS_PAGE_SIZE, owner: getOwnerKey() });
+    if (cursor) params.set('cursor', cursor);
+
+    const response = await fetch(`/api/submissions?${params}`);
+    if (!response.ok) throw new Error('Falha ao buscar manifestações');
+    return response.json();
+}
+
+async function renderSubmissions(cursor = null) {
+    const loadMoreBtn = document.getElementById('load-more-submissions');
+    if (!cursor) {
+        submissionsList.innerHTML = '<p style="text-align: center; color: #888; margin-top: 50px;">Carregando...</p>';
+    } else if (loadMoreBtn) {
+        loadMoreBtn.disabled = true;
+        loadMoreBtn.textContent = 'Carregando...';
+    }
+
+    try {
+        // Fetch one page from the server API (newest first)
+        const data = await fetchSubmissionsPage(cursor);
         const submissions = data.submissions || [];
 
-        submissionsList.innerHTML = '';
+        if (!cursor) submissionsList.innerHTML = '';
+        if (loadMoreBtn) loadMoreBtn.remove();
 
-        if (submissions.length === 0) {
+        if (!cursor && submissions.length === 0) {
             submissionsList.innerHTML = '<p style="text-align: center; color: #888; margin-top: 50px;">Nenhuma manifestação registrada ainda.</p>';
             return;
         }
 
-        // Render server data (from CSV)
-        submissions.forEach(item => {
-            const div = document.createElement('div');
-            div.className = 'submission-item';
-
-            const privacyClass = item.privacy === 'Sigiloso' ? 'badge-sensitive' : 'badge-public';
+        submissions.forEach(item => submissionsList.appendChild(renderSubmissionItem(item)));
 
-            div.innerHTML = `
-                <div class="submission-header">
-                    <span class="submission-protocol">#${item.id}</span>
-                    <span class="submission-date">${item.date}</span>
-                </div>
-                <div class="submission-badges">
-                    <span class="submission-badge badge-type">${item.type}</span>
-                    <span class="submission-badge ${privacyClass}">${item.privacy}</span>
-                    <span class="submission-badge badge-category">${item.category}</span>
-                </div>
-                <div class="submission-body">${item.text}</div>
-            `;
-            submissionsList.appendChild(div);
-        });
+        // Next page on demand
+        if (data.next_cursor) {
+            const btn = document.createElement('button');
+            btn.id = 'load-more-submissions';
+            btn.style.cssText = 'display: block; margin: 15px auto; padding: 8px 15px; border: 1px solid var(--gdf-blue-dark); background: none; color: var(--gdf-blue-dark); border-radius: 6px; cursor: pointer; font-size: 0.9rem;';
+            btn.textContent = 'Carregar mais';
+            btn.addEventListener('click', () => renderSubmissions(data.next_cursor));
+            submissionsList.appendChild(btn);
+        }
 
     } catch (error) {
         console.error('Error fetching submissions:', error);
+        if (cursor) {
+            if (loadMoreBtn) {
+                loadMoreBtn.disabled = false;
+                loadMoreBtn.textContent = 'Carregar mais';
+            }
+            return;
+        }
         submissionsList.innerHTML = '<p style="text-align: center; color: #dc3545; margin-top: 50px;">⚠️ Erro ao carregar manifestações do servidor. Verifique se o backend está rodando.</p>';
     }
 }
@@ -242,7 +304,12 @@ document.getElementById('submit-btn').addEventListener('click', async () => {
             ? submissionResult.category
             : (isActuallySensitive ? "Dados Pessoais" : "Público"), // Fallback to Macro Categories
         privacy: finalPrivacyStatus,
-        reason: submissionResult.reason || (localCheck.hasPII ? "Detectado Localmente" : "")
+        reason: submissionResult.reason || (localCheck.hasPII ? "Detectado Localmente" : ""),
+        // Structured detection results, stored as typed columns
+        detected_pii: submissionResult.detected_pii || [],
+        tier: submissionResult.tier || null,
+        provider: submissionResult.provider || null,
+        latency_ms: submissionResult.latency_ms ?? null
     };
 
     await saveSubmission(submission);
@@ -865,6 +932,7 @@ async function seedDatabase() {
 
         let count = 0;
         const totalToSubmit = 20;
+        const batch = [];
 
         for (let i = 0; i < totalToSubmit; i++) {
             // Pick a random sample from the 400+ samples
@@ -880,23 +948,32 @@ async function seedDatabase() {
             if (!classResponse.ok) continue;
             const classResult = await classResponse.json();
 
-            // 2. Submit
-            await fetch('/api/submit', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    id: classResult.id,
-                    text: sample.text,
-                    category: classResult.category || "Geral",
-                    privacy: classResult.privacy_status || "Público",
-                    reason: classResult.reason || ""
-                })
+            // 2. Queue for the batch submit
+            batch.push({
+                id: classResult.id,
+                text: sample.text,
+                category: classResult.category || "Geral",
+                privacy: classResult.privacy_status || "Público",
+                reason: classResult.reason || "",
+                detected_pii: classResult.detected_pii || [],
+                tier: classResult.tier || null,
+                provider: classResult.provider || null,
+                latency_ms: classResult.latency_ms ?? null
             });
 
-            count++;
-            seedDataBtn.textContent = `Enviando (${count}/${totalToSubmit})...`;
+            seedDataBtn.textContent = `Classificando (${batch.length}/${totalToSubmit})...`;
         }
 
+        // 3. Submit all of them in one request (one transaction on the server)
+        const submitResponse = await fetch('/api/submit/batch', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(batch)
+        });
+        if (!submitResponse.ok) throw new Error('Falha ao enviar o lote');
+        const submitResult = await submitResponse.json();
+        count = submitResult.created;
+
         alert(`Simulação concluída! ${count} registros da amostra e-SIC foram enviados com sucesso.`);
     } catch (e) {
         console.error("Seed Error:", e);
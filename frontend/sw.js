@@ -1,4 +1,4 @@
-const CACHE_NAME = 'participa-df-v2'; // Incremented version
+const CACHE_NAME = 'participa-df-v6'; // Incremented version
 const ASSETS = [
     './',
     './index.html',
@@ -32,9 +32,93 @@ self.addEventListener('activate', (e) => {
     );
 });
 
+// --- Offline submission outbox ---
+// Submissions made while offline are kept in IndexedDB and sent together
+// through /api/submit/batch once the network is back (ids make it idempotent).
+const OUTBOX_DB = 'participa-outbox';
+const OUTBOX_STORE = 'submissions';
+const FLUSH_TAG = 'flush-submissions';
+
+function openOutbox() {
+    return new Promise((resolve, reject) => {
+        const request = indexedDB.open(OUTBOX_DB, 1);
+        request.onupgradeneeded = () => request.result.createObjectStore(OUTBOX_STORE, { keyPath: 'id' });
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => reject(request.error);
+    });
+}
+
+async function outboxTransaction(mode, action) {
+    const db = await openOutbox();
+    return new Promise((resolve, reject) => {
+        const tx = db.transaction(OUTBOX_STORE, mode);
+        const result = action(tx.objectStore(OUTBOX_STORE));
+        tx.oncomplete = () => resolve(result && 'result' in result ? result.result : undefined);
+        tx.onerror = () => reject(tx.error);
+    });
+}
+
+async function queueSubmission(submission) {
+    await outboxTransaction('readwrite', (store) => store.put(submission));
+    if (self.registration.sync) {
+        try { await self.registration.sync.register(FLUSH_TAG); } catch (err) { /* flushed on next online message */ }
+    }
+}
+
+async function flushOutbox() {
+    const queued = await outboxTransaction('readonly', (store) => store.getAll());
+    if (!queued || queued.length === 0) return 0;
+
+    const response = await fetch('/api/submit/batch', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(queued)
+    });
+    if (!response.ok) throw new Error(`Batch submit failed: ${response.status}`);
+    const result = await response.json();
+
+    // Stored (or already stored) items leave the outbox; invalid ones would never succeed either
+    await outboxTransaction('readwrite', (store) => {
+        result.results.forEach((item) => store.delete(queued[item.index].id));
+    });
+    console.log(`Service Worker: flushed ${queued.length} queued submissions`);
+    return queued.length;
+}
+
+self.addEventListener('sync', (e) => {
+    if (e.tag === FLUSH_TAG) e.waitUntil(flushOutbox());
+});
+
+// The page posts this when the browser comes back online (no Background Sync support needed)
+self.addEventListener('message', (e) => {
+    if (e.data === FLUSH_TAG) e.waitUntil(flushOutbox().catch((err) => console.log('Service Worker: outbox flush failed', err)));
+});
+
+async function submitOrQueue(request) {
+    const submission = await request.clone().json();
+    try {
+        const response = await fetch(request);
+        // Something queued earlier can go along now that the network works
+        if (response.ok) flushOutbox().catch(() => {});
+        return response;
+    } catch (err) {
+        await queueSubmission(submission);
+        return new Response(JSON.stringify({ status: 'queued', id: submission.id }), {
+            status: 202,
+            headers: { 'Content-Type': 'application/json' }
+        });
+    }
+}
+
 // Fetch Event - Network First Strategy
 // This ensures the latest version is served if the user is online
 self.addEventListener('fetch', (e) => {
+    // Submissions: queue for a later batch flush when the network is down
+    if (e.request.method === 'POST' && new URL(e.request.url).pathname === '/api/submit') {
+        e.respondWith(submitOrQueue(e.request));
+        return;
+    }
+
     // Only intercept GET requests
     if (e.request.method !== 'GET') return;
 
@@ -0,0 +1,111 @@
+"""
+Classification store maintenance
+--------------------------------
+Commands for data/classifications.db (see backend/storage.py):
+
+    python scripts/storage_admin.py migrate [legacy.csv]   # one-shot import of a CSV log
+    python scripts/storage_admin.py export [output.csv]     # CSV export (legacy layout)
+    python scripts/storage_admin.py stats                   # row counts per status/category
+    python scripts/storage_admin.py rebuild-aggregates      # recompute dashboard counters and hourly/daily rollups from the rows
+    python scripts/storage_admin.py rebuild-index           # recompute the deep-search inverted index
+    python scripts/storage_admin.py seal [--through DATE]   # write sealed daily segments (data/segments/)
+    python scripts/storage_admin.py purge --days N          # LGPD retention: drop rows/segments older than N days
+    python scripts/storage_admin.py segments                # list the segment manifest
+    python scripts/storage_admin.py parquet [output]        # Parquet export (per-day files + combined; needs pyarrow)
+"""
+import argparse
+import os
+import shutil
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from storage import DB_FILE, LEGACY_CSV_FILE, ClassificationStore
+from segments import SEGMENTS_DIR, SegmentArchive
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manutenção do banco de classificações")
+    parser.add_argument('--db', default=DB_FILE, help="Caminho do banco SQLite")
+    parser.add_argument('--segments-dir', default=SEGMENTS_DIR, help="Diretório dos segmentos diários")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    migrate = sub.add_parser('migrate', help="Importa um classifications.csv legado")
+    migrate.add_argument('csv_path', nargs='?', default=LEGACY_CSV_FILE)
+    migrate.add_argument('--keep', action='store_true', help="Não renomeia o CSV após importar")
+
+    export = sub.add_parser('export', help="Exporta o banco para CSV")
+    export.add_argument('csv_path', nargs='?', default=os.path.join(os.path.dirname(DB_FILE), 'classifications_export.csv'))
+
+    sub.add_parser('stats', help="Contagens por status e categoria")
+    sub.add_parser('rebuild-aggregates', help="Recalcula os contadores do dashboard e os totais por hora/dia a partir dos registros")
+    sub.add_parser('rebuild-index', help="Recalcula o índice invertido da busca avançada")
+    seal = sub.add_parser('seal', help="Gera os segmentos diários compactados dos dias concluídos")
+    seal.add_argument('--through', help="Último dia a selar (AAAA-MM-DD; padrão: ontem)")
+    purge = sub.add_parser('purge', help="Retenção LGPD: remove registros e segmentos mais antigos que N dias")
+    purge.add_argument('--days', type=int, required=True)
+    sub.add_parser('segments', help="Lista os segmentos do manifesto")
+    parquet = sub.add_parser('parquet', help="Exporta o histórico em Parquet (requer pyarrow)")
+    parquet.add_argument('output', nargs='?', help="Arquivo de saída (padrão: data/parquet/)")
+    parquet.add_argument('--day', help="Somente o segmento deste dia (AAAA-MM-DD)")
+    args = parser.parse_args()
+
+    store = ClassificationStore(args.db)
+    if args.command == 'migrate':
+        if not os.path.exists(args.csv_path):
+            print(f"[ERROR] CSV não encontrado: {args.csv_path}")
+            sys.exit(1)
+        imported = store.migrate_csv(args.csv_path, rename=not args.keep)
+        print(f"[OK] {imported} registros importados de {args.csv_path}")
+    elif args.command == 'export':
+        exported = store.export_csv(args.csv_path)
+        print(f"[OK] {exported} registros exportados para {args.csv_path}")
+    elif args.command == 'stats':
+        print(f"[INFO] Total: {store.count()}")
+        for status, n in sorted(store.privacy_counts().items()):
+            print(f"   {status}: {n}")
+        for cat, n in sorted(store.category_counts().items()):
+            print(f"   [{cat}] {n}")
+        for name, n in sorted(store.pii_counts().items()):
+            print(f"   <{name}> {n}")
+    elif args.command == 'rebuild-aggregates':
+        rows = store.rebuild_aggregates()
+        print(f"[OK] Contadores recalculados a partir de {rows} registros")
+    elif args.command == 'rebuild-index':
+        rows = store.rebuild_search_index()
+        print(f"[OK] Índice invertido recalculado a partir de {rows} registros")
+    elif args.command == 'seal':
+        sealed = SegmentArchive(store, args.segments_dir).seal(args.through)
+        for segment in sealed:
+            print(f"   {segment['day']}: {segment['rows']} registros, {segment['bytes']} bytes")
+        print(f"[OK] {len(sealed)} segmentos selados")
+    elif args.command == 'purge':
+        result = SegmentArchive(store, args.segments_dir).apply_retention(args.days)
+        print(f"[OK] {result['rows']} registros e {len(result['segments'])} segmentos anteriores a {result['cutoff']} removidos")
+    elif args.command == 'parquet':
+        from parquet_export import ParquetExporter, parquet_available
+        if not parquet_available():
+            print("[ERROR] pyarrow não está instalado (pip install pyarrow)")
+            sys.exit(1)
+        exporter = ParquetExporter(SegmentArchive(store, args.segments_dir))
+        converted = exporter.sync()
+        print(f"[INFO] {len(converted)} segmentos convertidos para Parquet")
+        if args.day:
+            path = exporter.segment_path(args.day)
+            if not os.path.exists(path):
+                print(f"[ERROR] Dia não selado: {args.day}")
+                sys.exit(1)
+        else:
+            path = exporter.export()
+        if args.output:
+            shutil.copyfile(path, args.output)
+            path = args.output
+        print(f"[OK] Parquet em {path}")
+    elif args.command == 'segments':
+        for segment in SegmentArchive(store, args.segments_dir).segments():
+            print(f"   {segment['day']}: {segment['rows']} registros, seq {segment['first_seq']}-{segment['last_seq']}, "
+                  f"{segment['bytes']} bytes")
+
+
+if __name__ == "__main__":
+    main()
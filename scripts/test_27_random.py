@@ -9,7 +9,7 @@ import time
 # Configuration
 EXCEL_FILE = "repositório 300.xlsx"
 API_URL_CLASSIFY = "http://localhost:8000/api/classify"
-API_URL_SUBMIT = "http://localhost:8000/api/submit"
+API_URL_SUBMIT_BATCH = "http://localhost:8000/api/submit/batch"
 NUM_SAMPLES = 27
 
 def run_test():
@@ -43,6 +43,7 @@ def run_test():
 
         print(f"Selected {len(samples)} random samples from {len(texts)} total records.")
         
+        submit_payloads = []
         for i, text in enumerate(samples):
             print(f"Processing {i+1}/{len(samples)}...")
             
@@ -76,7 +77,7 @@ def run_test():
                      # For the sake of the requested visual:
                      category_display = "PRONTO PARA TRANSPARÊNCIA"
 
-                # 2. Submit
+                # 2. Queue for the batch submit
                 submit_payload = {
                     "id": result.get('id'),
                     "text": text,
@@ -85,16 +86,20 @@ def run_test():
                     "privacy": result.get('privacy_status', 'Público'),
                     "reason": result.get('reason', '')
                 }
-                
-                resp_sub = requests.post(API_URL_SUBMIT, json=submit_payload)
-                if resp_sub.status_code == 200:
-                    print(f"  [Success] Saved ID: {result.get('id')}")
-                else:
-                    print(f"  [Error] Submit failed: {resp_sub.text}")
+                submit_payloads.append(submit_payload)
 
             except Exception as e:
                 print(f"  [Exception] {e}")
 
+        # 3. Submit everything in one request (one transaction on the server)
+        if submit_payloads:
+            resp_sub = requests.post(API_URL_SUBMIT_BATCH, json=submit_payloads)
+            if resp_sub.status_code == 200:
+                for item in resp_sub.json()['results']:
+                    print(f"  [{item['status']}] ID: {item['id']}")
+            else:
+                print(f"  [Error] Batch submit failed: {resp_sub.text}")
+
         print("\nTest completed.")
 
     except Exception as e:
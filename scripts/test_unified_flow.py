@@ -84,7 +84,7 @@ def test_submissions_endpoint():
     
     print(f"   [ ] Sending GET to {BASE_URL}/api/submissions...")
     try:
-        response = requests.get(f"{BASE_URL}/api/submissions", timeout=TIMEOUT)
+        response = requests.get(f"{BASE_URL}/api/submissions", headers={"X-Admin-Password": "admin123"}, timeout=TIMEOUT)
     except requests.exceptions.Timeout:
         print(f"   [ERROR] Request timed out after {TIMEOUT}s")
         return
@@ -249,7 +249,7 @@ def verify_unified_architecture():
         
         # Check if it appears in submissions
         try:
-            submissions_response = requests.get(f"{BASE_URL}/api/submissions", timeout=TIMEOUT)
+            submissions_response = requests.get(f"{BASE_URL}/api/submissions", headers={"X-Admin-Password": "admin123"}, timeout=TIMEOUT)
         except requests.exceptions.Timeout:
             print(f"   [ERROR] Request timed out after {TIMEOUT}s")
             return
@@ -0,0 +1,134 @@
+"""
+Train the local manifestation classifier
+----------------------------------------
+Builds data/classifier_model.npz from:
+
+1. The taxonomy itself (each subcategory name + category description is a seed example).
+2. Logged classifications (data/classifications.db) whose category resolves to a taxonomy id/name.
+3. An optional hand-labelled CSV (--labels) with columns: text, category, subcategory.
+4. The e-SIC repository spreadsheet (docs/repositório 300.xlsx). These texts are unlabelled, so they
+   are labelled by the configured LLM (--label-with-llm) or, by default, weakly by the keyword rules.
+
+Usage:
+    python scripts/train_classifier.py [--labels path.csv] [--label-with-llm] [--epochs 60]
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import ai_service
+from local_classifier import MODEL_FILE, train
+from storage import get_store
+from taxonomy import get_category_taxonomy
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+REPOSITORY_XLSX = os.path.join(ROOT, 'docs', 'repositório 300.xlsx')
+
+
+def taxonomy_samples(taxonomy):
+    samples = []
+    for cat in taxonomy:
+        samples.append((f"{cat['name']}. {cat.get('description', '')}", cat['id'], cat['subcategories'][0]))
+        for sub in cat['subcategories']:
+            samples.append((f"{sub} - {cat['name']}", cat['id'], sub))
+    return samples
+
+
+def log_samples(taxonomy):
+    samples = []
+    for row in get_store().iter_rows():
+        cat_id = taxonomy.resolve_label(row.get('category'))
+        if cat_id and row.get('text_snippet'):
+            samples.append((row['text_snippet'], cat_id, ''))
+    return samples
+
+
+def labelled_csv_samples(path, taxonomy):
+    samples = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            cat_id = taxonomy.resolve_label(row.get('category'))
+            if cat_id and row.get('text'):
+                samples.append((row['text'], cat_id, row.get('subcategory', '')))
+    return samples
+
+
+def repository_samples(taxonomy, use_llm):
+    import pandas as pd
+    if not os.path.exists(REPOSITORY_XLSX):
+        print(f"[WARN] Planilha não encontrada: {REPOSITORY_XLSX}")
+        return []
+    df = pd.read_excel(REPOSITORY_XLSX)
+    texts = [str(t) for t in df.iloc[:, 0].dropna()]
+
+    provider = ai_service.ProviderFactory.get_provider() if use_llm else None
+    if use_llm and not provider:
+        print("[WARN] Nenhum provedor LLM configurado; usando regras de palavras-chave.")
+
+    samples = []
+    for text in texts:
+        if provider:
+            result = provider.classify_text(text, taxonomy)
+            if result:
+                samples.append((text, result['id'], result.get('selected_subcategory', '')))
+            continue
+        cat_id = ai_service.keyword_match(text)
+        if cat_id:
+            samples.append((text, cat_id, ''))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Treina o classificador local de manifestações")
+    parser.add_argument('--labels', help="CSV rotulado (text, category, subcategory)")
+    parser.add_argument('--label-with-llm', action='store_true', help="Rotula a planilha com o LLM configurado")
+    parser.add_argument('--epochs', type=int, default=60)
+    parser.add_argument('--output', default=MODEL_FILE)
+    args = parser.parse_args()
+
+    taxonomy = get_category_taxonomy()
+    if not taxonomy:
+        print("[ERROR] data/categories.json vazio ou ausente")
+        sys.exit(1)
+
+    samples = taxonomy_samples(taxonomy)
+    samples += log_samples(taxonomy)
+    if args.labels:
+        samples += labelled_csv_samples(args.labels, taxonomy)
+    samples += repository_samples(taxonomy, args.label_with_llm)
+    print(f"[INFO] {len(samples)} exemplos rotulados")
+
+    # Hold out 20% of the non-seed examples to report accuracy
+    seed_count = len(taxonomy_samples(taxonomy))
+    rest = samples[seed_count:]
+    random.Random(42).shuffle(rest)
+    holdout = rest[:len(rest) // 5]
+    train_set = samples[:seed_count] + rest[len(rest) // 5:]
+
+    started = time.time()
+    model = train(train_set, taxonomy, epochs=args.epochs)
+    print(f"[INFO] Treinado em {time.time() - started:.1f}s")
+
+    if holdout:
+        hits = 0
+        started = time.perf_counter()
+        for text, cat_id, _ in holdout:
+            pred = model.predict(text)
+            hits += bool(pred and pred['id'] == cat_id)
+        per_item = (time.perf_counter() - started) / len(holdout) * 1e6
+        print(f"[INFO] Acurácia (holdout {len(holdout)}): {hits / len(holdout):.1%}")
+        print(f"[INFO] Inferência: {per_item:.0f} µs por texto")
+
+    # Final model uses every example
+    model = train(samples, taxonomy, epochs=args.epochs)
+    model.save(args.output)
+    print(f"[OK] Modelo salvo em {args.output} ({os.path.getsize(args.output) / 1024:.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@
 Dashboard Verification Script
 ==============================
 This script verifies that the dashboard API is working correctly
-and displays the current state of the CSV data.
+and displays the current state of the classification database.
 
 Usage:
     python scripts/verify_dashboard.py
@@ -12,7 +12,7 @@ Usage:
 import requests
 import json
 import os
-import csv
+import sqlite3
 from pathlib import Path
 
 def main():
@@ -36,19 +36,18 @@ def main():
         print(f"   [ERROR] Error: {e}")
         return
     
-    # 2. Check CSV file
-    print("[2] Checking CSV file...")
-    csv_path = Path(__file__).parent.parent / "data" / "classifications.csv"
+    # 2. Check classification database
+    print("[2] Checking classification database...")
+    db_path = Path(__file__).parent.parent / "data" / "classifications.db"
     
-    if csv_path.exists():
-        with open(csv_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            record_count = len(lines) - 1  # Exclude header
-        print(f"   [OK] CSV file exists: {csv_path}")
-        print(f"   [DATA] Records in CSV: {record_count}")
+    if db_path.exists():
+        with sqlite3.connect(db_path) as conn:
+            record_count = conn.execute("SELECT COUNT(*) FROM classifications").fetchone()[0]
+        print(f"   [OK] Database exists: {db_path}")
+        print(f"   [DATA] Records in database: {record_count}")
         print()
     else:
-        print(f"   [ERROR] CSV file not found: {csv_path}")
+        print(f"   [ERROR] Database not found: {db_path}")
         print()
     
     # 3. Test API endpoint
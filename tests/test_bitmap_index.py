@@ -0,0 +1,136 @@
+"""
+Test roaring-style bitmaps and the dashboard bitmap index
+"""
+import sys
+import os
+import random
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from bitmap_index import RoaringBitmap, BitmapIndex
+from storage import ClassificationStore
+
+def test_roaring_matches_set_semantics():
+    """AND/OR/ANDNOT agree with Python sets on sparse and dense chunks"""
+    rng = random.Random(7)
+    for density in (0.001, 0.05, 0.3):
+        a = {x for x in range(200000) if rng.random() < density}
+        b = {x for x in range(200000) if rng.random() < density}
+        ra, rb = RoaringBitmap(sorted(a)), RoaringBitmap(b)
+        assert len(ra) == len(a) and list(ra) == sorted(a)
+        assert set(ra & rb) == a & b
+        assert set(ra | rb) == a | b
+        assert set(ra - rb) == a - b
+        assert ra.and_cardinality(rb) == len(a & b)
+        sample = rng.sample(range(200000), 50)
+        assert all((x in ra) == (x in a) for x in sample)
+        print(f"density {density}: {len(a)} values, {ra.memory_bytes()} bytes")
+
+    r = RoaringBitmap.from_range(65530, 131080)
+    assert len(r) == 131080 - 65530 and 65530 in r and 131079 in r and 131080 not in r
+
+def test_bitmap_index_filters_and_counts():
+    """AND/OR/NOT slices and their counters come from bitmaps only"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        store.insert_many([
+            {"text": "pix", "category": "Chave PIX", "privacy": "Sigiloso", "timestamp": "2026-01-01T10:00:00"},
+            {"text": "cpf", "category": "Dados Pessoais", "privacy": "Sigiloso",
+             "reason": "Dados detectados via regex: CPF", "timestamp": "2026-01-05T10:00:00"},
+            {"text": "conta", "category": "Conta Bancária", "privacy": "Sigiloso",
+             "reason": "Dados detectados via regex: Conta Bancária, CPF", "timestamp": "2026-01-09T10:00:00"},
+            {"text": "buraco", "category": "Geral", "privacy": "Público", "timestamp": "2026-01-10T10:00:00"},
+        ])
+        index = BitmapIndex()
+        assert index.catch_up(store) == 4
+
+        bank = index.slice({"and": [{"privacy": "Sigiloso"}, {"macro": "Dados Bancários"}]}, store)
+        print(f"Bank slice: {bank}")
+        assert bank["total_count"] == 2
+        assert bank["pii_counts"] == {"Chave PIX": 1, "Conta Bancária": 1, "CPF": 1}
+
+        either = index.slice({"or": [{"pii": "cpf"}, {"macro": "Público"}]}, store)
+        assert either["total_count"] == 3
+        assert index.slice({"not": {"privacy": "Sigiloso"}}, store)["privacy_counts"] == {"Público": 1}
+
+        window = index.slice({"macro": "Dados Bancários", "since": "2026-01-02", "until": "2026-01-10"}, store)
+        assert window["total_count"] == 1
+
+        # Rows written later (e.g. by another worker) are picked up before the next query
+        store.insert({"text": "pix 2", "category": "Chave PIX", "privacy": "Sigiloso"})
+        assert index.slice({"pii": ["Chave PIX"]}, store)["total_count"] == 2
+        assert index.slice({"days": 1}, store)["total_count"] == 1
+        assert index.slice(None, store)["total_count"] == 5
+
+        try:
+            index.evaluate({"bogus": 1}, store)
+            assert False, "unknown field accepted"
+        except ValueError:
+            pass
+        store.close()
+
+def test_time_filters_follow_timestamps_not_seqs():
+    """Rows stamped out of seq order (write-behind, several workers); `until` is inclusive"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        store.insert_many([
+            {"text": "b", "category": "Geral", "privacy": "Público", "timestamp": "2026-01-05T10:00:00"},
+            {"text": "a", "category": "Geral", "privacy": "Público", "timestamp": "2026-01-01T10:00:00"},
+            {"text": "d", "category": "Geral", "privacy": "Público", "timestamp": "2026-01-10T23:59:00"},
+            {"text": "c", "category": "Geral", "privacy": "Público", "timestamp": "2026-01-03T10:00:00"},
+        ])
+        index = BitmapIndex()
+        index.catch_up(store)
+
+        assert index.slice({"since": "2026-01-02"}, store)["total_count"] == 3
+        assert index.slice({"until": "2026-01-04"}, store)["total_count"] == 2
+        assert index.slice({"since": "2026-01-02", "until": "2026-01-05"}, store)["total_count"] == 2
+        # A date-only `until` covers the whole day, as in the CSV export
+        assert index.slice({"since": "2026-01-10", "until": "2026-01-10"}, store)["total_count"] == 1
+        assert [r['text_snippet'] for r in store.iter_export(since="2026-01-02", until="2026-01-05")] == ["b", "c"]
+
+        for bad in ("abc", -1, float('nan'), 10 ** 9, True, [1]):
+            try:
+                index.evaluate({"days": bad}, store)
+                assert False, f"days={bad!r} accepted"
+            except ValueError:
+                pass
+        try:
+            index.evaluate({"since": 20260101}, store)
+            assert False, "numeric since accepted"
+        except ValueError:
+            pass
+        store.close()
+
+def test_time_windows_use_day_bitmaps():
+    """Windows are OR-ed day bitmaps; only a day cut by a finer bound reads the timestamp index"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        rng = random.Random(3)
+        store.insert_many([{"text": f"t{i}", "privacy": "Público",
+                            "timestamp": f"2026-01-{rng.randint(1, 9):02d}T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00"}
+                           for i in range(300)])
+        index = BitmapIndex()
+        index.catch_up(store)
+
+        reads = []
+        seqs_between = store.seqs_between
+        store.seqs_between = lambda since=None, until=None: reads.append((since, until)) or seqs_between(since, until)
+        assert len(index.evaluate({"since": "2026-01-03", "until": "2026-01-05"}, store)) == len(seqs_between("2026-01-03", "2026-01-05"))
+        assert reads == []
+
+        bounds = [None, "2026-01", "2026-01-04", "2026-01-04T12", "2026-01-04T12:30", "2026-01-06T07:15:00", "2026-01-09"]
+        for since in bounds:
+            for until in bounds:
+                expected = set(seqs_between(since, until))
+                got = index._time_range(store, since, until)
+                assert set(got) == expected, (since, until)
+        print(f"Timestamp index reads for {len(bounds) ** 2} windows: {len(reads)}")
+        store.close()
+
+if __name__ == "__main__":
+    test_roaring_matches_set_semantics()
+    test_bitmap_index_filters_and_counts()
+    test_time_filters_follow_timestamps_not_seqs()
+    test_time_windows_use_day_bitmaps()
+    print("\nAll bitmap index tests passed!")
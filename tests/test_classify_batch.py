@@ -0,0 +1,130 @@
+"""
+Test the streaming batch classification (batch PII scan, LLM micro-batches, backpressure)
+"""
+import sys
+import os
+import json
+import asyncio
+import re
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from fastapi.testclient import TestClient
+import ai_service
+import main
+from classify_stream import classify_stream, iter_lines
+
+TEXTS = [
+    "Meu CPF é 123.456.789-00",
+    "Moro na Rua Augusta, email joao@exemplo.com",
+    "Ligue (61) 99999-8888",
+    "O poste da praça está apagado",
+    "Segue o prontuário médico do paciente",
+    "PIX 123e4567-e89b-12d3-a456-426614174000",
+    "61",
+    "3456 7890",
+]
+
+class FakeProvider(ai_service.LLMProvider):
+    """Answers batched prompts itself; drops the last text of each batch to exercise the fallback."""
+    def __init__(self):
+        self.batch_calls = 0
+        self.single_calls = 0
+
+    def classify_text(self, text, taxonomy):
+        return None
+
+    def analyze_privacy(self, text, enabled_list):
+        self.single_calls += 1
+        return {"is_sensitive": False, "privacy_status": "Público", "reason": "único", "detected_pii": []}
+
+    def _complete(self, prompt):
+        self.batch_calls += 1
+        count = len(re.findall(r"\n\s*\d+\. \[Tipos:", prompt))
+        return json.dumps({"results": [{"index": i, "is_sensitive": True, "privacy_status": "Sigiloso",
+                                        "reason": "lote", "detected_pii": ["CPF"]} for i in range(count - 1)]})
+
+def test_batch_scan_matches_single_analysis():
+    """One regex pass per type over the batch gives the same verdicts as per-text analysis"""
+    single = [ai_service.analyze_privacy(text) for text in TEXTS]
+    batch = ai_service.analyze_privacy_batch(TEXTS)
+    print(f"Verdicts: {[r['privacy_status'] for r in batch]}")
+    assert batch == single
+    # Adjacent texts do not combine into a match ("61" + "3456 7890" is not a phone)
+    assert batch[-2]["privacy_status"] == batch[-1]["privacy_status"] == "Público"
+
+def test_llm_micro_batches():
+    """The provider sees LLM_BATCH_SIZE texts per call; uncovered texts fall back one by one"""
+    provider = FakeProvider()
+    original = ai_service.ProviderFactory.get_provider
+    ai_service.ProviderFactory.get_provider = staticmethod(lambda: provider)
+    try:
+        texts = [f"Pedido {i}" for i in range(40)]
+        results = ai_service.analyze_privacy_batch(texts)
+    finally:
+        ai_service.ProviderFactory.get_provider = original
+    print(f"Batch calls: {provider.batch_calls}, single calls: {provider.single_calls}")
+    assert provider.batch_calls == 3 and provider.single_calls == 3
+    assert [r["reason"] for r in results[:16]] == ["lote"] * 15 + ["único"]
+    assert all(r["tier"] == "llm" for r in results)
+
+    # Every provider has to answer batched prompts, like classify_text/analyze_privacy
+    class NoBatchProvider(ai_service.LLMProvider):
+        def classify_text(self, text, taxonomy):
+            return None
+
+        def analyze_privacy(self, text, enabled_list):
+            return {}
+    try:
+        NoBatchProvider()
+        assert False, "provider without _complete instantiated"
+    except TypeError:
+        pass
+
+def test_stream_backpressure():
+    """A slow classifier keeps the reader at most a few chunks ahead of the results"""
+    pulled = []
+
+    async def body():
+        for i in range(2000):
+            pulled.append(i)
+            yield json.dumps({"id": f"t{i}", "text": "x"}).encode() + b"\n"
+
+    def slow_classify(texts):
+        import time
+        time.sleep(0.002)
+        return [{"privacy_status": "Público"} for _ in texts]
+
+    async def run():
+        seen, max_ahead = [], 0
+        async for block in classify_stream(iter_lines(body()), slow_classify, concurrency=2, chunk_size=10):
+            seen += [json.loads(line) for line in block.splitlines()]
+            max_ahead = max(max_ahead, len(pulled) - len(seen))
+        return seen, max_ahead
+
+    seen, max_ahead = asyncio.run(run())
+    print(f"Results: {len(seen)}, max lines read ahead: {max_ahead}")
+    assert sorted(r["index"] for r in seen) == list(range(2000))
+    assert max_ahead <= 10 * (2 + 2 + 2 + 1)  # chunk queue + workers + result queue + the chunk being built
+
+def test_classify_batch_endpoint():
+    """NDJSON in, NDJSON out; bad lines get an error result with their index"""
+    client = TestClient(main.app)
+    body = "\n".join([json.dumps({"id": "a", "text": TEXTS[0]}), "{quebrado", "",
+                      json.dumps(TEXTS[3]), json.dumps({"sem": "texto"})]) + "\n"
+    response = client.post("/api/classify/batch", content=body, headers={"content-type": "application/x-ndjson"})
+    assert response.status_code == 200 and response.headers["content-type"].startswith("application/x-ndjson")
+    results = sorted((json.loads(line) for line in response.text.splitlines()), key=lambda r: r["index"])
+    print(f"Endpoint: {[(r['index'], r['status']) for r in results]}")
+    assert [r["status"] for r in results] == ["ok", "error", "ok", "error"]
+    assert results[0]["id"] == "a" and results[0]["privacy_status"] == "Sigiloso" and "latency_ms" in results[0]
+    assert results[2]["privacy_status"] == "Público" and results[2]["id"]
+
+    restricted = client.post("/api/classify/batch?enabled_pii_types=email", content=json.dumps(TEXTS[0]))
+    assert json.loads(restricted.text)["privacy_status"] == "Público"
+
+if __name__ == "__main__":
+    test_batch_scan_matches_single_analysis()
+    test_llm_micro_batches()
+    test_stream_backpressure()
+    test_classify_batch_endpoint()
+    print("\nAll batch classification tests passed!")
@@ -0,0 +1,124 @@
+"""
+Test the NumPy columnar cache behind /api/dashboard-groupby
+"""
+import sys
+import os
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from columnar_cache import ColumnarLog
+from storage import ClassificationStore
+
+ROWS = [
+    {"id": "c1", "timestamp": "2026-01-01T09:00:00", "text": "Buraco", "privacy": "Público",
+     "tier": "regex", "provider": "local", "latency_ms": 2.0},
+    {"id": "c2", "timestamp": "2026-01-01T10:30:00", "text": "Meu CPF", "category": "Dados Pessoais",
+     "privacy": "Sigiloso", "reason": "CPF detectado", "detected_pii": ["CPF", "Email"],
+     "tier": "regex", "provider": "local", "latency_ms": 4.0},
+    {"id": "c3", "timestamp": "2026-01-02T08:00:00", "text": "Laudo", "category": "Dados de Saúde",
+     "privacy": "Sigiloso", "detected_pii": ["Prontuário Médico"], "tier": "llm",
+     "provider": "gemini:gemini-2.0-flash", "latency_ms": 900.0},
+    {"id": "c4", "timestamp": "2026-01-03T12:00:00", "text": "Pix", "category": "Dados Pessoais",
+     "privacy": "Sigiloso", "detected_pii": ["CPF"]},
+]
+
+def test_group_by_and_filters():
+    """Vectorized group-by matches the rows, with dictionary, PII and time filters"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        store.insert_many(ROWS)
+        cache = ColumnarLog()
+        assert cache.catch_up(store) == 4
+
+        by_privacy = cache.group_by('privacy')
+        print(f"By privacy: {by_privacy}")
+        assert by_privacy['groups'] == {"Público": 1, "Sigiloso": 3}
+        assert by_privacy['avg_latency_ms'] == {"Público": 2.0, "Sigiloso": 452.0}
+
+        assert cache.group_by('pii')['groups'] == {"CPF": 2, "Email": 1, "Prontuário Médico": 1}
+        assert cache.group_by('tier', privacy="Sigiloso")['groups'] == {"regex": 1, "llm": 1, "": 1}
+        assert cache.group_by('macro', pii="CPF")['total'] == 2
+        assert cache.group_by('day')['groups'] == {"2026-01-01": 2, "2026-01-02": 1, "2026-01-03": 1}
+        assert cache.group_by('hour', until="2026-01-01")['groups'] == {"2026-01-01T09": 1, "2026-01-01T10": 1}
+        assert cache.group_by('privacy', since="2026-01-02", until="2026-01-02")['total'] == 1
+        assert cache.group_by('privacy', macro="Inexistente")['total'] == 0
+        try:
+            cache.group_by('text')
+            assert False, "unknown group_by should raise"
+        except ValueError:
+            pass
+
+        # New rows are appended incrementally
+        store.insert({"id": "c5", "timestamp": "2026-01-03T13:00:00", "text": "Poste", "privacy": "Público"})
+        assert cache.catch_up(store) == 1
+        assert cache.group_by('privacy')['groups'] == {"Público": 2, "Sigiloso": 3}
+        store.close()
+
+def test_purge_and_memory_per_row():
+    """Purged rows disappear; each row costs a few dozen bytes"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        store.insert_many(ROWS)
+        cache = ColumnarLog()
+        cache.catch_up(store)
+
+        store.purge_before("2026-01-02")
+        cache.catch_up(store)
+        assert cache.size == 2
+        assert cache.group_by('pii')['groups'] == {"CPF": 1, "Prontuário Médico": 1}
+
+        # Purges go by timestamp, not by seq: a newer seq with an older timestamp is dropped too
+        store.insert({"id": "c0", "timestamp": "2026-01-02T07:00:00", "text": "Tardio", "privacy": "Público"})
+        cache.catch_up(store)
+        store.purge_before("2026-01-02T07:30:00")
+        cache.catch_up(store)
+        assert cache.size == 2 and cache.group_by('privacy')['groups'] == {"Sigiloso": 2}
+
+        store.insert_many([{"text": f"linha {i}", "privacy": "Público", "timestamp": f"2026-02-01T10:{i % 60:02d}:00"}
+                           for i in range(5000)])
+        cache.catch_up(store)
+        per_row = cache.memory_bytes() / cache.size
+        print(f"Rows: {cache.size}, bytes/row: {per_row:.1f}")
+        assert cache.size == 5002 and per_row < 80
+        store.close()
+
+def test_many_distinct_labels():
+    """Dictionary codes hold more distinct values than int8/int16 (e.g. one provider per model)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        store.insert_many([{"text": f"linha {i}", "privacy": "Sigiloso", "category": f"Categoria {i}",
+                            "provider": f"ollama:modelo-{i}", "tier": "llm", "detected_pii": [f"Tipo {i}"],
+                            "timestamp": "2026-03-01T10:00:00"} for i in range(33000)])
+        cache = ColumnarLog()
+        assert cache.catch_up(store) == 33000
+        by_provider = cache.group_by('provider')
+        assert len(by_provider['groups']) == 33000 and by_provider['groups']["ollama:modelo-32999"] == 1
+        assert cache.group_by('pii', provider="ollama:modelo-300")['groups'] == {"Tipo 300": 1}
+        assert cache.group_by('macro')['total'] == 33000
+        store.close()
+
+def test_until_covers_its_precision():
+    """An hour/minute/month `until` keeps the rest of that period, like the store's prefix match"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        store.insert_many([{"text": f"linha {ts}", "privacy": "Público", "timestamp": ts}
+                           for ts in ("2026-01-10T11:59:59", "2026-01-10T12:00:00", "2026-01-10T12:00:01",
+                                      "2026-01-10T12:30:00.250000", "2026-01-10T12:59:59",
+                                      "2026-01-10T13:00:00", "2026-01-31T23:59:59", "2026-02-01T00:00:00")])
+        cache = ColumnarLog()
+        cache.catch_up(store)
+        for until in ("2026-01-10T12", "2026-01-10T12:30", "2026-01-10T12:00:01", "2026-01-10", "2026-01"):
+            expected = len(store.seqs_between(None, until))
+            print(f"until={until}: cache {cache.group_by('privacy', until=until)['total']}, store {expected}")
+            assert cache.group_by('privacy', until=until)['total'] == expected
+            assert cache.group_by('privacy', since="2026-01-10T12", until=until)['total'] == \
+                len(store.seqs_between("2026-01-10T12", until))
+        assert cache.group_by('privacy', until="2026-01-10T12")['total'] == 5
+        store.close()
+
+if __name__ == "__main__":
+    test_group_by_and_filters()
+    test_purge_and_memory_per_row()
+    test_many_distinct_labels()
+    test_until_covers_its_precision()
+    print("\nAll columnar cache tests passed!")
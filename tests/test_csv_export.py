@@ -0,0 +1,158 @@
+"""
+Test the streaming CSV export (gzip, ETag/304, Range resume, filters)
+"""
+import sys
+import os
+import csv
+import gzip
+import io
+import tempfile
+import time
+from unittest.mock import patch
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from fastapi.testclient import TestClient
+import csv_export
+import main
+from storage import ClassificationStore
+
+ADMIN = {"x-admin-password": "admin123"}
+
+def _client(tmp):
+    store = ClassificationStore(os.path.join(tmp, 'test.db'))
+    store.insert_many([
+        {"id": f"e{i}", "timestamp": f"2026-01-0{1 + i // 10}T10:00:0{i % 10}", "text": f"Pedido {i}",
+         "privacy": "Sigiloso" if i % 2 else "Público"}
+        for i in range(30)
+    ])
+    main.get_store = lambda: store
+    csv_export.EXPORTS_DIR = os.path.join(tmp, 'exports')
+    return TestClient(main.app), store
+
+def test_gzip_etag_and_304():
+    """gzip body matches the plain one; the ETag turns repeat downloads into 304s until a new row"""
+    original = main.get_store
+    with tempfile.TemporaryDirectory() as tmp:
+        client, store = _client(tmp)
+        try:
+            plain = client.get("/data/classifications.csv", headers={**ADMIN, "accept-encoding": "identity"})
+            raw = client.get("/data/classifications.csv", headers={**ADMIN, "accept-encoding": "gzip"})
+            assert plain.status_code == 200 and raw.headers["content-encoding"] == "gzip"
+            assert raw.headers["etag"] != plain.headers["etag"] and "last-modified" in raw.headers
+            assert len(list(csv.DictReader(io.StringIO(plain.text)))) == 30
+            assert raw.text == plain.text  # the test client decodes gzip transparently
+
+            etag = plain.headers["etag"]
+            again = client.get("/data/classifications.csv", headers={**ADMIN, "accept-encoding": "identity",
+                                                                     "if-none-match": etag})
+            print(f"Conditional GET: {again.status_code}")
+            assert again.status_code == 304 and again.content == b""
+
+            store.insert({"id": "novo", "text": "Novo pedido"})
+            changed = client.get("/data/classifications.csv", headers={**ADMIN, "accept-encoding": "identity",
+                                                                       "if-none-match": etag})
+            assert changed.status_code == 200 and changed.headers["etag"] != etag
+            assert client.get("/data/classifications.csv").status_code == 403
+        finally:
+            main.get_store = original
+            store.close()
+
+def test_range_resume_and_filters():
+    """A resumed download continues the same gzip bytes; filters stream only matching rows"""
+    original = main.get_store
+    with tempfile.TemporaryDirectory() as tmp:
+        client, store = _client(tmp)
+        try:
+            full = b"".join(csv_export.iter_export(store, store.export_state(), csv_export.export_filters(), True))
+            # Raw (still gzip-encoded) bytes: a resumed download continues the same stream
+            with client.stream("GET", "/data/classifications.csv",
+                               headers={**ADMIN, "accept-encoding": "gzip", "range": "bytes=100-"}) as part:
+                tail = b"".join(part.iter_raw())
+            print(f"Range: {part.status_code} {part.headers.get('content-range')}")
+            assert part.status_code == 206
+            assert part.headers["content-range"] == f"bytes 100-{len(full) - 1}/{len(full)}"
+            assert tail == full[100:]
+
+            # Stale If-Range (another version) falls back to the full body
+            stale = client.get("/data/classifications.csv",
+                               headers={**ADMIN, "accept-encoding": "identity", "range": "bytes=10-",
+                                        "if-range": '"outra-versao"'})
+            assert stale.status_code == 200
+
+            rows = list(csv.DictReader(io.StringIO(gzip.decompress(full).decode('utf-8'))))
+            assert len(rows) == 30
+
+            filtered = client.get("/data/classifications.csv?privacy=Sigiloso&since=2026-01-02&until=2026-01-02",
+                                  headers={**ADMIN, "accept-encoding": "identity"})
+            rows = list(csv.DictReader(io.StringIO(filtered.text)))
+            assert rows and all(r["privacy"] == "Sigiloso" and r["timestamp"].startswith("2026-01-02") for r in rows)
+            assert [r["id"] for r in rows] == [f"e{i}" for i in range(10, 20) if i % 2]
+        finally:
+            main.get_store = original
+            store.close()
+
+def test_range_returns_requested_bytes():
+    """A bounded Range gets 206 with exactly those bytes (needs starlette >= 0.39, see requirements.txt)"""
+    original = main.get_store
+    with tempfile.TemporaryDirectory() as tmp:
+        client, store = _client(tmp)
+        try:
+            plain = client.get("/data/classifications.csv", headers={**ADMIN, "accept-encoding": "identity"}).content
+            part = client.get("/data/classifications.csv",
+                              headers={**ADMIN, "accept-encoding": "identity", "range": "bytes=10-49"})
+            print(f"Range: {part.status_code} {part.headers.get('content-range')}")
+            assert part.status_code == 206
+            assert part.headers["content-range"] == f"bytes 10-49/{len(plain)}"
+            assert part.headers["content-length"] == "40" and part.content == plain[10:50]
+
+            # If-Range with the current ETag still resumes
+            etag = part.headers["etag"]
+            resumed = client.get("/data/classifications.csv",
+                                 headers={**ADMIN, "accept-encoding": "identity", "range": f"bytes={len(plain) - 5}-",
+                                          "if-range": etag})
+            assert resumed.status_code == 206 and resumed.content == plain[-5:]
+        finally:
+            main.get_store = original
+            store.close()
+
+def test_prune_skips_recent_and_vanished_files():
+    """Pruning keeps the newest files and anything touched recently, and tolerates files deleted mid-scan"""
+    with tempfile.TemporaryDirectory() as tmp:
+        original_dir, original_max = csv_export.EXPORTS_DIR, csv_export.MAX_CACHED_EXPORTS
+        csv_export.EXPORTS_DIR = os.path.join(tmp, 'exports')
+        csv_export.MAX_CACHED_EXPORTS = 2
+        os.makedirs(csv_export.EXPORTS_DIR)
+        try:
+            paths = [os.path.join(csv_export.EXPORTS_DIR, f"{i}.csv") for i in range(5)]
+            for i, path in enumerate(paths):
+                open(path, 'w').close()
+                age = 3600 if i < 3 else 60  # 0-2 are old, 3-4 were just served
+                os.utime(path, (time.time() - age - i, time.time() - age - i))
+
+            # Another worker deletes a file between listdir and stat
+            real_stat = os.stat
+            def stat(path, *args, **kwargs):
+                if path == paths[1]:
+                    raise FileNotFoundError(path)
+                return real_stat(path, *args, **kwargs)
+            with patch.object(csv_export.os, 'stat', stat):
+                csv_export.prune_exports(keep=paths[0])
+            left = sorted(os.listdir(csv_export.EXPORTS_DIR))
+            print(f"Left after pruning: {left}")
+            # The two newest (3, 4) are recent anyway; 2 is old and pruned; 0 is the one being served
+            assert left == ["0.csv", "1.csv", "3.csv", "4.csv"]
+
+            # Everything recent survives even past MAX_CACHED_EXPORTS
+            for path in paths[:3]:
+                open(path, 'w').close()
+            csv_export.prune_exports(keep=paths[4])
+            assert len(os.listdir(csv_export.EXPORTS_DIR)) == 5
+        finally:
+            csv_export.EXPORTS_DIR, csv_export.MAX_CACHED_EXPORTS = original_dir, original_max
+
+if __name__ == "__main__":
+    test_gzip_etag_and_304()
+    test_range_resume_and_filters()
+    test_range_returns_requested_bytes()
+    test_prune_skips_recent_and_vanished_files()
+    print("\nAll CSV export tests passed!")
@@ -0,0 +1,73 @@
+"""
+Test idempotent submits (Bloom pre-filter + exact id check)
+"""
+import sys
+import os
+import asyncio
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from dedupe_index import BloomFilter, DedupeIndex
+from storage import ClassificationStore
+from write_behind import WriteBehindLogger
+
+def test_bloom_filter_false_positive_rate():
+    """No false negatives; false positives near the configured 1%"""
+    bloom = BloomFilter(10000)
+    for i in range(10000):
+        bloom.add(f"id-{i}")
+    assert all(f"id-{i}" in bloom for i in range(10000))
+    false_positives = sum(f"other-{i}" in bloom for i in range(20000)) / 20000
+    print(f"False positive rate: {false_positives:.4f}")
+    assert false_positives < 0.03
+
+    index = DedupeIndex(initial_capacity=100)
+    for i in range(1000):
+        index.add(f"k{i}")
+    assert index.stats()["layers"] > 1 and all(index.might_contain(f"k{i}") for i in range(1000))
+
+def test_replayed_ids_are_stored_once():
+    """Replays (same call, same batch, another worker) add no row and no count"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'test.db')
+        store = ClassificationStore(path)
+        row = {"id": "replay-1", "text": "Meu CPF", "category": "CPF", "privacy": "Sigiloso", "reason": "CPF"}
+        assert store.insert(row) == "replay-1"
+        assert store.insert(row) == "replay-1"
+        assert store.insert_many([{"id": "b1", "text": "x"}, {"id": "b1", "text": "x"}, row]) == 1
+
+        # A second handle (another worker) sees the first one's ids
+        other = ClassificationStore(path)
+        assert other.insert_many([row, {"id": "b2", "text": "y"}]) == 1
+
+        print(f"Dedupe: {store.dedupe.stats()}")
+        assert store.count() == 3 and store.privacy_counts() == {"Sigiloso": 1, "Desconhecido": 2}
+        assert store.connection().execute("SELECT COUNT(*) FROM classifications").fetchone()[0] == 3
+
+        # New ids are settled by the filter alone
+        store.insert_many([{"id": f"new-{i}", "text": "z"} for i in range(500)])
+        assert store.dedupe.exact_checks < 20
+        other.close()
+        store.close()
+
+def test_replayed_submit_returns_original_id():
+    """A retried submit through the write-behind logger gets the same id and no second row"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        logger = WriteBehindLogger(store, "group", batch_size=10, flush_ms=5)
+
+        async def submit_twice():
+            record = {"id": "retry-7", "text": "Poste apagado", "privacy": "Público"}
+            return await asyncio.gather(logger.submit(dict(record)), logger.submit(dict(record)))
+
+        assert asyncio.run(submit_twice()) == ["retry-7", "retry-7"]
+        assert asyncio.run(logger.submit({"id": "retry-7", "text": "Poste apagado"})) == "retry-7"
+        logger.stop()
+        assert store.count() == 1
+        store.close()
+
+if __name__ == "__main__":
+    test_bloom_filter_false_positive_rate()
+    test_replayed_ids_are_stored_once()
+    test_replayed_submit_returns_original_id()
+    print("\nAll dedupe tests passed!")
@@ -0,0 +1,180 @@
+"""
+Test bulk classification jobs (file inputs, reprocessing, progress, checkpoint resume)
+"""
+import sys
+import os
+import json
+import tempfile
+import threading
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from fastapi.testclient import TestClient
+import jobs
+import main
+from jobs import JobManager, describe
+from storage import ClassificationStore
+
+ADMIN = {"x-admin-password": "admin123"}
+
+def _upload(tmp, name, content):
+    path = os.path.join(tmp, name)
+    with open(path, 'wb') as f:
+        f.write(content)
+    return path
+
+def _results(manager, job_id):
+    with open(manager.results_path(job_id), 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+def test_file_jobs_csv_xlsx_ndjson():
+    """Each format is normalized once and every row gets exactly one result"""
+    import openpyxl
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        manager = JobManager(store, os.path.join(tmp, 'jobs'), chunk_size=2)
+
+        csv_job = manager.create_file_job(_upload(tmp, 'a.csv', "id;Texto Mascarado\n1;Meu CPF é 123.456.789-00\n2;Poste apagado\n;\n3;Email joao@exemplo.com\n".encode('utf-8')),
+                                          'csv', 'a.csv', enabled_pii_types=['cpf'])
+
+        workbook = openpyxl.Workbook()
+        workbook.active.append(["Protocolo", "Descrição"])
+        workbook.active.append(["P-1", "Meu RG é 12.345.678-9"])
+        workbook.active.append(["P-2", "Buraco na rua"])
+        workbook.save(os.path.join(tmp, 'b.xlsx'))
+        xlsx_job = manager.create_file_job(os.path.join(tmp, 'b.xlsx'), 'xlsx', 'b.xlsx')
+
+        ndjson = "\n".join([json.dumps({"id": "n1", "text": "Poste"}), "{quebrado", json.dumps("Meu CPF 123.456.789-00")])
+        ndjson_job = manager.create_file_job(_upload(tmp, 'c.ndjson', ndjson.encode('utf-8')), 'ndjson')
+        manager.wait()
+
+        csv_state = manager.get(csv_job['id'])
+        print(f"CSV job: {describe(csv_state)}")
+        assert csv_state['status'] == "done" and csv_state['total'] == 3 and csv_state['processed'] == 3
+        rows = _results(manager, csv_job['id'])
+        assert [(r['id'], r['privacy_status']) for r in rows] == [("1", "Sigiloso"), ("2", "Público"), ("3", "Público")]
+        assert describe(csv_state)['progress'] == 1.0 and describe(csv_state)['eta_s'] is None
+
+        rows = _results(manager, xlsx_job['id'])
+        assert [r['privacy_status'] for r in rows] == ["Sigiloso", "Público"] and rows[0]['row'] == 1
+
+        rows = _results(manager, ndjson_job['id'])
+        assert [r['status'] for r in rows] == ["ok", "error", "ok"] and rows[0]['id'] == "n1"
+        assert manager.get(ndjson_job['id'])['errors'] == 1
+        manager.stop()
+        store.close()
+
+def test_checkpoint_resume_after_restart():
+    """A job stopped mid-run resumes at its checkpoint; a chunk written after it is not duplicated"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        lines = "\n".join(json.dumps({"id": f"r{i}", "text": f"Pedido {i}"}) for i in range(10))
+        seen = []
+
+        def classify(texts, enabled):
+            seen.extend(texts)
+            if len(seen) == 6:
+                first._stopping.set()  # shutdown after the third chunk
+            return [{"privacy_status": "Público"} for _ in texts]
+
+        first = JobManager(store, os.path.join(tmp, 'jobs'), classify=classify, chunk_size=2)
+        job = first.create_file_job(_upload(tmp, 'in.ndjson', lines.encode('utf-8')), 'ndjson')
+        first.wait()
+        state = first.get(job['id'])
+        print(f"Checkpoint: processed={state['processed']} cursor={state['cursor']}")
+        assert state['status'] == "running" and state['processed'] == 6
+
+        # Crash between appending a chunk and checkpointing it
+        with open(first.results_path(job['id']), 'ab') as f:
+            f.write(b'{"row": 7, "partial": true}\n')
+
+        second = JobManager(store, os.path.join(tmp, 'jobs'), classify=classify, chunk_size=2)
+        assert second.resume_pending() == [job['id']]
+        second.wait()
+        rows = _results(second, job['id'])
+        assert [r['id'] for r in rows] == [f"r{i}" for i in range(10)]
+        assert len(seen) == 10  # no chunk classified twice
+        assert second.get(job['id'])['status'] == "done"
+        second.stop()
+        store.close()
+
+def test_reprocess_log_job():
+    """Reprocessing reports new verdicts next to the stored ones, up to the rows logged at submission"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        store.insert_many([
+            {"id": "a", "text": "Meu CPF é 123.456.789-00", "privacy": "Público"},
+            {"id": "b", "text": "Poste apagado", "privacy": "Público"},
+            {"id": "c", "text": "Email joao@exemplo.com", "privacy": "Sigiloso", "detected_pii": ["E-mail"]},
+        ])
+        manager = JobManager(store, os.path.join(tmp, 'jobs'), chunk_size=2)
+        job = manager.create_reprocess_job(enabled_pii_types=['cpf'])
+        store.insert({"id": "d", "text": "Depois do job"})
+        manager.wait()
+
+        state = manager.get(job['id'])
+        rows = _results(manager, job['id'])
+        print(f"Reprocess: {[(r['id'], r['previous_privacy_status'], r['privacy_status']) for r in rows]}")
+        assert [r['id'] for r in rows] == ["a", "b", "c"] and state['total'] == 3
+        assert [r['changed'] for r in rows] == [True, False, True]
+        assert rows[2]['previous_detected_pii'] == ["E-mail"] and state['changed'] == 2
+        manager.stop()
+        store.close()
+
+def test_jobs_endpoints():
+    """Upload, poll, cancel/resume and download through the API"""
+    original = jobs._manager
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        store.insert_many([{"id": f"log-{i}", "text": f"Pedido {i}"} for i in range(3)])
+        gate = threading.Event()
+        gate.set()
+
+        def classify(texts, enabled):
+            gate.wait()
+            from ai_service import analyze_privacy_batch
+            return analyze_privacy_batch(texts, enabled)
+
+        jobs._manager = JobManager(store, os.path.join(tmp, 'jobs'), classify=classify, chunk_size=1)
+        client = TestClient(main.app)
+        try:
+            assert client.post("/api/jobs?filename=a.csv", content=b"x").status_code == 403
+            assert client.post("/api/jobs?filename=a.pdf", content=b"x", headers=ADMIN).status_code == 400
+            response = client.post("/api/jobs?filename=pedidos.csv", headers=ADMIN,
+                                   content="texto\nMeu CPF é 123.456.789-00\nBuraco na rua\n".encode('utf-8'))
+            assert response.status_code == 202
+            job_id = response.json()['id']
+            jobs._manager.wait()
+
+            status = client.get(f"/api/jobs/{job_id}", headers=ADMIN).json()
+            print(f"Job status: {status}")
+            assert status['status'] == "done" and status['progress'] == 1.0 and status['throughput_per_s']
+            download = client.get(f"/api/jobs/{job_id}/results", headers=ADMIN)
+            assert download.status_code == 200
+            assert [json.loads(line)['privacy_status'] for line in download.text.splitlines()] == ["Sigiloso", "Público"]
+            assert client.get("/api/jobs", headers=ADMIN).json()['jobs'][0]['id'] == job_id
+            assert client.get("/api/jobs/nao-existe", headers=ADMIN).status_code == 404
+
+            gate.clear()  # hold the reprocess job inside its first chunk
+            queued = client.post("/api/jobs/reprocess", headers=ADMIN).json()
+            assert queued['total'] == 3
+            assert client.get(f"/api/jobs/{queued['id']}/results", headers=ADMIN).status_code == 409
+            client.post(f"/api/jobs/{queued['id']}/cancel", headers=ADMIN)
+            gate.set()
+            jobs._manager.wait()
+            assert client.get(f"/api/jobs/{queued['id']}", headers=ADMIN).json()['status'] == "cancelled"
+            assert client.post(f"/api/jobs/{queued['id']}/resume", headers=ADMIN).json()['status'] == "queued"
+            jobs._manager.wait()
+            done = client.get(f"/api/jobs/{queued['id']}", headers=ADMIN).json()
+            assert done['status'] == "done" and done['processed'] == 3
+            assert len(client.get(f"/api/jobs/{queued['id']}/results", headers=ADMIN).text.splitlines()) == 3
+        finally:
+            jobs._manager.stop()
+            jobs._manager = original
+            store.close()
+
+if __name__ == "__main__":
+    test_file_jobs_csv_xlsx_ndjson()
+    test_checkpoint_resume_after_restart()
+    test_reprocess_log_job()
+    test_jobs_endpoints()
+    print("\nAll bulk job tests passed!")
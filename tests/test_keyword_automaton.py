@@ -0,0 +1,91 @@
+"""
+Test the Aho-Corasick keyword automaton and sensitive-context detection
+"""
+import sys
+import os
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from keyword_automaton import KeywordAutomaton
+from ai_service import analyze_privacy
+
+def test_keyword_automaton():
+    """Overlapping keywords, accent-insensitive matching and original-text positions"""
+    automaton = KeywordAutomaton(["medida protetiva", "prontuário", "agência", "conta"])
+
+    text = "Tenho MEDIDA PROTETIVA; o prontuario está na Agência, conta 123"
+    hits = automaton.find_all(text)
+    print(f"Hits: {hits}")
+    assert [p for _, _, p in hits] == ["medida protetiva", "prontuário", "agência", "conta"]
+    start, end, _ = hits[2]
+    assert text[start:end] == "Agência"
+
+    assert automaton.matched("descontado", whole_words=True) == set()
+    assert automaton.matched("descontado") == {"conta"}
+    assert automaton.contains_any("sem termos sensíveis") is False
+
+def test_context_detection():
+    """Context terms mark the text as sensitive through the detector"""
+    result = analyze_privacy("Solicito cópia do meu prontuário do HRAN",
+                             enabled_pii_types=["medical_record", "family_dispute"])
+    assert result['is_sensitive'] is True
+    assert result['category'] == "Dados de Saúde"
+
+    result = analyze_privacy("Descumprimento de medida protetiva pelo ex-companheiro",
+                             enabled_pii_types=["medical_record", "family_dispute"])
+    assert result['category'] == "Dados Sensíveis (Violência Doméstica)"
+
+    result = analyze_privacy("Solicito cópia do meu prontuário do HRAN", enabled_pii_types=["cpf"])
+    assert result['is_sensitive'] is False
+
+def test_context_only_texts_are_sensitive():
+    """
+    Behaviour change: a text whose only signal is a context term is now
+    Sigiloso offline (tier "context"); before, only regex hits counted.
+    """
+    enabled = ["cpf", "medical_record", "bank_account"]
+    result = analyze_privacy("Preciso do laudo médico da minha mãe", enabled_pii_types=enabled)
+    print(f"Context-only: {result}")
+    assert result['privacy_status'] == "Sigiloso" and result['tier'] == "context"
+    assert result["detected_pii"] == ["Prontuário Médico"] and "contexto" in result["reason"]
+
+    # Context terms match whole words only; texts without them keep the regex verdict
+    result = analyze_privacy("A agressão ao patrimônio público", enabled_pii_types=enabled)
+    assert result['privacy_status'] == "Público" and result['tier'] == "regex"
+    result = analyze_privacy("Meu CPF é 123.456.789-00 e o prontuário está pronto", enabled_pii_types=enabled)
+    assert result['tier'] == "regex" and len(result['detected_pii']) == 2
+
+def test_deep_search_matches_whole_words():
+    """
+    Behaviour change: the dashboard deep search matches whole words
+    (accent/case-insensitive), so "Pix" no longer matches inside "pixel".
+    """
+    from fastapi.testclient import TestClient
+    import main
+    from storage import ClassificationStore
+
+    original = main.get_store
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        store.insert_many([
+            {"id": "a", "text": "Minha chave PIX foi usada sem autorização", "privacy": "Sigiloso"},
+            {"id": "b", "text": "O pixel do painel eletrônico queimou", "privacy": "Público"},
+            {"id": "c", "text": "Pagamento via Pix não compensou", "privacy": "Público"},
+        ])
+        main.get_store = lambda: store
+        try:
+            data = TestClient(main.app).get("/api/dashboard-data?privacy_filter=Pix",
+                                            headers={"x-admin-password": "admin123"}).json()
+            ids = [row['id'] for row in data['recent_logs']]
+            print(f"Deep search 'Pix': {ids}")
+            assert sorted(ids) == ["a", "c"] and data['total_count'] == 2
+        finally:
+            main.get_store = original
+            store.close()
+
+if __name__ == "__main__":
+    test_keyword_automaton()
+    test_context_detection()
+    test_context_only_texts_are_sensitive()
+    test_deep_search_matches_whole_words()
+    print("[OK] PASSOU")
@@ -0,0 +1,56 @@
+"""
+Test the local hashed TF-IDF classifier (train, save/load, predict)
+"""
+import sys
+import os
+import tempfile
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from ai_service import load_categories
+from local_classifier import LocalClassifier, train
+
+SAMPLES = [
+    ("Tem um buraco enorme no asfalto da minha rua", "solicitacao", "Tapa-buraco"),
+    ("Buraco na via da quadra 12 precisa de tapa-buraco", "solicitacao", "Tapa-buraco"),
+    ("Poste apagado, solicito conserto da iluminação", "solicitacao", "Iluminação Pública"),
+    ("A luz do poste da praça está queimada", "solicitacao", "Iluminação Pública"),
+    ("Parabéns à equipe do posto pelo excelente atendimento", "elogio", "Atendimento Eficiente"),
+    ("Quero agradecer a servidora pela cordialidade", "elogio", "Cordialidade"),
+    ("Denuncio desvio de verba e corrupção na secretaria", "denuncia", "Corrupção"),
+    ("Servidor recebendo propina para liberar alvará", "denuncia", "Corrupção"),
+    ("Demora de quatro horas na fila do hospital", "reclamacao", "Demora no Atendimento"),
+    ("Fui mal atendido e esperei demais na fila", "reclamacao", "Demora no Atendimento"),
+]
+
+def test_local_classifier():
+    """Model learns the toy set, round-trips through the .npz artifact and stays sub-millisecond"""
+    taxonomy = load_categories()
+    model = train(SAMPLES, taxonomy, epochs=80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'model.npz')
+        model.save(path)
+        loaded = LocalClassifier.load(path)
+
+    pred = loaded.predict("buraco no asfalto da rua")
+    print(f"Predição: {pred}")
+    assert pred['id'] == "solicitacao"
+    assert pred['subcategory'] == "Tapa-buraco"
+    assert 0.0 < pred['probability'] <= 1.0
+
+    pred = loaded.predict("excelente atendimento, parabéns")
+    assert pred['id'] == "elogio"
+
+    assert loaded.predict("") is None
+
+    started = time.perf_counter()
+    for _ in range(200):
+        loaded.predict("Solicito conserto da iluminação pública na quadra 5")
+    per_call = (time.perf_counter() - started) / 200
+    print(f"Inferência: {per_call * 1e6:.0f} µs")
+    assert per_call < 0.001
+
+if __name__ == "__main__":
+    test_local_classifier()
+    print("[OK] PASSOU")
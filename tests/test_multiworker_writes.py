@@ -0,0 +1,140 @@
+"""
+Stress test: several processes writing to the same classification store at once
+(as uvicorn --workers N does). No record may be lost, duplicated or mangled.
+"""
+import sys
+import os
+import csv
+import multiprocessing
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from storage import ClassificationStore, CSV_FIELDS
+
+WORKERS = 4
+ROWS_PER_WORKER = 150
+
+def _writer(db_path, worker, start_event):
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+    from storage import ClassificationStore
+    store = ClassificationStore(db_path)
+    start_event.wait()
+    for i in range(ROWS_PER_WORKER):
+        record = {"id": f"w{worker}-{i}", "text": f"Worker {worker}, linha {i}, texto com vírgula, \"aspas\"\ne quebra",
+                  "category": "CPF" if i % 3 == 0 else "Geral",
+                  "privacy": "Sigiloso" if i % 3 == 0 else "Público",
+                  "reason": "Dados detectados via regex: CPF" if i % 3 == 0 else ""}
+        if i % 2:
+            store.insert(record)
+        else:
+            store.insert_many([record])
+    store.close()
+
+def _migrator(db_path, csv_path, start_event, results):
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+    from storage import ClassificationStore
+    store = ClassificationStore(db_path)
+    start_event.wait()
+    results.put(store.migrate_csv(csv_path))
+    store.close()
+
+def _candidate(db_path, worker, start_event, results):
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+    from storage import ClassificationStore
+    store = ClassificationStore(db_path)
+    start_event.wait()
+    results.put((worker, store.acquire_lease("maintenance", f"worker-{worker}", 60)))
+    store.close()
+
+def test_concurrent_writers():
+    """N processes x M inserts: every row stored once, counters consistent"""
+    ctx = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'stress.db')
+        ClassificationStore(db_path).close()
+        start = ctx.Event()
+        procs = [ctx.Process(target=_writer, args=(db_path, w, start)) for w in range(WORKERS)]
+        for p in procs: p.start()
+        start.set()
+        for p in procs: p.join(120)
+        assert all(p.exitcode == 0 for p in procs)
+
+        store = ClassificationStore(db_path)
+        expected = WORKERS * ROWS_PER_WORKER
+        ids = [row['id'] for row in store.iter_rows()]
+        print(f"Stored {len(ids)} rows, counters: {store.privacy_counts()}")
+        assert len(ids) == expected
+        assert len(set(ids)) == expected
+        assert store.connection().execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+
+        # Per-worker order is preserved and text survives intact
+        for w in range(WORKERS):
+            mine = [i for i in ids if i.startswith(f"w{w}-")]
+            assert mine == [f"w{w}-{i}" for i in range(ROWS_PER_WORKER)]
+        assert any('"aspas"\ne quebra' in row['text_snippet'] for row in store.recent(5))
+
+        incremental = (store.count(), store.privacy_counts(), store.category_counts(), store.pii_counts())
+        assert incremental[0] == expected
+        store.rebuild_aggregates()
+        assert (store.count(), store.privacy_counts(), store.category_counts(), store.pii_counts()) == incremental
+        store.close()
+
+def test_concurrent_migration_imports_once():
+    """Workers starting together import a legacy CSV exactly once"""
+    ctx = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'migrate.db')
+        csv_path = os.path.join(tmp, 'classifications.csv')
+        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_FIELDS)
+            for i in range(200):
+                writer.writerow([f"legacy-{i}", "2026-01-01T00:00:00", "Texto", "Geral", "Público", "", f"Linha {i}"])
+        ClassificationStore(db_path).close()
+
+        start, results = ctx.Event(), ctx.Queue()
+        procs = [ctx.Process(target=_migrator, args=(db_path, csv_path, start, results)) for _ in range(WORKERS)]
+        for p in procs: p.start()
+        start.set()
+        for p in procs: p.join(120)
+        imported = sorted(results.get(timeout=5) for _ in procs)
+        print(f"Imported per worker: {imported}")
+        assert imported == [0] * (WORKERS - 1) + [200]
+
+        store = ClassificationStore(db_path)
+        assert store.count() == 200
+        store.close()
+
+def test_one_worker_holds_the_maintenance_lease():
+    """Workers starting together elect one leader; it can renew, and others take over when it lapses"""
+    ctx = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'lease.db')
+        ClassificationStore(db_path).close()
+
+        start, results = ctx.Event(), ctx.Queue()
+        procs = [ctx.Process(target=_candidate, args=(db_path, w, start, results)) for w in range(WORKERS)]
+        for p in procs: p.start()
+        start.set()
+        for p in procs: p.join(120)
+        outcomes = dict(results.get(timeout=5) for _ in procs)
+        print(f"Lease per worker: {outcomes}")
+        leaders = [w for w, held in outcomes.items() if held]
+        assert len(leaders) == 1
+
+        store = ClassificationStore(db_path)
+        leader, other = f"worker-{leaders[0]}", f"worker-{(leaders[0] + 1) % WORKERS}"
+        assert store.acquire_lease("maintenance", leader, 60)
+        assert not store.acquire_lease("maintenance", other, 60)
+        store.release_lease("maintenance", other)  # not the holder: no effect
+        assert not store.acquire_lease("maintenance", other, 60)
+        store.release_lease("maintenance", leader)
+        assert store.acquire_lease("maintenance", other, 0)
+        assert store.acquire_lease("maintenance", leader, 60)  # expired lease
+        store.close()
+
+if __name__ == "__main__":
+    test_concurrent_writers()
+    test_concurrent_migration_imports_once()
+    test_one_worker_holds_the_maintenance_lease()
+    print("\nAll multi-worker tests passed!")
@@ -0,0 +1,37 @@
+"""
+Test SimHash near-duplicate reuse of prior classifications
+"""
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from near_duplicate import NearDuplicateIndex
+
+def test_near_duplicate_index():
+    """Same complaint with another quadra number hits; unrelated text misses"""
+    index = NearDuplicateIndex(threshold=0.9)
+    index.add("Existe um buraco enorme no asfalto da quadra 12 conjunto B, próximo à escola, "
+              "causando acidentes com motociclistas", "solicitacao", "Tapa-buraco")
+    index.add("Parabéns à equipe da UBS pelo atendimento rápido e cordial", "elogio", "Atendimento Eficiente")
+
+    hit = index.lookup("Existe um buraco enorme no asfalto da quadra 37 conjunto B, próximo à escola, "
+                       "causando acidentes com motociclistas")
+    print(f"Hit: {hit}")
+    assert hit is not None
+    assert hit['id'] == "solicitacao"
+    assert hit['subcategory'] == "Tapa-buraco"
+    assert hit['similarity'] >= 0.9
+
+    miss = index.lookup("Denuncio servidor cobrando propina para liberar alvará de funcionamento")
+    assert miss is None
+
+    stats = index.stats()
+    print(f"Stats: {stats}")
+    assert stats['entries'] == 2
+    assert stats['lookups'] == 2
+    assert stats['hit_rate'] == 0.5
+    assert stats['memory_bytes'] > 0
+
+if __name__ == "__main__":
+    test_near_duplicate_index()
+    print("[OK] PASSOU")
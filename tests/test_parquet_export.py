@@ -0,0 +1,71 @@
+"""
+Test the Parquet analytics export (per-segment files, combined file, typed columns)
+"""
+import sys
+import os
+import datetime
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from parquet_export import ParquetExporter, parquet_available
+from segments import SegmentArchive
+from storage import ClassificationStore
+
+def test_parquet_export_per_segment():
+    """Sealed days become typed Parquet files once; the combined export adds today's tail"""
+    if not parquet_available():
+        print("pyarrow não instalado; teste ignorado")
+        return
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        store.insert_many([
+            {"id": "p1", "timestamp": "2026-01-01T09:00:00", "text": "Buraco", "privacy": "Público",
+             "tier": "regex", "provider": "local", "latency_ms": 1.5},
+            {"id": "p2", "timestamp": "2026-01-01T10:00:00", "text": "Meu CPF", "category": "Dados Pessoais",
+             "privacy": "Sigiloso", "detected_pii": ["CPF"], "tier": "regex", "provider": "local"},
+            {"id": "p3", "timestamp": "2026-01-02T08:00:00", "text": "Poste", "privacy": "Público"},
+            {"id": "p4", "timestamp": "2026-01-03T08:00:00", "text": "Praça", "privacy": "Público"},
+        ])
+        archive = SegmentArchive(store, os.path.join(tmp, 'segments'))
+        archive.seal(through="2026-01-02")
+        exporter = ParquetExporter(archive, os.path.join(tmp, 'parquet'))
+
+        assert exporter.sync() == ["2026-01-01", "2026-01-02"]
+        assert exporter.sync() == []  # incremental: sealed days are converted once
+
+        day = pq.read_table(exporter.segment_path("2026-01-01"))
+        print(f"Schema: {day.schema}")
+        assert day.num_rows == 2
+        assert pa.types.is_dictionary(day.schema.field('privacy_status').type)
+        assert day.schema.field('timestamp').type == pa.timestamp('us')
+        assert day.column('detected_pii').to_pylist() == [None, ["CPF"]]
+        assert day.column('latency_ms').to_pylist() == [1.5, None]
+
+        path = exporter.export()
+        assert exporter.export() == path
+        combined = pq.ParquetFile(path)
+        assert combined.metadata.num_rows == 4 and combined.metadata.num_row_groups == 3
+        stats = combined.metadata.row_group(0).column(1).statistics
+        assert stats.has_min_max and stats.min == datetime.datetime(2026, 1, 1, 9, 0)
+        assert pq.read_table(path).column('id').to_pylist() == ["p1", "p2", "p3", "p4"]
+
+        # A late row of a sealed day is sealed as a part; the day file is rebuilt in time order
+        store.insert({"id": "p0", "timestamp": "2026-01-01T09:30:00", "text": "Atrasado", "privacy": "Público"})
+        archive.seal(through="2026-01-02")
+        assert exporter.sync() == ["2026-01-01"]
+        assert pq.read_table(exporter.segment_path("2026-01-01")).column('id').to_pylist() == ["p1", "p0", "p2"]
+        assert pq.read_table(exporter.export()).num_rows == 5
+
+        # Retention removes the day files of dropped segments
+        archive.apply_retention(1, today=datetime.date(2026, 1, 3))
+        exporter.sync()
+        assert not os.path.exists(exporter.segment_path("2026-01-01"))
+        assert pq.read_table(exporter.export()).column("id").to_pylist() == ["p3", "p4"]
+        store.close()
+
+if __name__ == "__main__":
+    test_parquet_export_per_segment()
+    print("\nAll Parquet export tests passed!")
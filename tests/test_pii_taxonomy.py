@@ -0,0 +1,37 @@
+"""
+Test the PII taxonomy index built from data/pii_config.json
+"""
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from taxonomy import get_pii_taxonomy
+from ai_service import get_macro_category
+
+def test_pii_taxonomy_lookups():
+    """type -> name -> macro -> severity lookups and macro priority"""
+    index = get_pii_taxonomy()
+
+    assert index.name("cpf") == "CPF"
+    assert index.lookup("PIX (UUID)")['id'] == "pix"
+    assert index.severity("Conta Bancária") == "critical"
+
+    # Health outranks banking, banking outranks personal data, personal outranks vehicles
+    assert get_macro_category(["CPF", "Prontuário Médico"]) == "Dados de Saúde"
+    assert get_macro_category(["CPF", "PIX (UUID)"]) == "Dados Bancários"
+    assert get_macro_category(["Placa de Veículo (antiga)", "Email"]) == "Dados Pessoais"
+    assert get_macro_category(["Placa Mercosul"]) == "Dados Veiculares"
+    assert get_macro_category(["Conflitos Familiares"]) == "Dados Sensíveis (Violência Doméstica)"
+    assert get_macro_category([]) == "Público"
+
+    # Logged category labels used by the dashboard charts
+    assert index.macro_for_label("Dados Bancários") == "Dados Bancários"
+    assert index.macro_for_label("Prontuário Médico") == "Dados de Saúde"
+    assert index.macro_for_label("Geral") == "Dados Pessoais"
+
+    assert "medida protetiva" in index.search_terms("Dados Sensíveis (Violência Doméstica)")
+    assert "cpf" in index.search_terms("CPF")
+
+if __name__ == "__main__":
+    test_pii_taxonomy_lookups()
+    print("[OK] PASSOU")
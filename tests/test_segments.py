@@ -0,0 +1,120 @@
+"""
+Test sealed daily log segments and LGPD retention purges
+"""
+import sys
+import os
+import datetime
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from bitmap_index import BitmapIndex
+from segments import SegmentArchive
+from storage import ClassificationStore
+
+def _store_with_days(tmp):
+    store = ClassificationStore(os.path.join(tmp, 'test.db'))
+    store.insert_many([
+        {"id": "d1a", "timestamp": "2026-01-01T09:00:00", "text": "Buraco na rua", "privacy": "Público"},
+        {"id": "d1b", "timestamp": "2026-01-01T18:00:00", "text": "Meu CPF", "category": "CPF",
+         "privacy": "Sigiloso", "reason": "CPF detectado"},
+        {"id": "d2a", "timestamp": "2026-01-02T10:00:00", "text": "Poste apagado", "privacy": "Público"},
+        {"id": "d4a", "timestamp": "2026-01-04T11:00:00", "text": "Praça suja", "privacy": "Público"},
+    ])
+    return store
+
+def test_seal_writes_one_segment_per_day():
+    """Finished days become gzip segments; sealing again adds nothing"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = _store_with_days(tmp)
+        archive = SegmentArchive(store, os.path.join(tmp, 'segments'))
+
+        sealed = archive.seal(through="2026-01-03")
+        print(f"Sealed: {[(s['day'], s['rows']) for s in sealed]}")
+        assert [(s['day'], s['rows']) for s in sealed] == [("2026-01-01", 2), ("2026-01-02", 1)]
+        assert archive.seal(through="2026-01-03") == []
+        assert all(os.path.exists(archive.path(s)) for s in sealed)
+
+        # Range reads open only the segments of the requested days
+        assert [r['id'] for r in archive.iter_rows("2026-01-02", "2026-01-02")] == ["d2a"]
+        assert [r['id'] for r in archive.iter_rows(until="2026-01-01T12:00")] == ["d1a"]
+        assert [s['day'] for s in archive.segments(since="2026-01-02")] == ["2026-01-02"]
+
+        # The next seal continues after the last sealed row
+        assert [s['day'] for s in archive.seal(through="2026-01-04")] == ["2026-01-04"]
+        store.close()
+
+def test_retention_drops_segments_rows_and_counters():
+    """Retention deletes whole segments and the same rows, keeping counters consistent"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = _store_with_days(tmp)
+        archive = SegmentArchive(store, os.path.join(tmp, 'segments'))
+        archive.seal(through="2026-01-03")
+        index = BitmapIndex()
+        index.catch_up(store)
+
+        result = archive.apply_retention(2, today=datetime.date(2026, 1, 4))
+        print(f"Retention: {result}")
+        assert result == {"cutoff": "2026-01-02", "rows": 2, "segments": ["2026-01-01"]}
+        assert [s['day'] for s in archive.segments()] == ["2026-01-02"]
+        assert not os.path.exists(os.path.join(archive.directory, "classifications-2026-01-01.csv.gz"))
+
+        assert [r['id'] for r in store.recent(10)] == ["d4a", "d2a"]
+        assert store.count() == 2 and store.privacy_counts() == {"Público": 2}
+        assert store.pii_counts() == {}
+        assert store.search(["cpf"]) == []
+        assert "2026-01-01" not in store.timeseries('day', "2026-01-01", "2026-01-31")
+
+        # Counters of the remaining rows match a full rebuild
+        before = (store.privacy_counts(), store.category_counts(), store.timeseries('day', "2026-01-01", "2026-01-31"))
+        store.rebuild_aggregates()
+        assert before == (store.privacy_counts(), store.category_counts(), store.timeseries('day', "2026-01-01", "2026-01-31"))
+
+        # The in-memory bitmap index drops the purged seqs
+        assert index.slice(None, store)["total_count"] == 2
+        store.close()
+
+def test_time_order_differs_from_seq_order():
+    """Rows stamped out of seq order land in their own day; late rows of a sealed day are not lost"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        # Write-behind batches and several workers commit rows out of time order
+        store.insert_many([
+            {"id": "d2a", "timestamp": "2026-01-02T10:00:00", "text": "Poste apagado", "privacy": "Público"},
+            {"id": "d1b", "timestamp": "2026-01-01T18:00:00", "text": "Meu CPF", "category": "CPF",
+             "privacy": "Sigiloso", "reason": "CPF detectado"},
+            {"id": "d3a", "timestamp": "2026-01-03T08:00:00", "text": "Praça suja", "privacy": "Público"},
+            {"id": "d1a", "timestamp": "2026-01-01T09:00:00", "text": "Buraco na rua", "privacy": "Público"},
+        ])
+        archive = SegmentArchive(store, os.path.join(tmp, 'segments'))
+        index = BitmapIndex()
+        index.catch_up(store)
+
+        sealed = archive.seal(through="2026-01-02")
+        print(f"Sealed: {[(s['day'], s['rows']) for s in sealed]}")
+        assert [(s['day'], s['rows']) for s in sealed] == [("2026-01-01", 2), ("2026-01-02", 1)]
+        assert [r['id'] for r in archive.iter_rows("2026-01-01", "2026-01-01")] == ["d1a", "d1b"]
+        assert [r['id'] for r in archive.iter_unsealed(['id'])] == ["d3a"]
+
+        # A row of a sealed day committed after the seal goes to an extra part of that day
+        store.insert({"id": "d1c", "timestamp": "2026-01-01T23:59:59", "text": "Atrasado", "privacy": "Público"})
+        assert [r['id'] for r in archive.iter_unsealed(['id'])] == ["d1c", "d3a"]
+        late = archive.seal(through="2026-01-02")
+        assert [(s['day'], s['rows'], s.get('part')) for s in late] == [("2026-01-01", 1, 1)]
+        assert [r['id'] for r in archive.iter_rows("2026-01-01", "2026-01-01")] == ["d1a", "d1b", "d1c"]
+        assert [r['id'] for r in archive.iter_unsealed(['id'])] == ["d3a"]
+        assert archive.seal(through="2026-01-02") == []
+
+        # Retention deletes by timestamp, whatever the seqs, and the indexes follow
+        result = archive.apply_retention(1, today=datetime.date(2026, 1, 3))
+        assert result == {"cutoff": "2026-01-02", "rows": 3, "segments": ["2026-01-01", "2026-01-01"]}
+        assert sorted(r['id'] for r in store.recent(10)) == ["d2a", "d3a"]
+        assert store.privacy_counts() == {"Público": 2}
+        assert index.slice(None, store)["total_count"] == 2
+        assert index.slice({"privacy": "Sigiloso"}, store)["total_count"] == 0
+        store.close()
+
+if __name__ == "__main__":
+    test_seal_writes_one_segment_per_day()
+    test_retention_drops_segments_rows_and_counters()
+    test_time_order_differs_from_seq_order()
+    print("\nAll segment tests passed!")
@@ -0,0 +1,266 @@
+"""
+Test the SQLite classification store (insert, indexed aggregates, CSV migration/export)
+"""
+import sys
+import os
+import csv
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from storage import ClassificationStore, CSV_FIELDS
+
+def test_insert_and_aggregates():
+    """Macro category and privacy status are derived at write time"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        store.insert({"id": "a1", "text": "Buraco na rua", "category": "Geral", "privacy": "Público"})
+        store.insert({"id": "b2", "text": "Meu CPF é 123.456.789-00", "category": "CPF",
+                      "privacy": "Sigiloso (LGPD)", "reason": "CPF detectado"})
+        store.insert({"id": "c3", "text": "Laudo do prontuário", "category": "Dados de Saúde", "privacy": "Sigiloso"})
+
+        print(f"Privacy: {store.privacy_counts()}")
+        print(f"Categories: {store.category_counts()}")
+        assert store.count() == 3
+        assert store.privacy_counts() == {"Público": 1, "Sigiloso": 2}
+        assert store.category_counts() == {"Público": 1, "Dados Pessoais": 1, "Dados de Saúde": 1}
+        assert store.category_counts("Sigiloso") == {"Dados Pessoais": 1, "Dados de Saúde": 1}
+
+        recent = store.recent(2)
+        assert [r['id'] for r in recent] == ["c3", "b2"]
+        assert recent[1]['privacy_reason'] == "CPF detectado"
+        assert list(recent[0].keys()) == CSV_FIELDS
+        assert [r['id'] for r in store.recent(5, "Público")] == ["a1"]
+        store.close()
+
+def test_csv_migration_and_export():
+    """A legacy CSV is imported once and exported back in the same layout"""
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = os.path.join(tmp, 'classifications.csv')
+        with open(legacy, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_FIELDS)
+            writer.writerow(["x1", "2026-01-05T10:00:00", "Texto", "Geral", "Público", "", "Poste apagado, texto com \"aspas\", vírgula"])
+            writer.writerow(["x2", "2026-01-06T11:00:00", "Áudio", "Chave PIX", "Sigiloso", "PIX", "Minha chave pix é 61999998888"])
+
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        assert store.migrate_csv(legacy) == 2
+        assert not os.path.exists(legacy)
+        assert os.path.exists(legacy + '.migrated')
+        assert store.category_counts() == {"Público": 1, "Dados Bancários": 1}
+
+        exported = os.path.join(tmp, 'export.csv')
+        assert store.export_csv(exported) == 2
+        with open(exported, 'r', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        with open(legacy + '.migrated', 'r', encoding='utf-8') as f:
+            original = list(csv.DictReader(f))
+        print(f"Exported: {rows}")
+        assert rows == original
+        store.close()
+
+def test_aggregates_rebuild_matches_incremental():
+    """Counters maintained on insert equal a full recomputation"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        store.insert_many([
+            {"text": "Meu CPF é 123.456.789-00", "category": "Dados Pessoais", "privacy": "Sigiloso",
+             "reason": "Dados detectados via regex: CPF, E-mail"},
+            {"text": "Chave pix 61999998888", "category": "Chave PIX", "privacy": "Sigiloso"},
+            {"text": "Iluminação pública", "category": "Público", "privacy": "Público",
+             "reason": "Nenhum dado detectado"},
+        ])
+        incremental = (store.count(), store.privacy_counts(), store.category_counts(),
+                       store.category_counts("Sigiloso"), store.pii_counts())
+        print(f"Incremental: {incremental}")
+        assert incremental[0] == 3
+        assert incremental[4] == {"CPF": 1, "Email": 1, "Chave PIX": 1}
+
+        store.connection().execute("UPDATE aggregates SET count = 0")
+        assert store.count() == 0
+        assert store.rebuild_aggregates() == 3
+        rebuilt = (store.count(), store.privacy_counts(), store.category_counts(),
+                   store.category_counts("Sigiloso"), store.pii_counts())
+        assert rebuilt == incremental
+        store.close()
+
+def test_reverse_tail_reader():
+    """Newest matching rows are read backwards in blocks, stopping early"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        store.insert_many([{"id": f"r{i}", "text": f"Pedido {i}", "category": "CPF" if i % 7 == 0 else "Geral",
+                            "privacy": "Sigiloso" if i % 7 == 0 else "Público"} for i in range(1000)])
+
+        newest = store.recent(5)
+        assert [r['id'] for r in newest] == ["r999", "r998", "r997", "r996", "r995"]
+
+        sensitive = store.recent(3, "Sigiloso")
+        assert [r['id'] for r in sensitive] == ["r994", "r987", "r980"]
+
+        seen = []
+        def pred(row):
+            seen.append(row['id'])
+            return row['text_snippet'].endswith("0")
+        tail = list(store.iter_newest(pred, block_size=16))
+        assert len(tail) == 100 and tail[0]['id'] == "r990" and tail[-1]['id'] == "r0"
+
+        seen.clear()
+        first = store.recent(2, predicate=pred)
+        print(f"Tail: {first}, rows examined: {len(seen)}")
+        assert [r['id'] for r in first] == ["r990", "r980"]
+        assert len(seen) <= 256
+        store.close()
+
+def test_page_cursor_walks_history_once():
+    """Keyset pages cover every row exactly once, newest first"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        store.insert_many([{"id": f"p{i}", "text": f"Pedido {i}"} for i in range(45)])
+        ids, before, pages = [], None, 0
+        while True:
+            rows, before = store.page(20, before)
+            ids += [r['id'] for r in rows]
+            pages += 1
+            if before is None:
+                break
+        print(f"Pages: {pages}")
+        assert pages == 3
+        assert ids == [f"p{i}" for i in range(44, -1, -1)]
+        store.close()
+
+def test_owner_index_reads_only_own_rows():
+    """Owner pages contain only that citizen's rows; the raw key is never stored"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        store.insert_many([{"id": f"o{i}", "text": f"Pedido {i}", "owner": "cidadao-a" if i % 10 == 0 else "cidadao-b"}
+                           for i in range(100)])
+        store.insert({"id": "anon", "text": "Sem dono"})
+
+        rows, before = store.page(4, owner="cidadao-a")
+        assert [r['id'] for r in rows] == ["o90", "o80", "o70", "o60"]
+        rows, before = store.page(20, before, owner="cidadao-a")
+        assert [r['id'] for r in rows] == ["o50", "o40", "o30", "o20", "o10", "o0"] and before is None
+        assert store.page(10, owner="desconhecido") == ([], None)
+
+        conn = store.connection()
+        assert conn.execute("SELECT COUNT(*) FROM classifications WHERE owner_key = 'cidadao-a'").fetchone()[0] == 0
+        plan = " ".join(str(r[-1]) for r in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT seq FROM classifications WHERE owner_key = ? AND seq < ? ORDER BY seq DESC",
+            ("x", 10)))
+        print(f"Plan: {plan}")
+        assert "idx_classifications_owner" in plan
+        store.close()
+
+def test_inverted_index_search():
+    """Posting-list unions/intersections find rows by folded words, skipping the rest"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        store.insert_many([
+            {"id": "pix", "text": "Minha CHAVE Pix é 61999998888", "category": "Geral", "privacy": "Sigiloso"},
+            {"id": "saude", "text": "Pedido de laudo", "category": "Dados de Saúde", "privacy": "Sigiloso"},
+            {"id": "saude2", "text": "Atendimento na saúde da família, dados do posto", "category": "Geral"},
+            {"id": "mail", "text": "Escreva para joao@exemplo.com", "reason": "Dados detectados via regex: E-mail"},
+            {"id": "cirurgia", "text": "Fila de cirurgia no hospital", "category": "Geral"},
+        ])
+        assert store.search(["pix"]) == [1]
+        assert store.search(["chave pix", "conta bancária"]) == [1]
+        # Every word of a term must occur (intersection); terms are OR-ed (union)
+        assert store.search(["dados de saude"]) == [3, 2]
+        assert store.search(["e-mail", "pix"]) == [4, 1]
+        # Whole words only: "rg" is not found inside "cirurgia"
+        assert store.search(["rg"]) == []
+        # Stopword-only terms cannot use the index
+        assert store.search(["de"]) is None
+
+        ids = [r['id'] for r in store.iter_seqs(store.search(["saude", "pix"]))]
+        print(f"Rows: {ids}")
+        assert ids == ["saude2", "saude", "pix"]
+
+        store.connection().execute("DELETE FROM postings")
+        assert store.search(["pix"]) == []
+        assert store.rebuild_search_index() == 5
+        assert store.search(["dados de saude"]) == [3, 2]
+        store.close()
+
+def test_typed_detection_columns():
+    """detected_pii/tier/provider/latency are stored typed and drive macro and PII counters"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        store.insert({"id": "t1", "text": "Segue meu prontuário", "category": "Geral", "privacy": "Sigiloso",
+                      "reason": "Contexto sensível", "detected_pii": ["Prontuário Médico", "cpf"],
+                      "tier": "context", "provider": "local", "latency_ms": 3.5})
+        store.insert({"id": "t2", "text": "Meu CPF", "category": "Dados Pessoais", "privacy": "Sigiloso",
+                      "reason": "Dados detectados via regex: CPF"})
+
+        row = store.connection().execute(
+            "SELECT macro_category, detected_pii, tier, provider, latency_ms FROM classifications WHERE id = 't1'").fetchone()
+        print(f"Typed row: {tuple(row)}")
+        assert row['macro_category'] == "Dados de Saúde"
+        assert row['tier'] == "context" and row['provider'] == "local" and row['latency_ms'] == 3.5
+        # Typed list for new rows, category/reason names for rows without it
+        assert store.pii_counts() == {"Prontuário Médico": 1, "CPF": 2}
+        store.close()
+
+def test_time_rollups():
+    """Hourly/daily rollups are written with each insert and survive a rebuild"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        store.insert({"id": "r1", "timestamp": "2026-01-10T09:15:00", "text": "Buraco", "privacy": "Público"})
+        store.insert_many([
+            {"id": "r2", "timestamp": "2026-01-10T09:40:00", "text": "Meu CPF", "category": "CPF",
+             "privacy": "Sigiloso", "reason": "CPF detectado"},
+            {"id": "r3", "timestamp": "2026-01-10T17:05:00", "text": "Poste", "privacy": "Público"},
+            {"id": "r4", "timestamp": "2026-01-12T08:00:00", "text": "Praça", "privacy": "Público"},
+        ])
+
+        days = store.timeseries('day', "2026-01-10", "2026-01-12T23:59")
+        print(f"Daily: {days}")
+        assert sorted(days) == ["2026-01-10", "2026-01-12"]
+        assert days["2026-01-10"]["total"] == {"": 3}
+        assert days["2026-01-10"]["privacy"] == {"Público": 2, "Sigiloso": 1}
+        assert days["2026-01-10"]["pii"] == {"CPF": 1}
+
+        hours = store.timeseries('hour', "2026-01-10T00:00", "2026-01-10T23:59")
+        assert {bucket: c["total"][""] for bucket, c in hours.items()} == {"2026-01-10T09": 2, "2026-01-10T17": 1}
+
+        store.rebuild_aggregates()
+        assert store.timeseries('day', "2026-01-01", "2026-01-31") == days
+        store.close()
+
+def test_lookup_by_id_and_short_prefix():
+    """Full ids hit the id index; short ids are a range scan on it; owners see only their rows"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        store.insert_many([
+            {"id": "3f2a9c1e-0000-4000-8000-000000000001", "text": "Primeiro", "owner": "cidadao-a"},
+            {"id": "3f2a9c1e-0000-4000-8000-000000000002", "text": "Segundo", "owner": "cidadao-b"},
+            {"id": "77aa0b12-0000-4000-8000-000000000003", "text": "Terceiro", "owner": "cidadao-a",
+             "detected_pii": ["CPF"], "tier": "regex"},
+        ])
+
+        rows = store.lookup("77aa0b12-0000-4000-8000-000000000003")
+        assert [r['text_snippet'] for r in rows] == ["Terceiro"] and rows[0]['tier'] == "regex"
+        assert [r['text_snippet'] for r in store.lookup("77aa0b12")] == ["Terceiro"]
+        # Ambiguous short id: callers get both candidates
+        assert len(store.lookup("3f2a9c1e")) == 2
+        assert [r['text_snippet'] for r in store.lookup("3f2a9c1e", owner="cidadao-b")] == ["Segundo"]
+        assert store.lookup("77aa0b12", owner="cidadao-b") == []
+        assert store.lookup("ffffffff") == []
+
+        plan = " ".join(str(r[-1]) for r in store.connection().execute(
+            "EXPLAIN QUERY PLAN SELECT seq FROM classifications WHERE id >= ? AND id < ? ORDER BY id", ("a", "b")))
+        print(f"Plan: {plan}")
+        assert "idx_classifications_id" in plan
+        store.close()
+
+if __name__ == "__main__":
+    test_insert_and_aggregates()
+    test_csv_migration_and_export()
+    test_aggregates_rebuild_matches_incremental()
+    test_reverse_tail_reader()
+    test_page_cursor_walks_history_once()
+    test_owner_index_reads_only_own_rows()
+    test_inverted_index_search()
+    test_typed_detection_columns()
+    test_time_rollups()
+    test_lookup_by_id_and_short_prefix()
+    print("\nAll storage tests passed!")
@@ -0,0 +1,101 @@
+"""
+Test the bulk submit endpoint (JSON array / NDJSON, per-item statuses, one transaction)
+"""
+import sys
+import os
+import json
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from fastapi.testclient import TestClient
+import main
+from storage import ClassificationStore
+
+def test_insert_batch_flags():
+    """insert_batch reports, per row, whether it was stored or was a duplicate"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        store.insert({"id": "a", "text": "x"})
+        flags = store.insert_batch([{"id": "a", "text": "x"}, {"id": "b", "text": "y"}, {"id": "b", "text": "y"}])
+        print(f"Flags: {flags}")
+        assert flags == [False, True, False]
+        assert store.count() == 2
+        store.close()
+
+def test_submit_batch_endpoint():
+    """Valid items are stored once; invalid items and replays get their own status"""
+    original = main.get_store
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        main.get_store = lambda: store
+        client = TestClient(main.app)
+        try:
+            response = client.post("/api/submit/batch", json=[
+                {"id": "s1", "text": "Buraco na rua", "privacy": "Público"},
+                {"id": "s2", "text": "Meu CPF", "privacy": "Sigiloso", "detected_pii": ["CPF"]},
+                {"text": "sem id"},
+                {"id": "s1", "text": "Buraco na rua"},
+            ])
+            body = response.json()
+            print(f"JSON array: {body['created']} created, {body['duplicates']} duplicates, {body['errors']} errors")
+            assert response.status_code == 200
+            assert [r["status"] for r in body["results"]] == ["created", "created", "error", "duplicate"]
+            assert [r["index"] for r in body["results"]] == [0, 1, 2, 3]
+            assert store.count() == 2 and store.privacy_counts() == {"Público": 1, "Sigiloso": 1}
+
+            ndjson = "\n".join([json.dumps({"id": "s2", "text": "Meu CPF"}), "{quebrado",
+                                "", json.dumps({"id": "s3", "text": "Poste apagado"})])
+            response = client.post("/api/submit/batch", content=ndjson,
+                                   headers={"content-type": "application/x-ndjson"})
+            statuses = [(r["id"], r["status"]) for r in response.json()["results"]]
+            print(f"NDJSON: {statuses}")
+            assert statuses == [("s2", "duplicate"), (None, "error"), ("s3", "created")]
+            assert store.count() == 3
+
+            too_many = [{"id": f"m{i}", "text": "x"} for i in range(main.SUBMIT_BATCH_MAX_ITEMS + 1)]
+            assert client.post("/api/submit/batch", json=too_many).status_code == 413
+            assert client.post("/api/submit/batch", content='{"id": 1}',
+                               headers={"content-type": "application/json"}).json()["results"][0]["status"] == "error"
+            assert client.post("/api/submit/batch", content=b'\xff[').status_code == 400
+            assert store.count() == 3
+        finally:
+            main.get_store = original
+            store.close()
+
+def test_submission_detection_fields_are_validated():
+    """tier, provider, latency_ms and detected_pii are bounded before they are stored"""
+    original = main.get_store
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        main.get_store = lambda: store
+        client = TestClient(main.app)
+        try:
+            base = {"text": "Meu CPF", "privacy": "Sigiloso"}
+            response = client.post("/api/submit/batch", json=[
+                dict(base, id="ok", tier="regex", provider="local", latency_ms=1.5, detected_pii=["CPF", "CPF"]),
+                dict(base, id="t", tier="magia"),
+                dict(base, id="p", provider="x" * (main.MAX_PROVIDER_LENGTH + 1)),
+                dict(base, id="l", latency_ms=-1),
+                dict(base, id="d", detected_pii=[f"Tipo {i}" for i in range(main.MAX_DETECTED_PII + 1)]),
+                dict(base, id="n", detected_pii=["x" * (main.MAX_PII_LABEL_LENGTH + 1)]),
+            ])
+            statuses = [(r["id"], r["status"]) for r in response.json()["results"]]
+            print(f"Statuses: {statuses}")
+            assert statuses == [("ok", "created"), ("t", "error"), ("p", "error"), ("l", "error"),
+                                ("d", "error"), ("n", "error")]
+            row = store.connection().execute(
+                "SELECT tier, provider, latency_ms, detected_pii FROM classifications").fetchone()
+            assert tuple(row) == ("regex", "local", 1.5, '["CPF"]')
+
+            response = client.post("/api/submit", json=dict(base, id="t2", tier="magia"))
+            assert response.status_code == 400
+            assert store.count() == 1
+        finally:
+            main.get_store = original
+            store.close()
+
+if __name__ == "__main__":
+    test_insert_batch_flags()
+    test_submit_batch_endpoint()
+    test_submission_detection_fields_are_validated()
+    print("\nAll bulk submit tests passed!")
@@ -54,16 +54,16 @@ def test_submit_with_pii():
         print(f"   - PII Detectado: {', '.join(result.get('detected_pii', []))}")
         print(f"   - E Sensivel: {'Sim' if result.get('is_sensitive') else 'Nao'}")
         
-        # Verificar se foi logado no CSV
-        print("\n[>] Verificando CSV...")
-        csv_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'classifications.csv')
-        if os.path.exists(csv_path):
-            with open(csv_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                print(f"[OK] CSV atualizado! Total de registros: {len(lines) - 1}")
-                print(f"[DATA] Ultimo registro:\n   {lines[-1].strip()}")
+        # Verificar se foi logado no banco
+        print("\n[>] Verificando banco de classificacoes...")
+        from storage import get_store
+        store = get_store()
+        last = store.recent(1)
+        if last and last[0]['id'] == submit_data['id']:
+            print(f"[OK] Banco atualizado! Total de registros: {store.count()}")
+            print(f"[DATA] Ultimo registro:\n   {last[0]}")
         else:
-            print("[ERROR] CSV nao encontrado!")
+            print("[ERROR] Registro nao encontrado no banco!")
         
         # Verificar dashboard
         print("\n[>] Verificando Dashboard...")
@@ -0,0 +1,78 @@
+"""
+Test the write-behind submission logger (batching, durability modes, drain on stop)
+"""
+import sys
+import os
+import asyncio
+import tempfile
+import uuid
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from storage import ClassificationStore
+from write_behind import WriteBehindLogger
+
+def _records(n):
+    return [{"id": str(uuid.uuid4()), "text": f"Pedido {i}", "category": "Geral", "privacy": "Público"}
+            for i in range(n)]
+
+def test_group_commit_batches_concurrent_submissions():
+    """Concurrent submits are acknowledged only after their batch is committed"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        logger = WriteBehindLogger(store, "group", batch_size=50, flush_ms=20)
+        records = _records(120)
+
+        async def run():
+            return await asyncio.gather(*(logger.submit(r) for r in records))
+
+        ids = asyncio.run(run())
+        print(f"Stats: {logger.stats()}")
+        assert ids == [r['id'] for r in records]
+        assert store.count() == 120
+        assert logger.batches < 120
+        # One fsync per batch, not per submission
+        assert store.durable_commits == logger.batches
+        logger.stop()
+        store.close()
+
+def test_async_mode_drains_on_stop():
+    """Async mode returns before the write; stop() flushes the queue"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        logger = WriteBehindLogger(store, "async", batch_size=1000, flush_ms=5000)
+        records = _records(30)
+
+        async def run():
+            return [await logger.submit(r) for r in records]
+
+        ids = asyncio.run(run())
+        assert ids == [r['id'] for r in records]
+        logger.stop()
+        print(f"Stats: {logger.stats()}")
+        assert logger.pending() == 0
+        assert store.count() == 30
+        assert store.durable_commits == 0  # no fsync on commit
+        assert [r['id'] for r in store.recent(30)] == ids[::-1]
+        store.close()
+
+def test_fsync_mode_writes_each_submission():
+    """Per-request fsync mode writes before returning, without the queue"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ClassificationStore(os.path.join(tmp, 'test.db'))
+        logger = WriteBehindLogger(store, "fsync")
+        records = _records(5)
+
+        async def run():
+            return await asyncio.gather(*(logger.submit(r) for r in records))
+
+        assert asyncio.run(run()) == [r['id'] for r in records]
+        assert store.count() == 5
+        assert logger.batches == 0
+        assert store.durable_commits == 5  # one fsync per submission
+        store.close()
+
+if __name__ == "__main__":
+    test_group_commit_batches_concurrent_submissions()
+    test_async_mode_drains_on_stop()
+    test_fsync_mode_writes_each_submission()
+    print("\nAll write-behind tests passed!")
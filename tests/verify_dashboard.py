@@ -2,12 +2,12 @@ import sys
 import os
 import shutil
 from fastapi.testclient import TestClient
-import pandas as pd
 
 # Add backend to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
 
-from main import app, LOG_FILE
+from main import app
+from storage import get_store
 
 client = TestClient(app)
 
@@ -15,13 +15,8 @@ def test_csv_logging_and_dashboard():
     print("Testing CSV Logging and Dashboard...")
     
     # 1. Clean up existing log for clean test (optional, or just count before/after)
-    initial_count = 0
-    if os.path.exists(LOG_FILE):
-        try:
-            df = pd.read_csv(LOG_FILE)
-            initial_count = len(df)
-        except:
-            pass
+    store = get_store()
+    initial_count = store.count()
             
     # 2. Send a Classification Request
     payload = {
@@ -46,15 +41,13 @@ def test_csv_logging_and_dashboard():
     assert submit_response.status_code == 200
     print("[OK] Submission successful.")
     
-    # 3. Verify CSV exists and has new row
-    assert os.path.exists(LOG_FILE)
-    df = pd.read_csv(LOG_FILE)
-    assert len(df) == initial_count + 1
+    # 3. Verify the store has the new row
+    assert store.count() == initial_count + 1
     # Check if the last row matches our request
-    last_row = df.iloc[-1]
+    last_row = store.recent(1)[0]
     assert "123.456.789-00" in last_row['text_snippet']
     assert last_row['privacy'] == 'Sigiloso'
-    print("[OK] CSV logging successful.")
+    print("[OK] Logging successful.")
     
     # 4. Check Dashboard Endpoint
     dash_response = client.get("/api/dashboard-data", headers={"X-Admin-Password": "admin123"})